@@ -0,0 +1,59 @@
+"""Recall and latency of approximate matching against the exact top-k
+
+    python benchmarks/bench_approximate.py [people] [k] [queries]
+
+Recall counts approximate matches scoring at least the exact k-th best score,
+so ties at the cut-off are not counted as misses.
+"""
+
+import sys
+import time
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer
+
+SETTINGS = [
+    {'max_candidates': 256},
+    {'max_candidates': 1024},
+    {'max_candidates': 4096},
+    {'tables': 16, 'max_candidates': 4096},
+    {'multiprobe': False, 'max_candidates': 1024},
+    {'bands': 0, 'max_candidates': 1024},
+]
+
+
+def recall(approximate, exact):
+    if not exact:
+        return 1.0
+    cutoff = exact[-1][1]
+    return sum(1 for _, score in approximate if score >= cutoff) / len(exact)
+
+
+def main(size=20000, k=10, queries=50):
+    analyzer = FriendshipAnalyzer(make_population(size))
+    analyzer.use_matrix_engine = True
+    analyzer.packed_population()
+    sample = analyzer.people[:queries]
+
+    start = time.perf_counter()
+    exact = [analyzer.find_top_k_matches(person, k) for person in sample]
+    exact_ms = (time.perf_counter() - start) / len(sample) * 1000
+    print(f"people: {size}, k: {k}, queries: {len(sample)}")
+    print(f"exact: {exact_ms:8.2f} ms/query")
+
+    for options in SETTINGS:
+        analyzer.approximate_options = options
+        start = time.perf_counter()
+        index = analyzer.approximate_index()
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        results = [analyzer.find_approximate_matches(person, k) for person in sample]
+        query_ms = (time.perf_counter() - start) / len(sample) * 1000
+        mean_recall = sum(map(recall, results, exact)) / len(sample)
+        print(f"{str(options):45} bits {index.bits:2}  build {build:6.2f}s  "
+              f"{query_ms:8.2f} ms/query  recall@{k} {mean_recall:.3f}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,41 @@
+"""Cost of explain_many against scoring the same pairs
+
+    python benchmarks/bench_explain.py [people] [pairs]
+"""
+
+import random
+import sys
+import time
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer
+
+
+def main(size=100000, pair_count=100000):
+    analyzer = FriendshipAnalyzer(make_population(size))
+    rng = random.Random(0)
+    people = analyzer.people
+    pairs = [(people[rng.randrange(size)], people[rng.randrange(size)]) for _ in range(pair_count)]
+    start = time.perf_counter()
+    analyzer.packed_population()
+    print(f"people: {size}, pairs: {pair_count}, packing {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    scores = [analyzer.analyze_compatibility(person1, person2) for person1, person2 in pairs]
+    print(f"analyze_compatibility   {time.perf_counter() - start:7.2f}s")
+
+    population = analyzer.packed_population()
+    rows = [(population.row_of(person1), population.row_of(person2)) for person1, person2 in pairs]
+    sources, targets = zip(*rows)
+    start = time.perf_counter()
+    population.score_pairs(sources, targets, analyzer.kernel)
+    print(f"score_pairs             {time.perf_counter() - start:7.2f}s")
+
+    start = time.perf_counter()
+    explanations = analyzer.explain_many(pairs)
+    print(f"explain_many            {time.perf_counter() - start:7.2f}s")
+    assert [e.score for e in explanations] == scores
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
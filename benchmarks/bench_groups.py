@@ -0,0 +1,42 @@
+"""Group formation quality and time against random groups
+
+    python benchmarks/bench_groups.py [people] [group_size] [time_budget]
+"""
+
+import random
+import sys
+import time
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer
+
+
+def total(analyzer, groups):
+    return sum(analyzer.analyze_compatibility(p1, p2)
+               for group in groups for p1 in group for p2 in group if p1 is not p2)
+
+
+def main(size=5000, group_size=5, time_budget=10):
+    analyzer = FriendshipAnalyzer(make_population(size))
+    print(f"people: {size}, group size: {group_size}, time budget: {time_budget}s")
+
+    people = list(analyzer.people)
+    random.Random(0).shuffle(people)
+    groups = [people[start:start + group_size] for start in range(0, size, group_size)]
+    print(f"random groups   score {total(analyzer, groups):12.1f}")
+
+    start = time.perf_counter()
+    weights = analyzer.pair_weights()
+    print(f"pair weights    {time.perf_counter() - start:8.2f}s")
+    for max_passes in (0, 1, 20):
+        result = analyzer.form_groups(group_size, weights=weights, time_budget=time_budget,
+                                      max_passes=max_passes)
+        label = "greedy only" if max_passes == 0 else f"{max_passes} passes max"
+        print(f"{label:15} score {result.score:12.1f}  {result.elapsed:6.2f}s  "
+              f"passes {result.passes}  swaps {result.swaps}"
+              + ("" if result.complete else "  (time budget reached)"))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
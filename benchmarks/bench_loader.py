@@ -0,0 +1,52 @@
+"""Throughput of the streaming CSV / JSONL loader
+
+    python benchmarks/bench_loader.py [rows]
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+from population import iter_population, TRAITS, STYLES
+from friendship_analyzer import FriendshipAnalyzer, PersonStore, load_people
+
+
+def write_files(directory, size):
+    csv_path = os.path.join(directory, 'people.csv')
+    jsonl_path = os.path.join(directory, 'people.jsonl')
+    with open(csv_path, 'w', newline='') as csv_file, open(jsonl_path, 'w') as jsonl_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['name', 'age', 'type', 'interests'] + TRAITS + STYLES)
+        for person in iter_population(size):
+            kind = type(person).__name__
+            writer.writerow([person.name, person.age, kind, ';'.join(person.interests)] +
+                            [person.personality_traits[t] for t in TRAITS] +
+                            [person.communication_style[s] for s in STYLES])
+            jsonl_file.write(json.dumps({
+                'name': person.name, 'age': person.age, 'type': kind, 'interests': person.interests,
+                'personality_traits': person.personality_traits,
+                'communication_style': person.communication_style,
+            }) + '\n')
+    return csv_path, jsonl_path
+
+
+def main(size=100000):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_files(directory, size)
+        print(f"rows: {size}")
+        for path in paths:
+            for label, make_analyzer in (('Person list', FriendshipAnalyzer),
+                                         ('PersonStore', lambda: FriendshipAnalyzer(PersonStore()))):
+                analyzer = make_analyzer()
+                analyzer.use_interest_index = False
+                start = time.perf_counter()
+                loaded = load_people(analyzer, path)
+                elapsed = time.perf_counter() - start
+                print(f"{os.path.basename(path):13} -> {label:11}: {loaded / elapsed:>9.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,47 @@
+"""Compare the memory held by Person objects and by a PersonStore
+
+    python benchmarks/bench_memory.py [people]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from population import iter_population
+from friendship_analyzer import PersonStore
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    population = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return population, current, elapsed
+
+
+def build_objects(size):
+    return list(iter_population(size))
+
+
+def build_store(size):
+    store = PersonStore()
+    for person in iter_population(size):
+        store.append(person)
+    return store
+
+
+def main(size=200000):
+    objects, object_bytes, object_time = measure(lambda: build_objects(size))
+    del objects
+    store, store_bytes, store_time = measure(lambda: build_store(size))
+
+    print(f"people: {size}")
+    print(f"Person objects: {object_bytes / size:>8.1f} bytes/person  {object_bytes / 2**20:8.1f} MiB  ({object_time:.2f}s)")
+    print(f"PersonStore:    {store_bytes / size:>8.1f} bytes/person  {store_bytes / 2**20:8.1f} MiB  ({store_time:.2f}s)")
+    print(f"reduction: {object_bytes / store_bytes:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,47 @@
+"""Out-of-core network build against export_friendships, and its traced memory peak
+
+    python benchmarks/bench_out_of_core.py [people] [memory_limit_mib] [threshold]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer
+from friendship_analyzer.outofcore import spill_network
+
+
+def main(size=20000, memory_limit_mib=64, threshold=6.0):
+    analyzer = FriendshipAnalyzer(make_population(size))
+    analyzer.use_matrix_engine = True
+    analyzer.compatibility_threshold = threshold
+    analyzer.packed_population()
+    memory_limit = memory_limit_mib * 2**20
+    print(f"people: {size}, threshold: {threshold}, memory limit: {memory_limit_mib} MiB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        edges = analyzer.export_friendships(os.path.join(directory, 'engine.edges'))
+        print(f"export_friendships        {time.perf_counter() - start:8.2f}s  {edges} edges")
+
+        for name in ('network.edges', 'network.snap'):
+            start = time.perf_counter()
+            edges = analyzer.build_network_out_of_core(os.path.join(directory, name), memory_limit,
+                                                       temp_dir=directory)
+            print(f"out of core -> {name:12} {time.perf_counter() - start:7.2f}s  {edges} edges")
+
+        # Traced separately: tracemalloc slows the build down several times.
+        tracemalloc.start()
+        with spill_network(analyzer, memory_limit, directory) as spilled:
+            _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"spill_network peak {peak / 2**20:.1f} MiB of {memory_limit_mib} MiB "
+              f"(population {spilled.plan.fixed_bytes / 2**20:.1f} MiB held before the build), {spilled.plan}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(*(int(a) for a in args[:2]), *(float(a) for a in args[2:]))
@@ -0,0 +1,42 @@
+"""Scaling of the multiprocess network builder across worker counts
+
+    python benchmarks/bench_parallel_network.py [people] [max_workers] [chunk_size]
+"""
+
+import os
+import sys
+import time
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer
+
+
+def build(people, workers, chunk_size):
+    analyzer = FriendshipAnalyzer()
+    for person in people:
+        analyzer.add_person(person)
+    analyzer.use_matrix_engine = True
+    analyzer.workers = workers
+    analyzer.chunk_size = chunk_size
+    start = time.perf_counter()
+    analyzer.create_friendship_network()
+    elapsed = time.perf_counter() - start
+    edges = [[(f['friend'].name, f['compatibility_score']) for f in p.friendships] for p in people]
+    return elapsed, edges
+
+
+def main(size=5000, max_workers=None, chunk_size=256):
+    max_workers = max_workers or os.cpu_count()
+    people = make_population(size)
+    baseline, expected = build(people, 1, chunk_size)
+    print(f"people: {size}, chunk size: {chunk_size}, cpus: {os.cpu_count()}")
+    print(f"workers  1: {baseline:7.2f}s  speedup 1.00x")
+    for workers in range(2, max_workers + 1):
+        elapsed, edges = build(people, workers, chunk_size)
+        assert edges == expected, f"{workers} workers changed the network"
+        print(f"workers {workers:2}: {elapsed:7.2f}s  speedup {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
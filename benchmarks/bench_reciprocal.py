@@ -0,0 +1,35 @@
+"""Reciprocal matching and population-wide stable pairing
+
+    python benchmarks/bench_reciprocal.py [people] [candidates]
+"""
+
+import sys
+import time
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer
+
+
+def main(size=20000, candidates=50):
+    analyzer = FriendshipAnalyzer(make_population(size))
+    analyzer.packed_population()
+    print(f"people: {size}, candidates: {candidates}")
+
+    person = analyzer.people[0]
+    start = time.perf_counter()
+    forward = analyzer.find_top_k_matches(person, 10)
+    print(f"find_top_k_matches       {time.perf_counter() - start:8.2f}s")
+    start = time.perf_counter()
+    mutual = analyzer.find_reciprocal_matches(person, 10)
+    print(f"find_reciprocal_matches  {time.perf_counter() - start:8.2f}s  "
+          f"{len({id(p) for p, _ in forward} & {id(p) for p, _ in mutual})}/10 in common")
+
+    for mode in ('harmonic', 'min'):
+        result = analyzer.stable_pairing(candidates, mode)
+        print(f"stable_pairing {mode:9} {result.elapsed:8.2f}s  {len(result.pairs)} pairs, "
+              f"{len(result.unmatched)} unmatched, {result.rounds} rounds, "
+              f"mean mutual score {result.score / max(len(result.pairs), 1):.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
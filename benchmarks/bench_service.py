@@ -0,0 +1,49 @@
+"""Latency and throughput of MatchService under concurrent queries
+
+    python benchmarks/bench_service.py [people] [queries] [concurrency]
+
+Compares one executor call per query with batches coalesced over a few
+coalescing windows.
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer, MatchService
+
+
+async def run_clients(service, size, queries, concurrency):
+    rng = random.Random(0)
+    positions = [rng.randrange(size) for _ in range(queries)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def query(position):
+        async with semaphore:
+            await service.top_k_positions(position, 10)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(query(position) for position in positions))
+    return time.perf_counter() - start
+
+
+def main(size=20000, queries=500, concurrency=64):
+    analyzer = FriendshipAnalyzer(make_population(size))
+    analyzer.packed_population()
+    print(f"people: {size}, queries: {queries}, concurrency: {concurrency}")
+    for label, window, max_batch in [("unbatched", 0.0, 1), ("window 1ms", 0.001, 256),
+                                     ("window 5ms", 0.005, 256)]:
+        service = MatchService(analyzer, window=window, max_batch=max_batch)
+        elapsed = asyncio.run(run_clients(service, size, queries, concurrency))
+        service.close()
+        latency = service.latency_percentiles()
+        print(f"{label:11} {queries / elapsed:8.1f} queries/s  "
+              f"mean batch {service.stats()['mean_batch_size']:6.1f}  "
+              + "  ".join(f"{name} {value:7.1f}ms" for name, value in latency.items()))
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,73 @@
+"""Compare ordered-pair and symmetric-pair network construction
+
+The evaluation ratio is measured with the interest index off, so it counts
+only the symmetric saving; the index's own pruning is reported separately.
+
+    python benchmarks/bench_symmetric_network.py [people]
+"""
+
+import sys
+import time
+
+from population import make_population
+from friendship_analyzer import FriendshipAnalyzer
+
+COMPONENTS = [
+    'calculate_interest_compatibility',
+    'calculate_personality_compatibility',
+    'calculate_communication_compatibility',
+    'calculate_age_compatibility',
+]
+
+
+class CountingAnalyzer(FriendshipAnalyzer):
+    """Counts calls to the component methods"""
+
+    def __init__(self):
+        super().__init__()
+        self.evaluations = 0
+        for name in COMPONENTS:
+            method = getattr(self, name)
+            setattr(self, name, self._counted(method))
+
+    def _counted(self, method):
+        def wrapper(person1, person2):
+            self.evaluations += 1
+            return method(person1, person2)
+        return wrapper
+
+
+def build(people, symmetric, interest_index=False):
+    for person in people:
+        person.friendships = []
+    analyzer = CountingAnalyzer()
+    analyzer.symmetric_pairs = symmetric
+    analyzer.use_interest_index = interest_index
+    for person in people:
+        analyzer.add_person(person)
+    start = time.perf_counter()
+    analyzer.create_friendship_network()
+    elapsed = time.perf_counter() - start
+    edges = [[(f['friend'].name, f['compatibility_score']) for f in p.friendships] for p in people]
+    return analyzer.evaluations, elapsed, edges
+
+
+def main(size=600):
+    people = make_population(size)
+    ordered_evals, ordered_time, ordered_edges = build(people, symmetric=False)
+    symmetric_evals, symmetric_time, symmetric_edges = build(people, symmetric=True)
+    indexed_evals, indexed_time, indexed_edges = build(people, symmetric=True, interest_index=True)
+    assert ordered_edges == symmetric_edges, "symmetric build changed the network"
+    assert indexed_edges == symmetric_edges, "interest index changed the network"
+
+    print(f"people: {size}")
+    print(f"ordered pairs:   {ordered_evals:>10} component evaluations  {ordered_time:.3f}s")
+    print(f"symmetric pairs: {symmetric_evals:>10} component evaluations  {symmetric_time:.3f}s")
+    print(f"evaluation ratio: {ordered_evals / symmetric_evals:.2f}x, "
+          f"speedup: {ordered_time / symmetric_time:.2f}x, identical output: yes")
+    print(f"with interest index: {indexed_evals:>6} component evaluations  {indexed_time:.3f}s "
+          f"({symmetric_evals / indexed_evals:.2f}x fewer than symmetric pairs alone)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 600)
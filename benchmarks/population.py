@@ -0,0 +1,71 @@
+"""Synthetic populations for the benchmarks"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from friendship_analyzer import (
+    Person, EmpatheticPerson, LogicalPerson, CreativePerson, ReservedPerson,
+    EnergeticPerson, AnalyticalPerson, AdventurousPerson, IntrovertPerson, HumorousPerson
+)
+
+PERSON_TYPES = [
+    Person, EmpatheticPerson, LogicalPerson, CreativePerson, ReservedPerson,
+    EnergeticPerson, AnalyticalPerson, AdventurousPerson, IntrovertPerson, HumorousPerson
+]
+TRAITS = ['extroversion', 'openness', 'agreeableness', 'conscientiousness', 'neuroticism']
+STYLES = ['direct', 'emotional', 'humor', 'formal']
+
+
+TRAIT_DISTRIBUTIONS = ('uniform', 'normal', 'bimodal')
+
+
+def _score(rng, distribution):
+    if distribution == 'uniform':
+        return rng.randint(0, 10)
+    if distribution == 'normal':
+        return min(10, max(0, round(rng.gauss(5, 2))))
+    if distribution == 'bimodal':
+        return min(10, max(0, round(rng.gauss(rng.choice((2, 8)), 1.2))))
+    raise ValueError(f"unknown trait distribution {distribution!r}, expected one of {TRAIT_DISTRIBUTIONS}")
+
+
+def iter_population(size, seed=0, vocabulary_size=50, max_interests=5,
+                    trait_distribution='uniform', type_weights=None, interest_skew=0.0):
+    """Yield `size` reproducible people
+
+    trait_distribution picks trait/style scores ('uniform' 0-10, 'normal' around 5,
+    'bimodal' around 2 and 8), type_weights gives a relative weight per entry of
+    PERSON_TYPES (uniform mix when None), and interest_skew > 0 draws interests
+    from a Zipf-like popularity curve instead of uniformly.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"interest{i}" for i in range(vocabulary_size)]
+    popularity = None
+    if interest_skew:
+        popularity = [1 / (rank + 1) ** interest_skew for rank in range(vocabulary_size)]
+    for i in range(size):
+        if type_weights is None:
+            person_type = rng.choice(PERSON_TYPES)
+        else:
+            person_type = rng.choices(PERSON_TYPES, weights=type_weights)[0]
+        age = rng.randint(18, 65)
+        count = rng.randint(0, max_interests)
+        if popularity is None:
+            interests = rng.sample(vocabulary, count)
+        else:
+            interests = list(dict.fromkeys(rng.choices(vocabulary, weights=popularity, k=count)))
+        if trait_distribution == 'uniform':
+            traits = {t: rng.randint(0, 10) for t in TRAITS}
+            styles = {s: rng.randint(0, 10) for s in STYLES}
+        else:
+            traits = {t: _score(rng, trait_distribution) for t in TRAITS}
+            styles = {s: _score(rng, trait_distribution) for s in STYLES}
+        yield person_type(f"person{i}", age, interests, traits, styles)
+
+
+def make_population(size, seed=0, vocabulary_size=50, max_interests=5, **options):
+    """Build a list of `size` people, see iter_population"""
+    return list(iter_population(size, seed, vocabulary_size, max_interests, **options))
@@ -0,0 +1,249 @@
+"""Reproducible benchmark suite for scoring, matching and network building
+
+    python benchmarks/suite.py --sizes 1000 10000 100000 --output results.json
+    python benchmarks/suite.py --sizes 1000000 --cases score_pairs find_top_k_matches
+    python benchmarks/suite.py --compare baseline.json results.json
+
+Every (size, case) runs in a fresh process on the same seeded population, so
+the recorded peak memory (max RSS) belongs to that case alone. Results carry
+throughput, latency percentiles and the generator settings; --compare prints
+the ratios between two result files and exits with status 1 when a case got
+slower (or bigger) than --tolerance allows.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from population import iter_population, PERSON_TYPES, TRAIT_DISTRIBUTIONS
+from friendship_analyzer import FriendshipAnalyzer, PersonStore
+
+SUITE_VERSION = 1
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    return {f"p{p}": samples[max(0, -(-len(samples) * p // 100) - 1)] * 1000 for p in (50, 90, 99)}
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def query_count(options, size):
+    # Fewer queries for the O(N) scans on very large populations.
+    return max(3, min(options['queries'], 2000000 // size))
+
+
+def case_score_pairs(analyzer, rng, options):
+    people = analyzer.people
+    pairs = [(people[rng.randrange(len(people))], people[rng.randrange(len(people))])
+             for _ in range(options['pairs'])]
+    start = time.perf_counter()
+    for person1, person2 in pairs:
+        analyzer.analyze_compatibility(person1, person2)
+    elapsed = time.perf_counter() - start
+    return {'operations': len(pairs), 'seconds': elapsed, 'throughput': len(pairs) / elapsed,
+            'unit': 'pairs/s'}
+
+
+def case_score_block(analyzer, rng, options):
+    start = time.perf_counter()
+    population = analyzer.packed_population()
+    pack_seconds = time.perf_counter() - start
+    rows = sorted(rng.sample(range(population.size), min(256, population.size)))
+    start = time.perf_counter()
+    population.score_block(rows)
+    elapsed = time.perf_counter() - start
+    pairs = len(rows) * population.size
+    return {'operations': pairs, 'seconds': elapsed, 'throughput': pairs / elapsed,
+            'unit': 'pairs/s', 'pack_seconds': pack_seconds}
+
+
+def _queries(analyzer, rng, options, query):
+    people = analyzer.people
+    count = query_count(options, len(people))
+    latencies = []
+    for _ in range(count):
+        person = people[rng.randrange(len(people))]
+        start = time.perf_counter()
+        query(person)
+        latencies.append(time.perf_counter() - start)
+    elapsed = sum(latencies)
+    return {'operations': count, 'seconds': elapsed, 'throughput': count / elapsed,
+            'unit': 'queries/s', 'latency_ms': percentiles(latencies)}
+
+
+def case_find_best_matches(analyzer, rng, options):
+    return _queries(analyzer, rng, options, analyzer.find_best_matches)
+
+
+def case_find_top_k_matches(analyzer, rng, options):
+    analyzer.use_matrix_engine = True
+    analyzer.packed_population()
+    return _queries(analyzer, rng, options, lambda person: analyzer.find_top_k_matches(person, 10))
+
+
+def case_network(analyzer, rng, options):
+    size = len(analyzer.people)
+    if size > options['network_limit']:
+        return {'skipped': f"more than --network-limit {options['network_limit']} people"}
+    analyzer.use_matrix_engine = True
+    start = time.perf_counter()
+    edges = sum(1 for _ in analyzer.iter_friendships())
+    elapsed = time.perf_counter() - start
+    pairs = size * (size - 1)
+    return {'operations': pairs, 'seconds': elapsed, 'throughput': pairs / elapsed,
+            'unit': 'pairs/s', 'edges': edges}
+
+
+CASES = {
+    'score_pairs': case_score_pairs,
+    'score_block': case_score_block,
+    'find_best_matches': case_find_best_matches,
+    'find_top_k_matches': case_find_top_k_matches,
+    'network': case_network,
+}
+
+
+def run_case(spec):
+    """Build the population described by spec and run one case in this process"""
+    generator = spec['generator']
+    size = spec['size']
+    start = time.perf_counter()
+    people = iter_population(size, **generator)
+    if size >= spec['options']['store_threshold']:
+        analyzer = FriendshipAnalyzer(PersonStore())
+    else:
+        analyzer = FriendshipAnalyzer()
+    analyzer.add_people(people)
+    populate_seconds = time.perf_counter() - start
+    result = {'case': spec['case'], 'size': size, 'store': isinstance(analyzer.people, PersonStore),
+              'populate_seconds': populate_seconds}
+    try:
+        result.update(CASES[spec['case']](analyzer, random.Random(generator['seed'] + 1), spec['options']))
+    except ImportError as error:
+        result['skipped'] = str(error)
+    result['peak_memory_mb'] = peak_memory_mb()
+    return result
+
+
+def run_isolated(spec):
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(spec)],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'case': spec['case'], 'size': spec['size'],
+                'error': completed.stderr.strip().splitlines()[-1:] or ['failed']}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {'commit': commit, 'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': numpy_version, 'cpus': os.cpu_count()}
+
+
+def compare(baseline_path, current_path, tolerance):
+    with open(baseline_path) as handle:
+        baseline = {(r['case'], r['size']): r for r in json.load(handle)['results']}
+    with open(current_path) as handle:
+        current = json.load(handle)['results']
+    regressions = 0
+    print(f"{'case':20} {'size':>8} {'throughput':>11} {'p50':>8} {'memory':>8}")
+    for result in current:
+        old = baseline.get((result['case'], result['size']))
+        if old is None or 'throughput' not in old or 'throughput' not in result:
+            continue
+        speed = result['throughput'] / old['throughput']
+        latency = (result['latency_ms']['p50'] / old['latency_ms']['p50']
+                   if result.get('latency_ms') and old.get('latency_ms') else None)
+        memory = (result['peak_memory_mb'] / old['peak_memory_mb']
+                  if result.get('peak_memory_mb') and old.get('peak_memory_mb') else None)
+        worse = speed < 1 - tolerance or (memory is not None and memory > 1 + tolerance)
+        regressions += worse
+        print(f"{result['case']:20} {result['size']:8} {speed:10.2f}x "
+              f"{'' if latency is None else f'{latency:7.2f}x':>8} "
+              f"{'' if memory is None else f'{memory:7.2f}x':>8}{'  REGRESSION' if worse else ''}")
+    return 1 if regressions else 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--vocabulary-size', type=int, default=50)
+    parser.add_argument('--max-interests', type=int, default=5)
+    parser.add_argument('--trait-distribution', choices=TRAIT_DISTRIBUTIONS, default='uniform')
+    parser.add_argument('--type-weights', type=float, nargs=len(PERSON_TYPES), default=None,
+                        help="relative weight of each Person class, in population.PERSON_TYPES order")
+    parser.add_argument('--interest-skew', type=float, default=0.0)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--pairs', type=int, default=100000)
+    parser.add_argument('--network-limit', type=int, default=20000)
+    parser.add_argument('--store-threshold', type=int, default=100000,
+                        help="use a PersonStore from this many people on")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'))
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return 0
+    if args.compare:
+        return compare(*args.compare, args.tolerance)
+
+    generator = {'seed': args.seed, 'vocabulary_size': args.vocabulary_size,
+                 'max_interests': args.max_interests, 'trait_distribution': args.trait_distribution,
+                 'type_weights': args.type_weights, 'interest_skew': args.interest_skew}
+    options = {'queries': args.queries, 'pairs': args.pairs, 'network_limit': args.network_limit,
+               'store_threshold': args.store_threshold}
+    results = []
+    for size in args.sizes:
+        for case in args.cases:
+            result = run_isolated({'case': case, 'size': size, 'generator': generator, 'options': options})
+            results.append(result)
+            summary = result.get('error') or result.get('skipped') or \
+                f"{result['throughput']:12.1f} {result['unit']}"
+            memory = result.get('peak_memory_mb')
+            print(f"{case:20} {size:8}  {summary}"
+                  + (f"  peak {memory:7.1f} MB" if memory else ''), flush=True)
+
+    report = {'suite_version': SUITE_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+              'environment': environment(), 'generator': generator, 'options': options,
+              'results': results}
+    with open(args.output, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
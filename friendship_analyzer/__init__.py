@@ -0,0 +1,66 @@
+"""
+AI-Powered Friendship Compatibility Analyzer
+
+This project analyzes friendship compatibility using Python and OOP.
+Run `python -m friendship_analyzer --help` for the command-line interface.
+"""
+
+from .people import (
+    Person, EmpatheticPerson, LogicalPerson, CreativePerson, ReservedPerson, EnergeticPerson,
+    AnalyticalPerson, AdventurousPerson, IntrovertPerson, HumorousPerson, PERSONALITY_TRAITS,
+    COMMUNICATION_STYLES, SCORED_ATTRIBUTES, StoredPerson, person_class_of, PersonStore
+)
+from .scoring import (
+    ANALYSIS_WEIGHTS, SCORE_COMPONENTS, AGE_BUCKETS, AGE_DEFAULT_SCORE, ScoringKernel,
+    SCORING_PROFILES, register_scoring_profile, DEFAULT_KERNEL, RECIPROCAL_MODES, reciprocal_score,
+    reciprocal_scores, strategy_class, class_strategy, strategy_upper_bound, BATCH_STRATEGIES,
+    register_batch_strategy
+)
+from .engine import PackedPopulation, MINHASH_PRIME, ApproximateMatchIndex
+from .profiling import PROFILED_METHODS, PROFILED_BLOCKS, AnalyzerProfile
+from .graph import FriendshipGraph
+from .edges import (
+    EDGE_FILE_MAGIC, CsvEdgeSink, JsonlEdgeSink, BinaryEdgeSink, EDGE_SINKS, open_edge_sink,
+    read_binary_edges
+)
+from .snapshot import SNAPSHOT_MAGIC, SNAPSHOT_VERSION, write_snapshot, read_snapshot
+from .outofcore import NetworkBuildPlan, SpilledEdges, spill_network
+from .analyzer import (
+    PairScoreCache, CompatibilityExplanation, GroupFormation, StablePairing, ScoreSweep,
+    FriendshipAnalyzer
+)
+from .loading import PERSON_TYPES, person_from_record, iter_person_records, iter_people_chunks, load_people
+
+# Loaded on first use so importing the package does not import asyncio.
+_LAZY = {'MatchService': 'service', 'create_person': 'cli', 'run_demo': 'cli', 'run_tests': 'cli'}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = [
+    'Person', 'EmpatheticPerson', 'LogicalPerson', 'CreativePerson', 'ReservedPerson',
+    'EnergeticPerson', 'AnalyticalPerson', 'AdventurousPerson', 'IntrovertPerson',
+    'HumorousPerson', 'PERSONALITY_TRAITS', 'COMMUNICATION_STYLES', 'SCORED_ATTRIBUTES',
+    'StoredPerson', 'person_class_of', 'PersonStore', 'ANALYSIS_WEIGHTS', 'SCORE_COMPONENTS',
+    'AGE_BUCKETS', 'AGE_DEFAULT_SCORE', 'ScoringKernel', 'SCORING_PROFILES', 'register_scoring_profile',
+    'DEFAULT_KERNEL', 'RECIPROCAL_MODES', 'reciprocal_score', 'reciprocal_scores',
+    'strategy_class', 'class_strategy', 'strategy_upper_bound', 'BATCH_STRATEGIES',
+    'register_batch_strategy',
+    'PackedPopulation', 'MINHASH_PRIME', 'ApproximateMatchIndex',
+    'PROFILED_METHODS', 'PROFILED_BLOCKS', 'AnalyzerProfile', 'FriendshipGraph',
+    'EDGE_FILE_MAGIC', 'CsvEdgeSink', 'JsonlEdgeSink', 'BinaryEdgeSink', 'EDGE_SINKS',
+    'open_edge_sink', 'read_binary_edges', 'SNAPSHOT_MAGIC', 'SNAPSHOT_VERSION',
+    'write_snapshot', 'read_snapshot', 'NetworkBuildPlan', 'SpilledEdges', 'spill_network',
+    'PairScoreCache', 'CompatibilityExplanation', 'GroupFormation', 'StablePairing', 'ScoreSweep',
+    'FriendshipAnalyzer', 'PERSON_TYPES', 'person_from_record', 'iter_person_records',
+    'iter_people_chunks', 'load_people', 'MatchService', 'create_person', 'run_demo',
+    'run_tests'
+]
@@ -0,0 +1,1605 @@
+"""FriendshipAnalyzer and the results of its population-wide analyses"""
+
+import bisect
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from .people import PersonStore, StoredPerson, _unwatch_changes, _watch_changes
+from .scoring import (
+    DEFAULT_KERNEL, SCORE_COMPONENTS, SCORING_PROFILES, ScoringKernel, _require_numpy,
+    reciprocal_score, reciprocal_scores, strategy_class, strategy_upper_bound
+)
+from .engine import (
+    ApproximateMatchIndex, PackedPopulation, _init_network_worker, _score_rows_task,
+    _share_arrays
+)
+from .profiling import AnalyzerProfile, PROFILED_BLOCKS, PROFILED_METHODS, _NO_PHASE
+from .graph import FriendshipGraph
+from .edges import open_edge_sink
+from .snapshot import read_snapshot, write_snapshot
+from .outofcore import spill_network
+
+
+class PairScoreCache:
+    """Bounded LRU cache of pair scores with hit/miss/eviction counters"""
+
+    def __init__(self, maxsize=100000):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return score
+
+    def put(self, key, score):
+        with self._lock:
+            self._entries[key] = score
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CompatibilityExplanation:
+    """Why person1 scored person2 as they did; see FriendshipAnalyzer.explain_many
+
+    components maps each of SCORE_COMPONENTS to its 0-10 score and weights to
+    the kernel's weight; score is their weighted sum, as analyze_compatibility
+    returns it. strategy is the class whose compatibility_strategy person1
+    uses and profile the name of the scoring kernel.
+    """
+
+    def __init__(self, person1, person2, components, weights, strategy, profile, score):
+        self.person1 = person1
+        self.person2 = person2
+        self.components = components
+        self.weights = weights
+        self.strategy = strategy
+        self.profile = profile
+        self.score = score
+
+    @property
+    def contributions(self):
+        """Each component's share of score (component score times weight)"""
+        return {name: value * self.weights[name] for name, value in self.components.items()}
+
+    def as_dict(self):
+        return {
+            'source': self.person1.name,
+            'target': self.person2.name,
+            'score': self.score,
+            'profile': self.profile,
+            'strategy': self.strategy.__name__ if self.strategy else None,
+            'components': dict(self.components),
+            'weights': dict(self.weights),
+        }
+
+    def __repr__(self):
+        return f"<CompatibilityExplanation {self.person1.name} -> {self.person2.name} score={self.score:.2f}>"
+
+
+class GroupFormation:
+    """Result of FriendshipAnalyzer.form_groups
+
+    groups holds lists of people and positions the matching positions in
+    analyzer.people. score is the exact total over every pair inside a group of
+    analyze_compatibility in both directions.
+    """
+
+    def __init__(self, groups, positions, score, passes, swaps, elapsed, complete):
+        self.groups = groups
+        self.positions = positions
+        self.score = score
+        self.passes = passes
+        self.swaps = swaps
+        self.elapsed = elapsed
+        self.complete = complete
+
+    def __repr__(self):
+        return (f"<GroupFormation {len(self.groups)} groups score={self.score:.2f} "
+                f"passes={self.passes} swaps={self.swaps}>")
+
+
+class StablePairing:
+    """Result of FriendshipAnalyzer.stable_pairing
+
+    pairs holds (person1, person2) tuples and positions the matching positions
+    in analyzer.people, with each pair's mutual score in scores; unmatched
+    lists the positions of people left without a partner.
+    """
+
+    def __init__(self, pairs, positions, scores, unmatched, mode, rounds, elapsed):
+        self.pairs = pairs
+        self.positions = positions
+        self.scores = scores
+        self.unmatched = unmatched
+        self.mode = mode
+        self.rounds = rounds
+        self.elapsed = elapsed
+
+    @property
+    def score(self):
+        return sum(self.scores)
+
+    def __repr__(self):
+        return (f"<StablePairing {len(self.pairs)} pairs, {len(self.unmatched)} unmatched "
+                f"{self.mode} score={self.score:.2f}>")
+
+
+def _group_sizes(size, group_size):
+    groups = -(-size // group_size)
+    if groups * (group_size - 1) > size:
+        # No split into group_size and group_size - 1 exists (e.g. 11 into tens);
+        # keep every group at least group_size and spread the rest evenly.
+        groups = max(1, size // group_size)
+    if not size:
+        return []
+    base, larger = divmod(size, groups)
+    return [base + 1] * larger + [base] * (groups - larger)
+
+
+class ScoreSweep:
+    """Distribution of every pair score from one pass, for choosing compatibility_threshold
+
+    counts is a histogram of all ordered pairs (self-pairs excluded) over `bins`
+    equal bins from low to high; scores outside the range land in the end bins.
+    Edges scoring at least retain_threshold are kept (sources, targets, scores
+    in row-major order), so counts at or above it are exact and the network can
+    be materialized for any such threshold without re-scoring. Below it,
+    counts are interpolated from the histogram.
+    """
+
+    def __init__(self, size, counts, low, high, retain_threshold, sources, targets, scores):
+        np = _require_numpy()
+        self.size = size
+        self.counts = counts
+        self.low = low
+        self.high = high
+        self.retain_threshold = retain_threshold
+        self.sources = sources
+        self.targets = targets
+        self.scores = scores
+        self.pair_count = int(counts.sum())
+        self._sorted_scores = np.sort(scores)
+        # _above[b] = pairs in bins b and up
+        self._above = np.concatenate([np.cumsum(counts[::-1])[::-1], [0]])
+
+    @property
+    def bin_width(self):
+        return (self.high - self.low) / len(self.counts)
+
+    def edge_count(self, threshold):
+        """Number of edges a network built at `threshold` would have"""
+        np = _require_numpy()
+        if threshold >= self.retain_threshold:
+            return len(self._sorted_scores) - int(np.searchsorted(self._sorted_scores, threshold))
+        position = min(max((threshold - self.low) / self.bin_width, 0.0), len(self.counts))
+        index = int(position)
+        if index == len(self.counts):
+            return 0
+        partial = self.counts[index] * (index + 1 - position)
+        return int(round(self._above[index + 1] + partial))
+
+    def is_exact(self, threshold):
+        return threshold >= self.retain_threshold
+
+    def average_degree(self, threshold):
+        """Mean friendships per person at `threshold`"""
+        return self.edge_count(threshold) / self.size if self.size else 0.0
+
+    def quantile(self, fraction):
+        """Score below which `fraction` of all pairs fall (histogram estimate)"""
+        np = _require_numpy()
+        if not self.pair_count:
+            return None
+        target = fraction * self.pair_count
+        below = np.cumsum(self.counts)
+        index = min(int(np.searchsorted(below, target)), len(self.counts) - 1)
+        before = below[index] - self.counts[index]
+        inside = (target - before) / self.counts[index] if self.counts[index] else 0.0
+        return self.low + (index + inside) * self.bin_width
+
+    def table(self, thresholds):
+        """[(threshold, edges, average degree, exact)] for each threshold"""
+        return [(t, self.edge_count(t), self.average_degree(t), self.is_exact(t)) for t in thresholds]
+
+    def iter_edges(self, threshold):
+        """Yield (source, target, score) edges at or above threshold, in row-major order"""
+        if threshold < self.retain_threshold:
+            raise ValueError(f"threshold {threshold} is below retain_threshold {self.retain_threshold}; "
+                             "scores under it were not kept")
+        keep = self.scores >= threshold
+        return zip(self.sources[keep].tolist(), self.targets[keep].tolist(), self.scores[keep].tolist())
+
+
+class FriendshipAnalyzer:
+    def __init__(self, people=None):
+        # `people` may be a PersonStore for populations too large for Person objects.
+        self.people = people if people is not None else []
+        self.compatibility_threshold = 7.0
+        self.use_matrix_engine = False
+        self.symmetric_pairs = True
+        self.block_size = 1024
+        self._population = None
+        self._population_key = None
+        self._summaries = None
+        self._summaries_key = None
+        self.use_interest_index = True
+        self.interest_ids = {}
+        self._interest_postings = []
+        self._interest_bits = {}
+        self._positions = {}
+        self._indexed_count = 0
+        self._changed = set()  # watched people reassigned since the last index sync
+        self._last_change = 0  # version of the latest of those reassignments
+        self._watched = None
+        self._ref = weakref.ref(self)
+        self.incremental_network = False
+        self.workers = None
+        self.chunk_size = 256
+        self.total_friendships = 0
+        self._followers = None
+        self._revision = 0
+        self.score_cache = None
+        self.use_approximate_matching = False
+        self.approximate_options = {}
+        self._approximate_index = None
+        self._approximate_key = None
+        self._population_identities = None
+        self.profile = None
+        self._person_ids = {}
+        self._next_person_id = 0
+        self.kernel = DEFAULT_KERNEL
+        self.reciprocal_matching = None  # a RECIPROCAL_MODES name ranks matches by mutual score
+
+    def add_person(self, person):
+        self.people.append(person)
+        person = self.people[-1]  # a PersonStore hands back a view of its copy
+        if self.score_cache is not None:
+            self._register_person_id(person)
+        if self.use_interest_index and self._indexed_count == len(self.people) - 1:
+            self._index_person(person, len(self.people) - 1)
+        if self.incremental_network:
+            self._connect_person(person)
+
+    def add_people(self, people):
+        """Add many people at once; equivalent to add_person for each"""
+        if self.incremental_network:
+            for person in people:
+                self.add_person(person)
+            return
+        start = len(self.people)
+        self.people.extend(people)
+        if self.score_cache is not None:
+            for position in range(start, len(self.people)):
+                self._register_person_id(self.people[position])
+        if self.use_interest_index and self._indexed_count == start:
+            for position in range(start, len(self.people)):
+                self._index_person(self.people[position], position)
+
+    def remove_person(self, person):
+        """Remove a person and every edge to or from them"""
+        self._sync_interest_index()
+        if person not in self._positions:
+            raise ValueError(f"{person.name} is not in the analyzer")
+        self._disconnect_person(person)
+        if not isinstance(person, StoredPerson):
+            _unwatch_changes(person, self._ref)
+        self._changed.discard(person)
+        if not self.incremental_network:
+            # Outside incremental mode friendships may be edited directly before the
+            # next removal, so the reverse adjacency is rebuilt each time.
+            self._followers = None
+        position = self._positions.pop(person)
+        del self.people[position]
+        for later in self.people[position:]:
+            self._positions[later] -= 1
+        self._unindex_interests(person)
+        self._indexed_count -= 1
+        self._person_ids.pop(person, None)
+        self._revision += 1
+
+    def update_person(self, person, **changes):
+        """Change a person's attributes and, in incremental mode, rescore their row and column
+
+        Accepts name, age, interests, personality_traits and communication_style.
+        """
+        unknown = set(changes) - {'name', 'age', 'interests', 'personality_traits', 'communication_style'}
+        if unknown:
+            raise TypeError(f"update_person() got unexpected attributes: {', '.join(sorted(unknown))}")
+        self._sync_interest_index()
+        if person not in self._positions:
+            raise ValueError(f"{person.name} is not in the analyzer")
+        if self.incremental_network:
+            self._disconnect_person(person)
+        self._unindex_interests(person)
+        for attribute, value in changes.items():
+            setattr(person, attribute, value)
+        self._indexed_count -= 1
+        self._index_person(person, self._positions[person])
+        if person not in self._changed:
+            self.invalidate_person(person)
+        self._revision += 1
+        if self.incremental_network:
+            self._connect_person(person)
+
+    def interest_id(self, interest):
+        """Intern an interest name as a small integer id"""
+        interest_id = self.interest_ids.get(interest)
+        if interest_id is None:
+            interest_id = self.interest_ids[interest] = len(self.interest_ids)
+            self._interest_postings.append(set())
+        return interest_id
+
+    def interest_bits(self, person):
+        """Bitset of the person's interned interest ids"""
+        indexed = self._interest_bits.get(person)
+        if indexed is not None and indexed[0] == person.version:
+            return indexed[1]
+        bits = 0
+        for interest in person.interests:
+            bits |= 1 << self.interest_id(interest)
+        return bits
+
+    def _index_person(self, person, position):
+        bits = 0
+        for interest in person.interests:
+            interest_id = self.interest_id(interest)
+            self._interest_postings[interest_id].add(person)
+            bits |= 1 << interest_id
+        self._interest_bits[person] = (person.version, bits)
+        self._positions[person] = position
+        self._indexed_count += 1
+        self._watch(person)
+
+    def _unindex_interests(self, person):
+        _, bits = self._interest_bits.pop(person, (None, 0))
+        while bits:
+            low_bit = bits & -bits
+            self._interest_postings[low_bit.bit_length() - 1].discard(person)
+            bits ^= low_bit
+
+    def _sync_interest_index(self):
+        # Rebuild when people were added without add_person, and reindex anyone
+        # whose interests were reassigned since the last sync (see _person_changed).
+        if self._indexed_count != len(self.people):
+            self._changed.clear()
+            with self._phase('build interest index'):
+                self._interest_postings = [set() for _ in self.interest_ids]
+                self._interest_bits = {}
+                self._positions = {}
+                self._indexed_count = 0
+                for position, person in enumerate(self.people):
+                    self._index_person(person, position)
+        else:
+            changed = self._changed
+            while changed:
+                person = changed.pop()
+                indexed = self._interest_bits.get(person)
+                if indexed is not None and indexed[0] != person.version:
+                    self._unindex_interests(person)
+                    self._indexed_count -= 1
+                    self._index_person(person, self._positions[person])
+
+    def _watch(self, person):
+        _watch_changes(person._store if isinstance(person, StoredPerson) else person, self._ref)
+
+    def _person_changed(self, person):
+        # Called from people.py when a watched person's scored attribute is
+        # reassigned, possibly from another thread: only record it here. Each
+        # person counts as one invalidation until the next index sync.
+        self._last_change = person.version
+        if person not in self._changed:
+            self._changed.add(person)
+            self.invalidate_person(person)
+
+    def interest_candidates(self, person):
+        """People sharing at least one interest with `person`, in self.people order"""
+        self._sync_interest_index()
+        candidates = set()
+        for interest in set(person.interests):
+            interest_id = self.interest_ids.get(interest)
+            if interest_id is not None:
+                candidates |= self._interest_postings[interest_id]
+        candidates = sorted(candidates, key=self._positions.__getitem__)
+        return [other_person for other_person in candidates if other_person != person]
+
+    def calculate_interest_compatibility(self, person1, person2):
+        # Always read person.interests; the interned bitsets only serve candidate
+        # generation and the top-k bound.
+        shared_interests = set(person1.interests) & set(person2.interests)
+        total_interests = set(person1.interests) | set(person2.interests)
+        if not total_interests:
+            return 0
+        return (len(shared_interests) / len(total_interests)) * 10
+
+    def calculate_personality_compatibility(self, person1, person2):
+        score = 0
+        traits = self.kernel.traits or person1.personality_traits.keys()
+        for trait in traits:
+            score += 10 - abs(person1.personality_traits[trait] - person2.personality_traits[trait])
+        return score / len(traits)
+
+    def calculate_communication_compatibility(self, person1, person2):
+        score = 0
+        styles = self.kernel.styles or person1.communication_style.keys()
+        for style in styles:
+            score += 10 - abs(person1.communication_style[style] - person2.communication_style[style])
+        return score / len(styles)
+
+    def calculate_age_compatibility(self, person1, person2):
+        return self.kernel.age_score(abs(person1.age - person2.age))
+
+    def calculate_strategy_compatibility(self, person1, person2):
+        return person1.compatibility_strategy(person2)
+
+    def analyze_compatibility(self, person1, person2):
+        cache = self.score_cache
+        if cache is not None:
+            key = self._score_cache_key(person1, person2)
+            if key is not None:
+                score = cache.get(key)
+                if score is not None:
+                    return score
+
+        interest_score = self.calculate_interest_compatibility(person1, person2)
+        personality_score = self.calculate_personality_compatibility(person1, person2)
+        communication_score = self.calculate_communication_compatibility(person1, person2)
+        age_score = self.calculate_age_compatibility(person1, person2)
+        strategy_score = self.calculate_strategy_compatibility(person1, person2)
+
+        interests, personality, communication, age, strategy = self.kernel.weights
+
+        overall_score = (
+            interest_score * interests +
+            personality_score * personality +
+            communication_score * communication +
+            age_score * age +
+            strategy_score * strategy
+        )
+
+        if cache is not None and key is not None:
+            cache.put(key, overall_score)
+        return overall_score
+
+    def explain_compatibility(self, person1, person2):
+        """CompatibilityExplanation of analyze_compatibility(person1, person2)
+
+        Scored with the per-pair calculate_* methods, so one explanation
+        neither packs the population nor needs NumPy; see explain_many for
+        explaining many pairs at once.
+        """
+        kernel = self.kernel
+        components = {
+            'interests': self.calculate_interest_compatibility(person1, person2),
+            'personality': self.calculate_personality_compatibility(person1, person2),
+            'communication': self.calculate_communication_compatibility(person1, person2),
+            'age': self.calculate_age_compatibility(person1, person2),
+            'strategy': self.calculate_strategy_compatibility(person1, person2),
+        }
+        interests, personality, communication, age, strategy = kernel.weights
+        score = (
+            components['interests'] * interests +
+            components['personality'] * personality +
+            components['communication'] * communication +
+            components['age'] * age +
+            components['strategy'] * strategy
+        )
+        return CompatibilityExplanation(person1, person2, components, kernel.weight_map,
+                                        strategy_class(person1), kernel.name, score)
+
+    def explain_many(self, pairs):
+        """CompatibilityExplanation for each (person1, person2) in pairs, scored as one batch
+
+        Components come from the matrix engine's per-pair methods
+        (PackedPopulation.component_pairs), scored with self.kernel, so
+        explaining many pairs costs about as much as scoring them. The packed
+        population is used when it is already current; otherwise only the
+        people in `pairs` are packed, so a few pairs never repack everyone.
+        """
+        pairs = [tuple(pair) for pair in pairs]
+        if not pairs:
+            return []
+        rows = None
+        population = self._population
+        if population is not None and self._population_key == self._people_key():
+            rows = [(population.row_of(person1), population.row_of(person2)) for person1, person2 in pairs]
+        if rows is None or any(None in pair for pair in rows):
+            with self._phase('pack population'):
+                population = PackedPopulation(list({id(p): p for pair in pairs for p in pair}.values()))
+            rows = [(population.row_of(person1), population.row_of(person2)) for person1, person2 in pairs]
+        sources, targets = zip(*rows)
+        kernel = self.kernel
+        with self._phase('explain pairs'):
+            components = population.component_pairs(sources, targets, kernel)
+            scores = population.score_pairs(sources, targets, kernel, components).tolist()
+            columns = [components[name].tolist() for name in SCORE_COMPONENTS]
+        return [CompatibilityExplanation(person1, person2, dict(zip(SCORE_COMPONENTS, values)),
+                                         kernel.weight_map, strategy_class(person1), kernel.name, score)
+                for (person1, person2), values, score in zip(pairs, zip(*columns), scores)]
+
+    def enable_profiling(self):
+        """Time PROFILED_METHODS and the engine's blocks; returns the AnalyzerProfile
+
+        Timed wrappers are installed as instance attributes, so an analyzer that
+        never enables profiling runs the plain methods.
+        """
+        if self.profile is None:
+            self.profile = AnalyzerProfile()
+            self.profile.instrument(self, PROFILED_METHODS)
+            if self._population is not None:
+                self.profile.instrument(self._population, PROFILED_BLOCKS)
+        return self.profile
+
+    def disable_profiling(self):
+        """Remove the timed wrappers; returns the collected AnalyzerProfile"""
+        profile, self.profile = self.profile, None
+        if profile is not None:
+            for name in PROFILED_METHODS:
+                self.__dict__.pop(name, None)
+            if self._population is not None:
+                for name in PROFILED_BLOCKS:
+                    self._population.__dict__.pop(name, None)
+        return profile
+
+    def _phase(self, name):
+        return _NO_PHASE if self.profile is None else self.profile.phase(name)
+
+    def enable_score_cache(self, maxsize=100000):
+        """Memoize analyze_compatibility for people in the analyzer; returns the PairScoreCache
+
+        Entries are keyed by each person's version, so reassigning age,
+        interests, personality_traits or communication_style (directly or
+        through update_person) invalidates their scores. Editing the interests
+        list or a score dict in place does not: call invalidate_person after.
+        """
+        self.score_cache = PairScoreCache(maxsize)
+        for person in self.people:
+            self._register_person_id(person)
+        return self.score_cache
+
+    def person_id(self, person):
+        """Stable id the score cache knows person by, or None"""
+        entry = self._person_ids.get(person)
+        return entry[0] if entry else None
+
+    def invalidate_person(self, person):
+        """Drop cached scores involving person, e.g. after editing their interests or scores in place"""
+        entry = self._person_ids.get(person)
+        if entry is not None:
+            entry[1] += 1
+            if self.score_cache is not None:
+                self.score_cache.invalidations += 1
+
+    def _register_person_id(self, person):
+        if person not in self._person_ids:
+            self._person_ids[person] = [self._next_person_id, 0]
+            self._next_person_id += 1
+            self._watch(person)
+
+    def _score_cache_key(self, person1, person2):
+        # Versions and the kernel are part of the key, so invalidated entries and
+        # scores under another profile are never hit again and age out of the LRU order.
+        entry1 = self._person_ids.get(person1)
+        entry2 = self._person_ids.get(person2)
+        if entry1 is None or entry2 is None:
+            return None
+        return (entry1[0], entry1[1], person1.version, entry2[0], entry2[1], person2.version, self.kernel)
+
+    def symmetric_compatibility(self, person1, person2):
+        """Weighted sum of the direction-independent terms of analyze_compatibility
+
+        Adding person1.compatibility_strategy(person2) * weights['strategy'] to this
+        gives exactly analyze_compatibility(person1, person2). It equals the result
+        for (person2, person1) only when both share the same trait key order
+        (see has_symmetric_traits).
+        """
+        weights = self.kernel.weight_map
+        return (
+            self.calculate_interest_compatibility(person1, person2) * weights['interests'] +
+            self.calculate_personality_compatibility(person1, person2) * weights['personality'] +
+            self.calculate_communication_compatibility(person1, person2) * weights['communication'] +
+            self.calculate_age_compatibility(person1, person2) * weights['age']
+        )
+
+    @staticmethod
+    def has_symmetric_traits(person1, person2):
+        return (tuple(person1.personality_traits) == tuple(person2.personality_traits) and
+                tuple(person1.communication_style) == tuple(person2.communication_style))
+
+    def _people_key(self):
+        # Identifies the current population for the packed array and summary caches;
+        # _last_change moves whenever one of them has a scored attribute reassigned.
+        people = self.people
+        if isinstance(people, PersonStore):
+            if self._watched is not people:
+                _watch_changes(people, self._ref)
+                self._watched = people
+            return (self._revision, self._last_change, id(people), people.revision)
+        ids = tuple(map(id, people))
+        identity = hash(ids)
+        if self._watched != identity:
+            ref = self._ref
+            for person in people:
+                refs = getattr(person, '_watchers', None)
+                if refs is None or ref not in refs:
+                    self._watch(person)
+            self._watched = identity
+        return (self._revision, self._last_change, ids)
+
+    def packed_population(self):
+        """Return the packed arrays for self.people, repacking if the list changed"""
+        key = self._people_key()
+        if self._population is None or key != self._population_key:
+            with self._phase('pack population'):
+                self._population = PackedPopulation(self.people)
+            if self.profile is not None:
+                self.profile.instrument(self._population, PROFILED_BLOCKS)
+            self._population_key = key
+        return self._population
+
+    def iter_compatibility_blocks(self, block_size=None):
+        """Yield (first_row, block) slices of the compatibility matrix"""
+        population = self.packed_population()
+        block_size = block_size or self.block_size
+        for start in range(0, population.size, block_size):
+            rows = range(start, min(start + block_size, population.size))
+            yield start, population.score_block(rows, kernel=self.kernel)
+
+    def _kernels(self, profiles):
+        kernels = []
+        for profile in profiles:
+            if isinstance(profile, ScoringKernel):
+                kernels.append(profile)
+            elif profile in SCORING_PROFILES:
+                kernels.append(SCORING_PROFILES[profile])
+            else:
+                raise ValueError(f"unknown scoring profile {profile!r}")
+        return kernels
+
+    def use_profile(self, profile):
+        """Score with a registered profile name or a ScoringKernel from now on; returns the kernel"""
+        self.kernel = self._kernels([profile])[0]
+        return self.kernel
+
+    def iter_profile_blocks(self, profiles, block_size=None):
+        """Yield (first_row, [block per profile]) slices, scoring every profile in one pass"""
+        kernels = self._kernels(profiles)
+        population = self.packed_population()
+        block_size = block_size or self.block_size
+        for start in range(0, population.size, block_size):
+            rows = range(start, min(start + block_size, population.size))
+            yield start, population.score_blocks(rows, kernels)
+
+    def compare_profiles(self, profiles, threshold=None):
+        """Network statistics per profile from one pass over every pair
+
+        Returns {name: {'edges', 'average_degree', 'mean_score'}}, edges counting
+        ordered pairs at or above threshold (compatibility_threshold by default).
+        """
+        np = _require_numpy()
+        kernels = self._kernels(profiles)
+        threshold = self.compatibility_threshold if threshold is None else threshold
+        identities = self._identities(self.packed_population())
+        edges = [0] * len(kernels)
+        totals = [0.0] * len(kernels)
+        pairs = 0
+        for start, blocks in self.iter_profile_blocks(kernels):
+            rows = np.arange(start, start + len(blocks[0]))
+            keep = identities[rows][:, None] != identities[None, :]
+            pairs += int(keep.sum())
+            for index, block in enumerate(blocks):
+                values = block[keep]
+                edges[index] += int(np.count_nonzero(values >= threshold))
+                totals[index] += float(values.sum())
+        size = len(self.people)
+        return {kernel.name: {'edges': edges[index],
+                              'average_degree': edges[index] / size if size else 0.0,
+                              'mean_score': totals[index] / pairs if pairs else 0.0}
+                for index, kernel in enumerate(kernels)}
+
+    def compatibility_matrix(self, block_size=None):
+        """Return the N x N matrix where [i, j] == analyze_compatibility(people[i], people[j])"""
+        np = _require_numpy()
+        matrix = np.empty((len(self.people), len(self.people)), dtype=np.float64)
+        for start, block in self.iter_compatibility_blocks(block_size):
+            matrix[start:start + len(block)] = block
+        return matrix
+
+    def _engine_row(self, person):
+        population = self.packed_population()
+        row = population.row_of(person)
+        if row is not None:
+            return population, population.score_block([row], kernel=self.kernel)[0]
+        population = PackedPopulation(list(self.people) + [person])
+        return population, population.score_block([population.size - 1], kernel=self.kernel)[0][:-1]
+
+    def find_best_matches(self, person):
+        if self.reciprocal_matching:
+            return self.find_reciprocal_matches(person)
+        if self.use_approximate_matching:
+            return self.find_approximate_matches(person)
+        matches = []
+        if self.use_matrix_engine and self.people:
+            _, scores = self._engine_row(person)
+            for other_person, score in zip(self.people, scores.tolist()):
+                if other_person != person:
+                    matches.append((other_person, score))
+        else:
+            for other_person in self.people:
+                if other_person != person:
+                    score = self.analyze_compatibility(person, other_person)
+                    matches.append((other_person, score))
+
+        matches.sort(key=lambda x: x[1], reverse=True)
+        return matches
+
+    def match_summary(self, person):
+        """Per-person values the top-k upper bound is computed from"""
+        return (
+            self.interest_bits(person),
+            person.age,
+            frozenset(person.personality_traits),
+            sum(person.personality_traits.values()),
+            frozenset(person.communication_style),
+            sum(person.communication_style.values()),
+        )
+
+    def _match_summaries(self):
+        key = self._people_key()
+        if self._summaries is None or key != self._summaries_key:
+            self._summaries = [self.match_summary(p) for p in self.people]
+            self._summaries_key = key
+        return self._summaries
+
+    def _summary_bound(self, summary1, summary2, strategy_bound):
+        bits1, age1, traits1, trait_sum1, styles1, style_sum1 = summary1
+        bits2, age2, traits2, trait_sum2, styles2, style_sum2 = summary2
+        kernel = self.kernel
+        weights = kernel.weight_map
+        bound = strategy_bound * weights['strategy']
+
+        # Interned interest bitsets give the exact interest score cheaply.
+        total = (bits1 | bits2).bit_count()
+        if total:
+            bound += (bits1 & bits2).bit_count() / total * 10 * weights['interests']
+        # sum(10 - |a - b|) <= 10 * n - |sum(a) - sum(b)| when both cover the same
+        # keys and those are the keys scored
+        if traits1 and traits1 == traits2 and kernel.traits is None:
+            bound += (10 - abs(trait_sum1 - trait_sum2) / len(traits1)) * weights['personality']
+        else:
+            bound += 10 * weights['personality']
+        if styles1 and styles1 == styles2 and kernel.styles is None:
+            bound += (10 - abs(style_sum1 - style_sum2) / len(styles1)) * weights['communication']
+        else:
+            bound += 10 * weights['communication']
+
+        age_score = kernel.age_score(abs(age1 - age2))
+        # The terms are added in a different order from analyze_compatibility,
+        # so leave a little slack for rounding.
+        return bound + age_score * weights['age'] + 1e-9
+
+    def compatibility_upper_bound(self, person1, person2):
+        """Cheap upper bound of analyze_compatibility(person1, person2)
+
+        Combines the exact age and interest scores, the trait-sum bound for
+        personality and communication and the max_strategy_score declared by
+        person1's class.
+        """
+        return self._summary_bound(self.match_summary(person1), self.match_summary(person2),
+                                   strategy_upper_bound(person1))
+
+    def find_top_k_matches(self, person, k, min_score=None):
+        """Return find_best_matches(person)[:k], dropping scores below min_score
+
+        Candidates are visited in order of their upper bound and the search stops
+        once no remaining candidate can beat the current k-th best score.
+        """
+        if k <= 0:
+            return []
+        if self.reciprocal_matching:
+            return self.find_reciprocal_matches(person, k, min_score=min_score)
+        if self.use_approximate_matching:
+            return self.find_approximate_matches(person, k, min_score)
+        if self.use_matrix_engine and self.people:
+            return self._find_top_k_matches_engine(person, k, min_score)
+
+        summary = self.match_summary(person)
+        strategy_bound = strategy_upper_bound(person)
+        bound_of = self._summary_bound
+        candidates = []
+        for index, (other_person, other_summary) in enumerate(zip(self.people, self._match_summaries())):
+            if other_person != person:
+                bound = bound_of(summary, other_summary, strategy_bound)
+                if min_score is None or bound >= min_score:
+                    candidates.append((-bound, index, other_person))
+        # Pop candidates lazily by descending bound instead of sorting them all.
+        heapq.heapify(candidates)
+
+        # Min-heap of (score, -index): the root is the entry that would sort last.
+        heap = []
+        while candidates:
+            negative_bound, index, other_person = heapq.heappop(candidates)
+            if len(heap) == k and -negative_bound < heap[0][0]:
+                break
+            score = self.analyze_compatibility(person, other_person)
+            if min_score is not None and score < min_score:
+                continue
+            entry = (score, -index, other_person)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+        heap.sort(key=lambda e: (-e[0], -e[1]))
+        return [(other_person, score) for score, _, other_person in heap]
+
+    def approximate_index(self):
+        """ApproximateMatchIndex over self.people, built with self.approximate_options"""
+        key = (self._people_key(), sorted(self.approximate_options.items()), self.kernel)
+        if self._approximate_index is None or key != self._approximate_key:
+            population = self.packed_population()
+            with self._phase('build approximate index'):
+                self._approximate_index = ApproximateMatchIndex(population, kernel=self.kernel,
+                                                                **self.approximate_options)
+            self._approximate_key = key
+        return self._approximate_index
+
+    def find_approximate_matches(self, person, k=None, min_score=None):
+        """Like find_top_k_matches, but only candidates from approximate_index() are scored
+
+        Scores are exact; a match is missed only if it shares no bucket with person.
+        """
+        index = self.approximate_index()
+        candidates = index.candidates(person)
+        row = index.population.row_of(person)
+        if row is not None and len(candidates):
+            scores = index.population.score_block([row], candidates, self.kernel)[0].tolist()
+        else:
+            scores = [self.analyze_compatibility(person, self.people[c]) for c in candidates.tolist()]
+        matches = []
+        for candidate, score in zip(candidates.tolist(), scores):
+            other_person = self.people[candidate]
+            if other_person != person and (min_score is None or score >= min_score):
+                matches.append((other_person, score))
+        matches.sort(key=lambda x: x[1], reverse=True)
+        return matches if k is None else matches[:k]
+
+    def _reciprocal_mode(self, mode):
+        return mode or self.reciprocal_matching or 'harmonic'
+
+    def mutual_compatibility(self, person1, person2, mode=None):
+        """reciprocal_score of the two people's scores of each other
+
+        mode is one of RECIPROCAL_MODES, by default reciprocal_matching or 'harmonic'.
+        """
+        forward, backward = self.score_both_ways(person1, person2)
+        return reciprocal_score(forward, backward, self._reciprocal_mode(mode))
+
+    def find_reciprocal_matches(self, person, k=None, mode=None, min_score=None):
+        """Like find_top_k_matches, ranked by mutual_compatibility instead of person's own view
+
+        person's scores of everyone (score_block) and everyone's scores of
+        person (score_pairs) are computed as two batches, so people who would
+        rank person poorly drop down the list. Returns every match when k is None.
+        """
+        np = _require_numpy()
+        size = len(self.people)
+        if not size or k is not None and k <= 0:
+            return []
+        population = self.packed_population()
+        row = population.row_of(person)
+        if row is None:
+            population = PackedPopulation(list(self.people) + [person])
+            row = size
+        forward = population.score_block([row], range(size), self.kernel)[0]
+        backward = population.score_pairs(np.arange(size), np.full(size, row), self.kernel)
+        mutual = reciprocal_scores(forward, backward, self._reciprocal_mode(mode))
+        order = np.argsort(-mutual, kind='stable')
+        matches = []
+        for index, score in zip(order.tolist(), mutual[order].tolist()):
+            if min_score is not None and score < min_score:
+                break
+            other_person = self.people[index]
+            if other_person != person:
+                matches.append((other_person, score))
+                if len(matches) == k:
+                    break
+        return matches
+
+    def _find_top_k_matches_engine(self, person, k, min_score):
+        np = _require_numpy()
+        _, scores = self._engine_row(person)
+        keep = np.array([other != person for other in self.people], dtype=bool)
+        return [(self.people[i], score) for i, score in self._top_k_columns(scores, keep, k, min_score)]
+
+    @staticmethod
+    def _top_k_columns(scores, keep, k, min_score):
+        # (column, score) of the k best kept scores, ties in column order.
+        np = _require_numpy()
+        if min_score is not None:
+            keep &= scores >= min_score
+        indices = np.flatnonzero(keep)
+        if len(indices) > k:
+            kth = np.partition(scores[indices], len(indices) - k)[len(indices) - k]
+            indices = indices[scores[indices] >= kth]
+        indices = indices[np.lexsort((indices, -scores[indices]))[:k]]
+        return list(zip(indices.tolist(), scores[indices].tolist()))
+
+    def top_k_positions(self, positions, k, min_score=None):
+        """find_top_k_matches for the people at `positions`, as [(position, score), ...] lists
+
+        All rows are scored together in engine blocks of up to block_size rows,
+        which is how MatchService answers a batch of queries at once. With
+        reciprocal_matching set, each block is also scored the other way
+        (score_block_both_ways) and ranked by the mutual score, as
+        find_reciprocal_matches ranks it.
+        """
+        population = self.packed_population()
+        identities = self._identities(population)
+        mode = self.reciprocal_matching
+        positions = list(positions)
+        results = []
+        for start in range(0, len(positions), self.block_size):
+            rows = positions[start:start + self.block_size]
+            if mode:
+                forward, backward = population.score_block_both_ways(rows, range(population.size), self.kernel)
+                block = reciprocal_scores(forward, backward, mode)
+            else:
+                block = population.score_block(rows, kernel=self.kernel)
+            for row, scores in zip(rows, block):
+                if k <= 0:
+                    results.append([])
+                else:
+                    keep = identities != identities[row]
+                    results.append(self._top_k_columns(scores, keep, k, min_score))
+        return results
+
+    def create_friendship_network(self):
+        self._store_friendships(self.iter_friendships())
+
+    def _store_friendships(self, edges):
+        # Rebuilding replaces the previous network instead of appending to it.
+        people = self.people
+        with self._phase('reset friendships'):
+            for person in people:
+                person.friendships = []
+        with self._phase('build network'):
+            for source, target, score in edges:
+                people[source].friendships.append({
+                    'friend': people[target],
+                    'compatibility_score': score
+                })
+        if isinstance(people, PersonStore):
+            self.total_friendships = sum(map(len, people.friendships.values()))
+        else:
+            self.total_friendships = sum(len(person.friendships) for person in people)
+        self._followers = None
+
+    def score_sweep(self, retain_threshold=None, bins=1000, low=0.0, high=10.0):
+        """Score every ordered pair once with the matrix engine and return a ScoreSweep
+
+        Edges at or above retain_threshold (compatibility_threshold by default)
+        are kept for apply_threshold; lower it to explore lower thresholds
+        exactly, at the cost of keeping more edges in memory.
+        """
+        np = _require_numpy()
+        if retain_threshold is None:
+            retain_threshold = self.compatibility_threshold
+        population = self.packed_population()
+        identities = self._identities(population)
+        counts = np.zeros(bins, dtype=np.int64)
+        scale = bins / (high - low)
+        sources, targets, scores = [], [], []
+        with self._phase('score sweep'):
+            for start, block in self.iter_compatibility_blocks():
+                rows = np.arange(start, start + len(block))
+                pairs = identities[rows][:, None] != identities[None, :]
+                values = block[pairs]
+                counts += np.bincount(np.clip(((values - low) * scale).astype(np.int64), 0, bins - 1),
+                                      minlength=bins)
+                row, column = np.nonzero(pairs & (block >= retain_threshold))
+                sources.append((row + start).astype(np.int32))
+                targets.append(column.astype(np.int32))
+                scores.append(block[row, column])
+        join = lambda parts, dtype: np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+        return ScoreSweep(population.size, counts, low, high, retain_threshold,
+                          join(sources, np.int32), join(targets, np.int32), join(scores, np.float64))
+
+    def apply_threshold(self, sweep, threshold):
+        """Set compatibility_threshold and build the network from a ScoreSweep's kept edges
+
+        Gives the same friendships as create_friendship_network at that
+        threshold without scoring anything; threshold must be at least
+        sweep.retain_threshold.
+        """
+        edges = sweep.iter_edges(threshold)
+        self.compatibility_threshold = threshold
+        self._store_friendships(edges)
+
+    def iter_friendships(self):
+        """Yield (source, target, score) for every edge at or above compatibility_threshold
+
+        Sources and targets are positions in self.people. Nothing is stored on the
+        people, so edges can be streamed to disk (see export_friendships) for
+        networks that do not fit in memory.
+
+        Each source's edges come in target order in every mode, which is the
+        order create_friendship_network appends them. The order across sources
+        depends on the mode. The matrix engine, workers, symmetric_pairs = False
+        and build_network_out_of_core give row-major order (by source, then
+        target). The default symmetric scan yields (i, j) and (j, i) as soon as
+        it scores the pair, so sources interleave.
+
+        With workers > 1, populations whose compatibility_strategy has no
+        registered batch form for some class are scored in this process by
+        the matrix engine instead, as workers never see the Person objects.
+        """
+        if self.workers and self.workers > 1:
+            if self.packed_population().has_batch_strategies():
+                return self._iter_friendships_parallel()
+            return self._iter_friendships_blocked()
+        if self.use_matrix_engine:
+            return self._iter_friendships_blocked()
+        if self.symmetric_pairs:
+            return self._iter_friendships_symmetric()
+        return self._iter_friendships_ordered()
+
+    def _iter_friendships_ordered(self):
+        for i, person in enumerate(self.people):
+            for j, other_person in enumerate(self.people):
+                if person != other_person:
+                    score = self.analyze_compatibility(person, other_person)
+                    if score >= self.compatibility_threshold:
+                        yield i, j, score
+
+    def _iter_friendships_symmetric(self):
+        # Visits each unordered pair once. Yielding (i, j) then (j, i) keeps each
+        # person's edges in people order: person j receives edges from rows i < j
+        # before its own row.
+        threshold = self.compatibility_threshold
+        people = self.people
+        for i, person, partners in self._network_partners():
+            for j in partners:
+                other_person = people[j]
+                if person == other_person:
+                    continue
+                score, reverse_score = self.score_both_ways(person, other_person)
+                if score >= threshold:
+                    yield i, j, score
+                if reverse_score >= threshold:
+                    yield j, i, reverse_score
+
+    def score_both_ways(self, person1, person2):
+        """Return (analyze_compatibility(p1, p2), analyze_compatibility(p2, p1)) sharing the symmetric terms"""
+        if self.has_symmetric_traits(person1, person2):
+            strategy_weight = self.kernel.weight_map['strategy']
+            base = self.symmetric_compatibility(person1, person2)
+            return (base + self.calculate_strategy_compatibility(person1, person2) * strategy_weight,
+                    base + self.calculate_strategy_compatibility(person2, person1) * strategy_weight)
+        return self.analyze_compatibility(person1, person2), self.analyze_compatibility(person2, person1)
+
+    def _connect_person(self, person):
+        # Score one row and column; edges into `person` are inserted where a full
+        # rebuild would have put them, keeping every friendships list in people order.
+        self._sync_interest_index()
+        followers = self._ensure_followers()
+        followers.setdefault(person, [])
+        threshold = self.compatibility_threshold
+        position_of = lambda friendship: self._positions[friendship['friend']]
+        person.friendships = []
+        for other_person in self.people:
+            if other_person == person:
+                continue
+            score, reverse_score = self.score_both_ways(person, other_person)
+            if score >= threshold:
+                person.friendships.append({'friend': other_person, 'compatibility_score': score})
+                followers.setdefault(other_person, []).append(person)
+            if reverse_score >= threshold:
+                bisect.insort(other_person.friendships,
+                              {'friend': person, 'compatibility_score': reverse_score},
+                              key=position_of)
+                followers[person].append(other_person)
+                self.total_friendships += 1
+        self.total_friendships += len(person.friendships)
+
+    def _disconnect_person(self, person):
+        followers = self._ensure_followers()
+        for follower in followers.pop(person, []):
+            remaining = [f for f in follower.friendships if f['friend'] != person]
+            self.total_friendships -= len(follower.friendships) - len(remaining)
+            follower.friendships = remaining
+        for friendship in person.friendships:
+            followers[friendship['friend']].remove(person)
+        self.total_friendships -= len(person.friendships)
+        person.friendships = []
+
+    def _ensure_followers(self):
+        # Reverse adjacency (who has an edge to each person), built on first use.
+        if self._followers is None:
+            self._followers = {person: [] for person in self.people}
+            for person in self.people:
+                for friendship in person.friendships:
+                    self._followers.setdefault(friendship['friend'], []).append(person)
+        return self._followers
+
+    def _network_partners(self):
+        """Yield (i, person, positions j > i whose pair with person can reach the threshold)
+
+        With the interest index only pairs sharing an interest are enumerated, plus
+        pairs whose other components alone could still reach the threshold: those
+        in another trait key group, or whose trait sums are within the window
+        allowed by the remaining slack (sum(10 - |a - b|) <= 10 * n - |sum(a) - sum(b)|).
+        """
+        people = self.people
+        if not self.use_interest_index:
+            for i, person in enumerate(people):
+                yield i, person, range(i + 1, len(people))
+            return
+
+        self._sync_interest_index()
+        kernel = self.kernel
+        weights = kernel.weight_map
+        best_strategy = max(map(strategy_upper_bound, people), default=0)
+        slack = (10 * weights['personality'] + 10 * weights['communication'] +
+                 kernel.max_age_score * weights['age'] +
+                 best_strategy * weights['strategy'] - self.compatibility_threshold + 1e-9)
+        if slack == float('inf'):
+            for i, person in enumerate(people):
+                yield i, person, range(i + 1, len(people))
+            return
+
+        groups = {}
+        for position, person in enumerate(people):
+            key = frozenset(person.personality_traits)
+            groups.setdefault(key, []).append((sum(person.personality_traits.values()), position))
+        windows = {}
+        for key, members in groups.items():
+            members.sort()
+            if kernel.traits is not None or not weights['personality']:
+                width = float('inf')  # the trait-sum window only holds for each person's own keys
+            else:
+                width = len(key) * slack / weights['personality'] if key else 0
+            windows[key] = ([s for s, _ in members], [p for _, p in members], width)
+
+        for i, person in enumerate(people):
+            partners = set()
+            for interest in set(person.interests):
+                interest_id = self.interest_ids.get(interest)
+                if interest_id is None:
+                    continue  # added to the list in place, after indexing
+                for other_person in self._interest_postings[interest_id]:
+                    partners.add(self._positions[other_person])
+            if slack >= 0:
+                key = frozenset(person.personality_traits)
+                sums, positions, width = windows[key]
+                trait_sum = sum(person.personality_traits.values())
+                partners.update(positions[bisect.bisect_left(sums, trait_sum - width):
+                                          bisect.bisect_right(sums, trait_sum + width)])
+                for other_key, (_, other_positions, _) in windows.items():
+                    if other_key != key:
+                        partners.update(other_positions)
+            yield i, person, [j for j in sorted(partners) if j > i]
+
+    def _identities(self, population):
+        # Row of each person's first occurrence, to skip self-pairs by identity.
+        if self._population_identities is not None and self._population_identities[0] is population:
+            return self._population_identities[1]
+        np = _require_numpy()
+        first_rows = {}
+        identities = np.array([first_rows.setdefault(p, row) for row, p in enumerate(population.people)],
+                              dtype=np.int64)
+        self._population_identities = (population, identities)
+        return identities
+
+    def _iter_friendships_blocked(self):
+        np = _require_numpy()
+        identities = self._identities(self.packed_population())
+        for start, block in self.iter_compatibility_blocks():
+            rows, columns = np.nonzero(block >= self.compatibility_threshold)
+            keep = identities[rows + start] != identities[columns]
+            rows, columns = rows[keep], columns[keep]
+            yield from zip((rows + start).tolist(), columns.tolist(), block[rows, columns].tolist())
+
+    def _iter_friendships_parallel(self):
+        # Row blocks are scored in worker processes that read the packed arrays
+        # from shared memory; results come back in block order, so edges are
+        # yielded exactly as the single-process engine would yield them.
+        from concurrent.futures import ProcessPoolExecutor
+        population = self.packed_population()
+        arrays, metadata = population.shared_arrays()
+        arrays['identities'] = self._identities(population)
+        blocks, spec = _share_arrays(arrays)
+        try:
+            starts = range(0, population.size, self.chunk_size)
+            stops = [min(start + self.chunk_size, population.size) for start in starts]
+            with ProcessPoolExecutor(self.workers, initializer=_init_network_worker,
+                                     initargs=(spec, metadata)) as pool:
+                results = pool.map(_score_rows_task, starts, stops,
+                                   [self.compatibility_threshold] * len(stops), [self.kernel] * len(stops))
+                for rows, columns, scores in results:
+                    yield from zip(rows.tolist(), columns.tolist(), scores.tolist())
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def export_friendships(self, path, file_format=None, batch_size=65536):
+        """Stream iter_friendships() to a CSV, JSONL or binary edge-list file
+
+        The format follows the extension (.csv, .jsonl, .edges) unless given.
+        Edges are written in batches, so memory stays bounded by batch_size.
+        Edges are written in iter_friendships() order, which depends on the mode.
+        Returns the number of edges written.
+        """
+        sink = open_edge_sink(path, file_format)
+        written = 0
+        edges = self.iter_friendships()
+        try:
+            while True:
+                with self._phase('score edges'):
+                    batch = list(itertools.islice(edges, batch_size))
+                if not batch:
+                    break
+                with self._phase('write edges'):
+                    sources, targets, scores = zip(*batch)
+                    sink.write_batch(sources, targets, scores)
+                written += len(batch)
+        finally:
+            sink.close()
+        return written
+
+    def build_network_out_of_core(self, path, memory_limit, file_format=None, temp_dir=None):
+        """Score every pair and write the network to path, holding at most memory_limit bytes
+
+        Pairs are scored in tiles, edges spilled to temp_dir as sorted runs
+        and merged, so the network never has to fit in memory (see
+        spill_network). The output is an edge-list file like
+        export_friendships writes, or a snapshot that load() opens when the
+        format (or extension) is 'snap'. Stored friendships are left alone.
+        Returns the number of edges written.
+        """
+        with self._phase('spill network'):
+            edges = spill_network(self, memory_limit, temp_dir)
+        with edges:
+            file_format = file_format or os.path.splitext(str(path))[1].lstrip('.').lower()
+            if file_format == 'snap':
+                with self._phase('write edges'):
+                    return write_snapshot(self, path, edges=edges)
+            sink = open_edge_sink(path, file_format)
+            try:
+                for sources, targets, scores in edges.iter_chunks():
+                    with self._phase('write edges'):
+                        sink.write_batch(sources.tolist(), targets.tolist(), scores.tolist())
+            finally:
+                sink.close()
+            return edges.count
+
+    def save(self, path):
+        """Write people and friendships to a binary snapshot; see write_snapshot"""
+        return write_snapshot(self, path)
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        """Analyzer over the PersonStore and friendships saved by save()"""
+        store, header = read_snapshot(path, use_mmap)
+        analyzer = cls(store)
+        analyzer.compatibility_threshold = header['compatibility_threshold']
+        analyzer.total_friendships = header['edges']
+        return analyzer
+
+    def pair_weights(self, neighbors=50):
+        """Sparse symmetric pair weights for group formation
+
+        Returns one {position: weight} dict per person, holding each person's
+        `neighbors` best partners by analyze_compatibility plus everyone who
+        lists them, weighted by the score in both directions added together.
+        Everyone is scored once in engine blocks.
+        """
+        np = _require_numpy()
+        population = self.packed_population()
+        identities = self._identities(population)
+        size = population.size
+        count = min(neighbors, size - 1)
+        weights = [{} for _ in range(size)]
+        if count <= 0:
+            return weights
+        for start in range(0, size, self.block_size):
+            rows = list(range(start, min(start + self.block_size, size)))
+            block = population.score_block(rows, kernel=self.kernel)
+            block[identities[rows][:, None] == identities[None, :]] = -np.inf
+            best = np.argpartition(-block, count - 1, axis=1)[:, :count]
+            scores = np.take_along_axis(block, best, axis=1)
+            for row, columns, values in zip(rows, best.tolist(), scores.tolist()):
+                weights[row].update((j, s) for j, s in zip(columns, values) if s != -np.inf)
+
+        # weights[i][j] holds s(i, j) so far; add s(j, i), scoring it when j
+        # did not list i.
+        missing = {}
+        for i, partners in enumerate(weights):
+            for j in partners:
+                if i not in weights[j]:
+                    missing.setdefault(j, []).append(i)
+        reverse = {}
+        for j, columns in missing.items():
+            for i, score in zip(columns, population.score_block([j], columns, self.kernel)[0].tolist()):
+                reverse[j, i] = score
+        combined = [{} for _ in range(size)]
+        for i, partners in enumerate(weights):
+            for j, score in partners.items():
+                back = weights[j][i] if i in weights[j] else reverse[j, i]
+                combined[i][j] = combined[j][i] = score + back
+        return combined
+
+    def form_groups(self, group_size, neighbors=50, time_budget=5.0, seed=0, max_passes=20,
+                    weights=None):
+        """Split self.people into groups of group_size (or one less) with high total compatibility
+
+        When len(people) cannot be split that way (11 people in groups of 10),
+        it is split into len(people) // group_size groups whose sizes differ
+        by at most one, so no group is smaller than group_size; fewer than
+        group_size people form a single group.
+
+        Groups are seeded greedily (a random unassigned person, then whoever
+        adds the most weight) and improved by swapping people between groups
+        while a swap raises the total. Swaps are scored incrementally from the
+        sparse pair_weights(neighbors); pairs outside those lists count as 0
+        during the search, so with neighbors >= len(people) - 1 the search is
+        exact. Pass weights from an earlier pair_weights() call to reuse them.
+
+        The swap search stops when a pass over everyone finds no improving
+        swap, after max_passes passes or after time_budget seconds (not
+        counting pair_weights); results depend only on `seed` unless the time
+        budget cuts the search (complete is then False).
+        """
+        if group_size < 1:
+            raise ValueError("group_size must be at least 1")
+        started = time.perf_counter()
+        rng = random.Random(seed)
+        people = self.people
+        size = len(people)
+        if weights is None:
+            with self._phase('pair weights'):
+                weights = self.pair_weights(neighbors) if size else []
+        deadline = time.perf_counter() + time_budget
+
+        # Greedy seeding.
+        group_of = [-1] * size
+        groups = []
+        unassigned = list(range(size))
+        rng.shuffle(unassigned)
+        unassigned_set = set(unassigned)
+        for target in _group_sizes(size, group_size):
+            while unassigned[-1] not in unassigned_set:
+                unassigned.pop()
+            member = unassigned[-1]
+            group, gains = [], {}
+            while True:
+                unassigned_set.discard(member)
+                group_of[member] = len(groups)
+                group.append(member)
+                gains.pop(member, None)
+                if len(group) == target:
+                    break
+                for other, weight in weights[member].items():
+                    if other in unassigned_set:
+                        gains[other] = gains.get(other, 0.0) + weight
+                if gains:
+                    member = max(gains, key=lambda other: (gains[other], -other))
+                else:
+                    while unassigned[-1] not in unassigned_set:
+                        unassigned.pop()
+                    member = unassigned[-1]
+            groups.append(group)
+
+        def affinity(person, group_index):
+            return sum(w for other, w in weights[person].items()
+                       if group_of[other] == group_index and other != person)
+
+        # Local search: swap a with b when it raises the total weight.
+        passes = swaps = 0
+        complete = True
+        order = list(range(size))
+        while passes < max_passes:
+            passes += 1
+            improved = False
+            rng.shuffle(order)
+            for a in order:
+                if time.perf_counter() > deadline:
+                    complete = False
+                    break
+                group_a = group_of[a]
+                by_group = {}
+                for other, weight in weights[a].items():
+                    by_group[group_of[other]] = by_group.get(group_of[other], 0.0) + weight
+                own = by_group.pop(group_a, 0.0)
+                best_delta, best = 1e-9, None
+                for group_b, gain in by_group.items():
+                    if gain <= own:
+                        continue
+                    for b in groups[group_b]:
+                        w_ab = weights[a].get(b, 0.0)
+                        delta = (gain - w_ab - own) + (affinity(b, group_a) - w_ab - affinity(b, group_b))
+                        if delta > best_delta:
+                            best_delta, best = delta, (group_b, b)
+                if best is not None:
+                    group_b, b = best
+                    groups[group_a][groups[group_a].index(a)] = b
+                    groups[group_b][groups[group_b].index(b)] = a
+                    group_of[a], group_of[b] = group_b, group_a
+                    swaps += 1
+                    improved = True
+            if not complete or not improved:
+                break
+
+        for group in groups:
+            group.sort()
+        score = 0.0
+        for group in groups:
+            for i in group:
+                for j in group:
+                    if i != j:
+                        score += self.analyze_compatibility(people[i], people[j])
+        return GroupFormation([[people[i] for i in group] for group in groups], groups, score,
+                              passes, swaps, time.perf_counter() - started, complete)
+
+    def mutual_top_k(self, k=50, mode=None):
+        """Each person's k best partners by mutual score, as (positions, scores) arrays
+
+        Both arrays have one row per person, best partner first; rows with
+        fewer than k partners end in -1 / -inf. Both directions of every pair
+        are scored in the same engine tile, in less time than a network build.
+        """
+        population = self.packed_population()
+        with self._phase('mutual top-k'):
+            return self._mutual_top_k(population, k, self._reciprocal_mode(mode), self._identities(population))
+
+    def _mutual_top_k(self, population, k, mode, identities=None):
+        # Square tiles of block_size are scored together with their mirror
+        # tile (score_block_both_ways), so each pair is visited once and both
+        # directions of a pair come from the same tile.
+        np = _require_numpy()
+        size = population.size
+        k = max(0, min(k, size - 1))
+        best_columns = np.full((size, k), -1, dtype=np.int64)
+        best_scores = np.full((size, k), -np.inf)
+        if not k:
+            return best_columns, best_scores
+        if identities is None:
+            identities = np.arange(size)
+
+        def update(rows, columns, mutual):
+            scores = np.hstack([best_scores[rows.start:rows.stop], mutual])
+            positions = np.hstack([best_columns[rows.start:rows.stop],
+                                   np.broadcast_to(np.arange(columns.start, columns.stop), mutual.shape)])
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores[rows.start:rows.stop] = np.take_along_axis(scores, top, axis=1)
+            best_columns[rows.start:rows.stop] = np.take_along_axis(positions, top, axis=1)
+
+        for row_start in range(0, size, self.block_size):
+            rows = range(row_start, min(row_start + self.block_size, size))
+            for column_start in range(row_start, size, self.block_size):
+                columns = range(column_start, min(column_start + self.block_size, size))
+                forward, backward = population.score_block_both_ways(rows, columns, self.kernel)
+                mutual = reciprocal_scores(forward, backward, mode)
+                mutual[identities[rows.start:rows.stop, None] ==
+                       identities[None, columns.start:columns.stop]] = -np.inf
+                update(rows, columns, mutual)
+                if column_start != row_start:
+                    update(columns, rows, mutual.T)
+        best_columns[best_scores == -np.inf] = -1
+        order = np.lexsort((best_columns, -best_scores), axis=1)
+        return np.take_along_axis(best_columns, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def stable_pairing(self, candidates=50, mode=None, min_score=None):
+        """Pair people up so that no two would both rather be with each other than their partners
+
+        Each round takes everyone's `candidates` best partners by mutual score
+        (see mutual_top_k) and pairs them greedily from the highest mutual
+        score down. As the mutual score is symmetric, that leaves no blocking
+        pair among those candidates; people still unpaired are matched among
+        themselves in further rounds. With candidates >= len(people) - 1 the
+        result is a stable matching of the whole population (a stable
+        roommates solution). Pairs scoring below min_score are never formed.
+        Returns a StablePairing.
+        """
+        np = _require_numpy()
+        mode = self._reciprocal_mode(mode)
+        started = time.perf_counter()
+        population = self.packed_population()
+        identities = self._identities(population)
+        # Later occurrences of a person listed twice are left out.
+        remaining = np.flatnonzero(identities == np.arange(population.size))
+        if len(remaining) < population.size:
+            population = PackedPopulation([self.people[i] for i in remaining.tolist()])
+        pairs, rounds = [], 0
+        while len(remaining) > 1:
+            if rounds:
+                population = PackedPopulation([self.people[i] for i in remaining.tolist()])
+            rounds += 1
+            with self._phase('mutual top-k'):
+                columns, scores = self._mutual_top_k(population, candidates, mode)
+            rows = np.repeat(np.arange(len(remaining)), columns.shape[1])
+            columns, scores = columns.ravel(), scores.ravel()
+            keep = columns >= 0
+            if min_score is not None:
+                keep &= scores >= min_score
+            low = np.minimum(rows[keep], columns[keep])
+            high = np.maximum(rows[keep], columns[keep])
+            _, first = np.unique(low * len(remaining) + high, return_index=True)
+            low, high, scores = low[first], high[first], scores[keep][first]
+            order = np.lexsort((high, low, -scores))
+            matched = [False] * len(remaining)
+            for i, j, score in zip(low[order].tolist(), high[order].tolist(), scores[order].tolist()):
+                if not matched[i] and not matched[j]:
+                    matched[i] = matched[j] = True
+                    pairs.append((int(remaining[i]), int(remaining[j]), score))
+            if not any(matched):
+                break
+            remaining = remaining[~np.array(matched)]
+        people = self.people
+        return StablePairing([(people[i], people[j]) for i, j, _ in pairs], [(i, j) for i, j, _ in pairs],
+                             [score for _, _, score in pairs], remaining.tolist(), mode, rounds,
+                             time.perf_counter() - started)
+
+    def friendship_graph(self):
+        """FriendshipGraph (CSR arrays and analytics) of the stored network"""
+        return FriendshipGraph.from_analyzer(self)
+
+    def _friendship_count(self):
+        # total_friendships is kept current by rebuilds, loads and the incremental
+        # network; otherwise friendships may have been edited directly, so count them.
+        people = self.people
+        if self.incremental_network:
+            return self.total_friendships
+        if isinstance(people, PersonStore):
+            if people._snapshot_edges is not None:
+                return self.total_friendships
+            friendships = people.friendships
+            return sum(len(friendships.get(row, ())) for row in people.order)
+        return sum(len(person.friendships) for person in people)
+
+    def display_network_stats(self):
+        total_friendships = self._friendship_count()
+        avg_friendships = total_friendships / len(self.people) if self.people else 0
+        print(f"Total People: {len(self.people)}")
+        print(f"Total Friendships: {total_friendships}")
+        print(f"Average Friendships per Person: {avg_friendships:.1f}")
@@ -0,0 +1,287 @@
+"""Interactive demo and the command-line interface
+
+    python -m friendship_analyzer match people.csv Ali -k 5
+    python -m friendship_analyzer build-network people.csv --engine -o network.edges
+    python -m friendship_analyzer build-network people.csv --memory-limit 512M -o network.snap
+    python -m friendship_analyzer stats people.snap --threshold 6.5 --json
+
+Subcommands read everything from files and never prompt, except `interactive`.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from .people import (
+    COMMUNICATION_STYLES, EmpatheticPerson, LogicalPerson, PERSONALITY_TRAITS, Person
+)
+from .scoring import DEFAULT_KERNEL, RECIPROCAL_MODES
+from .analyzer import FriendshipAnalyzer
+
+
+def create_person(kernel=None):
+    # Prompts for the kernel's trait schema when it has one.
+    kernel = kernel or DEFAULT_KERNEL
+    print("\n🧑 Enter New Person Details")
+    name = input("Name: ")
+    age = int(input("Age: "))
+    interests = input("Interests (comma separated): ").split(',')
+    interests = [i.strip() for i in interests]
+    print("Enter Personality Traits (0-10):")
+    personality_traits = {t: int(input(f"  {t.title()}: ")) for t in kernel.traits or PERSONALITY_TRAITS}
+    print("Enter Communication Styles (0-10):")
+    communication_style = {s: int(input(f"  {s.title()}: ")) for s in kernel.styles or COMMUNICATION_STYLES}
+
+    return Person(name, age, interests, personality_traits, communication_style)
+
+def run_demo():
+    analyzer = FriendshipAnalyzer()
+    while True:
+        add_more = input("\nWould you like to add a person? (yes/no): ").strip().lower()
+        if add_more == 'yes':
+            person = create_person()
+            analyzer.add_person(person)
+        else:
+            break
+
+    for person in analyzer.people:
+        person.display_info()
+
+    if len(analyzer.people) >= 2:
+        person1 = analyzer.people[0]
+        person2 = analyzer.people[1]
+        score = analyzer.analyze_compatibility(person1, person2)
+        print(f"\nOverall Compatibility Score between {person1.name} and {person2.name}: {score:.2f}/10")
+
+        matches = analyzer.find_best_matches(person1)
+        print("\nTop Match(es):")
+        for match, score in matches:
+            print(f"{match.name} - Compatibility: {score:.2f}/10")
+
+        analyzer.create_friendship_network()
+        analyzer.display_network_stats()
+    else:
+        print("\nNot enough people to analyze compatibility.")
+
+def run_tests():
+    print("\n🔬 Running Compatibility Tests...")
+
+    p1 = LogicalPerson("Ali", 25, ["coding", "chess"], {
+        "extroversion": 4, "openness": 6, "agreeableness": 7, "conscientiousness": 9, "neuroticism": 3
+    }, {
+        "direct": 9, "emotional": 2, "humor": 5, "formal": 6
+    })
+
+    p2 = EmpatheticPerson("Sara", 26, ["coding", "reading"], {
+        "extroversion": 5, "openness": 7, "agreeableness": 8, "conscientiousness": 7, "neuroticism": 6
+    }, {
+        "direct": 6, "emotional": 9, "humor": 7, "formal": 4
+    })
+
+    analyzer = FriendshipAnalyzer()
+    analyzer.add_person(p1)
+    analyzer.add_person(p2)
+
+    p1.display_info()
+    p2.display_info()
+
+    score = analyzer.analyze_compatibility(p1, p2)
+    print(f"\nOverall Compatibility Score: {score:.2f}/10")
+
+    matches = analyzer.find_best_matches(p1)
+    print("\nTop Match(es):")
+    for match, score in matches:
+        print(f"{match.name} - Compatibility: {score:.2f}/10")
+
+    analyzer.create_friendship_network()
+    analyzer.display_network_stats()
+
+
+def _open_analyzer(args):
+    # .snap files are memory-mapped snapshots; anything else goes through load_people.
+    if args.people.endswith('.snap'):
+        analyzer = FriendshipAnalyzer.load(args.people)
+    else:
+        from .loading import load_people
+        from .people import PersonStore
+        analyzer = FriendshipAnalyzer(PersonStore() if args.store else None)
+        load_people(analyzer, args.people)
+    if args.profile:
+        analyzer.use_profile(args.profile)
+    if getattr(args, 'threshold', None) is not None:
+        analyzer.compatibility_threshold = args.threshold
+    analyzer.use_matrix_engine = args.engine
+    analyzer.workers = args.workers
+    return analyzer
+
+
+def _find_person(analyzer, key):
+    """Position of the first person named `key`, or `key` read as a position"""
+    for position, person in enumerate(analyzer.people):
+        if person.name == key:
+            return position
+    if key.isdigit() and int(key) < len(analyzer.people):
+        return int(key)
+    raise LookupError(f"no person named {key!r}")
+
+
+def _print(args, result, lines):
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print("\n".join(lines))
+
+
+def command_score(args):
+    analyzer = _open_analyzer(args)
+    people = analyzer.people
+    person1, person2 = (people[_find_person(analyzer, key)] for key in (args.person, args.other))
+    results, lines = [], []
+    for explanation in (analyzer.explain_compatibility(person1, person2),
+                        analyzer.explain_compatibility(person2, person1)):
+        results.append(explanation.as_dict())
+        lines.append(f"{explanation.person1.name} -> {explanation.person2.name}: {explanation.score:.2f}/10 "
+                     f"({explanation.strategy.__name__} strategy, {explanation.profile!r} weights)")
+        lines.extend(f"  {name:14} {value:5.2f} x {explanation.weights[name]:.2f}"
+                     for name, value in explanation.components.items())
+    _print(args, results, lines)
+    return 0
+
+
+def command_match(args):
+    analyzer = _open_analyzer(args)
+    analyzer.use_approximate_matching = args.approximate
+    analyzer.reciprocal_matching = args.reciprocal
+    person = analyzer.people[_find_person(analyzer, args.person)]
+    matches = analyzer.find_top_k_matches(person, args.k, args.min_score)
+    _print(args, [{'name': match.name, 'score': score} for match, score in matches],
+           [f"{match.name:30} {score:5.2f}" for match, score in matches])
+    return 0
+
+
+def command_build_network(args):
+    analyzer = _open_analyzer(args)
+    start = time.perf_counter()
+    if args.memory_limit is not None:
+        if not args.output:
+            raise ValueError("--memory-limit needs --output")
+        edges = analyzer.build_network_out_of_core(args.output, args.memory_limit, args.format, args.temp_dir)
+    elif args.output:
+        edges = analyzer.export_friendships(args.output, args.format)
+    else:
+        edges = sum(1 for _ in analyzer.iter_friendships())
+    elapsed = time.perf_counter() - start
+    result = {'people': len(analyzer.people), 'edges': edges, 'threshold': analyzer.compatibility_threshold,
+              'seconds': elapsed, 'output': args.output}
+    lines = [f"{edges} friendships among {len(analyzer.people)} people at threshold "
+             f"{analyzer.compatibility_threshold} in {elapsed:.2f}s"]
+    if args.output:
+        lines.append(f"wrote {args.output}")
+    _print(args, result, lines)
+    return 0
+
+
+def command_stats(args):
+    analyzer = _open_analyzer(args)
+    size = len(analyzer.people)
+    out_degrees, in_degrees = [0] * size, [0] * size
+    edges, total_score = 0, 0.0
+    for source, target, score in analyzer.iter_friendships():
+        out_degrees[source] += 1
+        in_degrees[target] += 1
+        edges += 1
+        total_score += score
+    result = {
+        'people': size,
+        'friendships': edges,
+        'threshold': analyzer.compatibility_threshold,
+        'average_friendships': edges / size if size else 0.0,
+        'max_friendships': max(out_degrees, default=0),
+        'max_followers': max(in_degrees, default=0),
+        'isolated': sum(1 for out, into in zip(out_degrees, in_degrees) if not out and not into),
+        'mean_score': total_score / edges if edges else 0.0,
+    }
+    _print(args, result, [f"{name.replace('_', ' ').title():22} {value:g}" for name, value in result.items()])
+    return 0
+
+
+def command_demo(args):
+    run_tests()
+    return 0
+
+
+def command_interactive(args):
+    run_demo()
+    return 0
+
+
+def _byte_size(text):
+    units = {'K': 2**10, 'M': 2**20, 'G': 2**30}
+    text = text.strip().upper().removesuffix('B')
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size {text!r}") from None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='friendship_analyzer', description="Friendship compatibility analysis over people files")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    population = argparse.ArgumentParser(add_help=False)
+    population.add_argument('people', help="people file: .csv, .jsonl or a .snap snapshot")
+    population.add_argument('--profile', help="registered scoring profile to score with")
+    population.add_argument('--engine', action='store_true', help="score with the NumPy matrix engine")
+    population.add_argument('--workers', type=int, help="score row blocks in this many processes")
+    population.add_argument('--store', action='store_true', help="load people into a PersonStore")
+    population.add_argument('--json', action='store_true', help="print JSON instead of text")
+    threshold = argparse.ArgumentParser(add_help=False)
+    threshold.add_argument('--threshold', type=float, help="compatibility threshold (default 7.0)")
+
+    score = commands.add_parser('score', parents=[population], help="compatibility of two people, both ways")
+    score.add_argument('person', help="name or position")
+    score.add_argument('other', help="name or position")
+    score.set_defaults(handler=command_score)
+
+    match = commands.add_parser('match', parents=[population], help="best matches for one person")
+    match.add_argument('person', help="name or position")
+    match.add_argument('-k', type=int, default=10, help="number of matches (default 10)")
+    match.add_argument('--min-score', type=float)
+    match.add_argument('--approximate', action='store_true', help="use the approximate match index")
+    match.add_argument('--reciprocal', choices=RECIPROCAL_MODES,
+                       help="rank by the mutual score of both directions")
+    match.set_defaults(handler=command_match)
+
+    network = commands.add_parser('build-network', parents=[population, threshold],
+                                  help="score every pair and stream the network to a file")
+    network.add_argument('-o', '--output', help="edge file: .csv, .jsonl or .edges (or .snap with --memory-limit)")
+    network.add_argument('--format', choices=['csv', 'jsonl', 'edges', 'snap'])
+    network.add_argument('--memory-limit', type=_byte_size,
+                         help="build out of core under this many bytes (K, M or G suffix allowed)")
+    network.add_argument('--temp-dir', help="directory for the out-of-core build's sorted runs")
+    network.set_defaults(handler=command_build_network)
+
+    stats = commands.add_parser('stats', parents=[population, threshold], help="network statistics")
+    stats.set_defaults(handler=command_stats)
+
+    commands.add_parser('demo', help="compare two sample people").set_defaults(handler=command_demo)
+    commands.add_parser('interactive', help="enter people at the prompt").set_defaults(
+        handler=command_interactive)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    try:
+        return args.handler(args)
+    except (LookupError, ValueError, OSError, ImportError) as error:
+        print(f"friendship_analyzer {args.command}: {error}", file=sys.stderr)
+        return 1
@@ -0,0 +1,91 @@
+"""Edge-list sinks for streaming friendship networks to disk"""
+
+import csv
+import os
+import sys
+from array import array
+
+
+EDGE_FILE_MAGIC = b'FAEDGES1'
+
+
+class CsvEdgeSink:
+    """Writes source,target,score rows"""
+
+    def __init__(self, path):
+        self._handle = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._handle)
+        self._writer.writerow(['source', 'target', 'score'])
+
+    def write_batch(self, sources, targets, scores):
+        self._writer.writerows(zip(sources, targets, scores))
+
+    def close(self):
+        self._handle.close()
+
+
+class JsonlEdgeSink:
+    """Writes one {"source", "target", "score"} object per line"""
+
+    def __init__(self, path):
+        self._handle = open(path, 'w', encoding='utf-8')
+
+    def write_batch(self, sources, targets, scores):
+        self._handle.writelines(
+            f'{{"source": {s}, "target": {t}, "score": {score!r}}}\n'
+            for s, t, score in zip(sources, targets, scores))
+
+    def close(self):
+        self._handle.close()
+
+
+class BinaryEdgeSink:
+    """Writes EDGE_FILE_MAGIC, then per batch: uint32 count, uint32 sources,
+    uint32 targets and float64 scores, all little-endian"""
+
+    def __init__(self, path):
+        self._handle = open(path, 'wb')
+        self._handle.write(EDGE_FILE_MAGIC)
+
+    def write_batch(self, sources, targets, scores):
+        columns = [array('I', [len(sources)]), array('I', sources), array('I', targets), array('d', scores)]
+        for column in columns:
+            if sys.byteorder == 'big':
+                column.byteswap()
+            self._handle.write(column.tobytes())
+
+    def close(self):
+        self._handle.close()
+
+
+EDGE_SINKS = {'csv': CsvEdgeSink, 'jsonl': JsonlEdgeSink, 'edges': BinaryEdgeSink}
+
+
+def open_edge_sink(path, file_format=None):
+    """Open the sink for file_format, or for the path's extension"""
+    file_format = file_format or os.path.splitext(str(path))[1].lstrip('.').lower()
+    if file_format not in EDGE_SINKS:
+        raise ValueError(f"unsupported edge format {file_format!r}; expected one of {sorted(EDGE_SINKS)}")
+    return EDGE_SINKS[file_format](path)
+
+
+def read_binary_edges(path):
+    """Yield (source, target, score) from a file written by BinaryEdgeSink"""
+    with open(path, 'rb') as handle:
+        if handle.read(len(EDGE_FILE_MAGIC)) != EDGE_FILE_MAGIC:
+            raise ValueError(f"{path} is not a binary edge list")
+        while True:
+            header = handle.read(4)
+            if not header:
+                return
+            count = array('I', header)
+            if sys.byteorder == 'big':
+                count.byteswap()
+            columns = []
+            for typecode in 'IId':
+                column = array(typecode)
+                column.frombytes(handle.read(count[0] * column.itemsize))
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                columns.append(column)
+            yield from zip(*columns)
@@ -0,0 +1,687 @@
+"""NumPy matrix engine: packed populations, worker processes and approximate matching"""
+
+from .people import PersonStore, StoredPerson, person_class_of
+from .scoring import BATCH_STRATEGIES, DEFAULT_KERNEL, _require_numpy, class_strategy, strategy_class
+
+
+def _pack_scores(np, score_dicts):
+    """Pack a list of trait dicts into a value matrix, presence mask and key orders"""
+    names = {}
+    for scores in score_dicts:
+        for key in scores:
+            names.setdefault(key, len(names))
+    values = np.zeros((len(score_dicts), len(names)), dtype=np.float64)
+    mask = np.zeros((len(score_dicts), len(names)), dtype=bool)
+    signatures = {}
+    orders = np.empty(len(score_dicts), dtype=np.int64)
+    for row, scores in enumerate(score_dicts):
+        columns = tuple(names[key] for key in scores)
+        values[row, list(columns)] = list(scores.values())
+        mask[row, list(columns)] = True
+        orders[row] = signatures.setdefault(columns, len(signatures))
+    return list(names), values, mask, orders, list(signatures)
+
+
+def _pack_store_scores(np, column, width, order):
+    raw = np.frombuffer(column, dtype=np.int8).reshape(-1, width)[order]
+    mask = raw >= 0
+    unique_masks, orders = np.unique(mask, axis=0, return_inverse=True)
+    signatures = [tuple(np.flatnonzero(m).tolist()) for m in unique_masks]
+    return np.where(mask, raw, 0).astype(np.float64), mask, orders.reshape(-1), signatures
+
+
+class PackedPopulation:
+    """Contiguous array copy of a list of people used for batch scoring"""
+
+    def __init__(self, people):
+        np = _require_numpy()
+        if isinstance(people, PersonStore):
+            self._pack_store(np, people)
+        else:
+            self._pack_people(np, people)
+        self.interest_counts = np.array([len(s) for s in self.interest_sets], dtype=np.int64)
+        postings = [[] for _ in self.vocabulary]
+        for row, interest_ids in enumerate(self.interest_sets):
+            for interest_id in interest_ids:
+                postings[interest_id].append(row)
+        self.postings = [np.array(rows, dtype=np.int64) for rows in postings]
+
+    def _pack_people(self, np, people):
+        self.store = None
+        self.people = list(people)
+        self.size = len(self.people)
+        self.row_index = {}
+        for row, person in enumerate(self.people):
+            self.row_index.setdefault(id(person), row)
+        self.ages = np.array([p.age for p in self.people], dtype=np.float64)
+        (self.trait_names, self.traits, self.trait_mask,
+         self.trait_orders, self.trait_signatures) = _pack_scores(
+            np, [p.personality_traits for p in self.people])
+        (self.style_names, self.styles, self.style_mask,
+         self.style_orders, self.style_signatures) = _pack_scores(
+            np, [p.communication_style for p in self.people])
+
+        self.vocabulary = {}
+        self.interest_sets = []
+        for person in self.people:
+            self.interest_sets.append(tuple(sorted(
+                {self.vocabulary.setdefault(i, len(self.vocabulary)) for i in person.interests})))
+
+    def _pack_store(self, np, store):
+        # Columns are read straight from the store's arrays, without creating views.
+        self.store = store
+        self.people = store
+        order = np.frombuffer(store.order, dtype=np.uint64).astype(np.int64)
+        self.size = len(order)
+        self.ages = np.frombuffer(store.ages, dtype=np.uint16)[order].astype(np.float64)
+        (self.traits, self.trait_mask, self.trait_orders,
+         self.trait_signatures) = _pack_store_scores(np, store.traits, len(store.trait_names), order)
+        (self.styles, self.style_mask, self.style_orders,
+         self.style_signatures) = _pack_store_scores(np, store.styles, len(store.style_names), order)
+        self.trait_names = list(store.trait_names)
+        self.style_names = list(store.style_names)
+
+        self.vocabulary = store.vocabulary_ids
+        starts, counts, ids = store.interest_starts, store.interest_counts, store.interest_ids
+        self.interest_sets = [tuple(sorted(set(ids[starts[row]:starts[row] + counts[row]])))
+                              for row in store.order]
+
+    def shared_arrays(self):
+        """The arrays a worker process needs to rebuild this population"""
+        np = _require_numpy()
+        classes = {}
+        kinds = np.array([classes.setdefault(person_class_of(p), len(classes)) for p in self.people],
+                         dtype=np.int64)
+        flat = [interest_id for interest_ids in self.interest_sets for interest_id in interest_ids]
+        arrays = {
+            'ages': self.ages,
+            'traits': self.traits, 'trait_mask': self.trait_mask, 'trait_orders': self.trait_orders,
+            'styles': self.styles, 'style_mask': self.style_mask, 'style_orders': self.style_orders,
+            'interest_offsets': np.concatenate([[0], np.cumsum(self.interest_counts)]).astype(np.int64),
+            'interest_ids': np.array(flat, dtype=np.int64),
+            'kinds': kinds,
+        }
+        metadata = {
+            'trait_names': self.trait_names, 'trait_signatures': self.trait_signatures,
+            'style_names': self.style_names, 'style_signatures': self.style_signatures,
+            'vocabulary_size': len(self.vocabulary), 'classes': list(classes),
+        }
+        return arrays, metadata
+
+    def has_batch_strategies(self):
+        """Whether every person's compatibility_strategy has a registered batch form"""
+        classes = self.store.person_classes if self.store is not None else {type(p) for p in self.people}
+        return all(class_strategy(person_class) in BATCH_STRATEGIES for person_class in classes)
+
+    @classmethod
+    def from_shared_arrays(cls, arrays, metadata):
+        """Rebuild a population from shared_arrays() output without the original Person objects
+
+        Each person is a bare instance of their class, which is all
+        strategy_block needs to pick the batch strategies. Populations without
+        a batch form for every class (has_batch_strategies) must not be
+        scored this way, as their per-pair calls need the real people.
+        """
+        np = _require_numpy()
+        population = cls.__new__(cls)
+        population.__dict__.update(arrays)
+        population.__dict__.update(metadata)
+        population.store = None
+        population.size = len(arrays['ages'])
+        offsets, ids = arrays['interest_offsets'], arrays['interest_ids']
+        population.interest_sets = [tuple(ids[offsets[row]:offsets[row + 1]].tolist())
+                                    for row in range(population.size)]
+        population.interest_counts = np.diff(offsets)
+        population.vocabulary = range(metadata['vocabulary_size'])
+        postings = [[] for _ in population.vocabulary]
+        for row, interest_ids in enumerate(population.interest_sets):
+            for interest_id in interest_ids:
+                postings[interest_id].append(row)
+        population.postings = [np.array(rows, dtype=np.int64) for rows in postings]
+
+        population.people = [object.__new__(metadata['classes'][kind]) for kind in arrays['kinds'].tolist()]
+        population.row_index = {id(p): row for row, p in enumerate(population.people)}
+        return population
+
+    def row_of(self, person):
+        """Row of `person` in this population, or None"""
+        if self.store is None:
+            return self.row_index.get(id(person))
+        if isinstance(person, StoredPerson) and person._store is self.store:
+            return self.store.position(person)
+        return None
+
+    def interest_block(self, rows, columns=None):
+        """Interest Jaccard scores of `rows` against every person, or only `columns`
+
+        A contiguous range(start, stop) of columns uses the postings like a full
+        row, which is how tiled builds score column tiles.
+        """
+        np = _require_numpy()
+        if columns is None:
+            shared = np.zeros((len(rows), self.size), dtype=np.int64)
+            for local, row in enumerate(rows):
+                for interest_id in self.interest_sets[row]:
+                    shared[local, self.postings[interest_id]] += 1
+            counts = self.interest_counts
+        elif isinstance(columns, range) and columns.step == 1:
+            start, stop = columns.start, max(columns.start, columns.stop)
+            shared = np.zeros((len(rows), stop - start), dtype=np.int64)
+            for local, row in enumerate(rows):
+                for interest_id in self.interest_sets[row]:
+                    posting = self.postings[interest_id]
+                    lo, hi = np.searchsorted(posting, (start, stop))
+                    shared[local, posting[lo:hi] - start] += 1
+            counts = self.interest_counts[start:stop]
+        else:
+            others = [self.interest_sets[column] for column in columns]
+            shared = np.zeros((len(rows), len(others)), dtype=np.int64)
+            for local, row in enumerate(rows):
+                interest_ids = set(self.interest_sets[row])
+                shared[local] = [sum(1 for i in other if i in interest_ids) for other in others]
+            counts = self.interest_counts[columns]
+        total = self.interest_counts[rows][:, None] + counts[None, :] - shared
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = (shared / total) * 10
+        return np.where(total > 0, scores, 0.0)
+
+    def _keyed_block(self, rows, columns, names, values, mask, orders, signatures):
+        np = _require_numpy()
+        rows = np.asarray(rows, dtype=np.int64)
+        others = values if columns is None else values[columns]
+        other_mask = mask if columns is None else mask[columns]
+        scores = np.empty((len(rows), len(others)), dtype=np.float64)
+        row_orders = orders[rows]
+        for signature_id in np.unique(row_orders):
+            local = np.flatnonzero(row_orders == signature_id)
+            keys = signatures[signature_id]
+            if not keys:
+                raise ZeroDivisionError("division by zero")
+            missing = ~other_mask[:, list(keys)].all(axis=0)
+            if missing.any():
+                raise KeyError(names[keys[int(np.argmax(missing))]])
+            group = rows[local]
+            acc = np.zeros((len(group), len(others)), dtype=np.float64)
+            for key in keys:
+                acc += 10 - np.abs(values[group, key][:, None] - others[None, :, key])
+            scores[local] = acc / len(keys)
+        return scores
+
+    def _schema_block(self, rows, columns, names, values, mask, schema):
+        # Same sum as _keyed_block, over a kernel's fixed keys instead of each row's own.
+        np = _require_numpy()
+        rows = np.asarray(rows, dtype=np.int64)
+        others = values if columns is None else values[columns]
+        other_mask = mask if columns is None else mask[columns]
+        keys = []
+        for name in schema:
+            if name not in names:
+                raise KeyError(name)
+            keys.append(names.index(name))
+        present = mask[rows][:, keys].all(axis=0) & other_mask[:, keys].all(axis=0)
+        if not present.all():
+            raise KeyError(schema[int(np.argmin(present))])
+        acc = np.zeros((len(rows), len(others)), dtype=np.float64)
+        for key in keys:
+            acc += 10 - np.abs(values[rows, key][:, None] - others[None, :, key])
+        return acc / len(keys)
+
+    def personality_block(self, rows, columns=None, kernel=None):
+        if kernel is not None and kernel.traits is not None:
+            return self._schema_block(rows, columns, self.trait_names, self.traits, self.trait_mask,
+                                      kernel.traits)
+        return self._keyed_block(rows, columns, self.trait_names, self.traits, self.trait_mask,
+                                 self.trait_orders, self.trait_signatures)
+
+    def communication_block(self, rows, columns=None, kernel=None):
+        if kernel is not None and kernel.styles is not None:
+            return self._schema_block(rows, columns, self.style_names, self.styles, self.style_mask,
+                                      kernel.styles)
+        return self._keyed_block(rows, columns, self.style_names, self.styles, self.style_mask,
+                                 self.style_orders, self.style_signatures)
+
+    def age_difference_block(self, rows, columns=None):
+        np = _require_numpy()
+        others = self.ages if columns is None else self.ages[columns]
+        return np.abs(self.ages[rows][:, None] - others[None, :])
+
+    def age_block(self, rows, columns=None, kernel=None, age_diff=None):
+        np = _require_numpy()
+        kernel = kernel or DEFAULT_KERNEL
+        if age_diff is None:
+            age_diff = self.age_difference_block(rows, columns)
+        table = np.array(kernel.age_table, dtype=np.float64)
+        return table[np.minimum(np.ceil(age_diff), len(table) - 1).astype(np.int64)]
+
+    def _column_values(self, names, values, mask, name, default, columns):
+        np = _require_numpy()
+        size = self.size if columns is None else len(columns)
+        if name not in names:
+            return np.full(size, float(default))
+        index = names.index(name)
+        if columns is None:
+            return np.where(mask[:, index], values[:, index], float(default))
+        return np.where(mask[columns, index], values[columns, index], float(default))
+
+    def _column_mask(self, names, mask, name, columns):
+        np = _require_numpy()
+        if name not in names:
+            return np.zeros(self.size if columns is None else len(columns), dtype=bool)
+        present = mask[:, names.index(name)]
+        return present if columns is None else present[columns]
+
+    def trait_values(self, name, default=0, columns=None):
+        """person.personality_traits.get(name, default) for every person, or only `columns`"""
+        return self._column_values(self.trait_names, self.traits, self.trait_mask, name, default, columns)
+
+    def style_values(self, name, default=0, columns=None):
+        """person.communication_style.get(name, default) for every person, or only `columns`"""
+        return self._column_values(self.style_names, self.styles, self.style_mask, name, default, columns)
+
+    def has_trait(self, name, columns=None):
+        return self._column_mask(self.trait_names, self.trait_mask, name, columns)
+
+    def has_style(self, name, columns=None):
+        return self._column_mask(self.style_names, self.style_mask, name, columns)
+
+    def strategy_block(self, rows, columns=None):
+        """compatibility_strategy of `rows` against everyone (or `columns`), batched per strategy class"""
+        np = _require_numpy()
+        rows = np.asarray(rows, dtype=np.int64)
+        width = self.size if columns is None else len(columns)
+        scores = np.empty((len(rows), width), dtype=np.float64)
+        groups = {}
+        for local, row in enumerate(rows.tolist()):
+            groups.setdefault(strategy_class(self.people[row]), []).append(local)
+        for cls, local in groups.items():
+            batch = BATCH_STRATEGIES.get(cls)
+            if batch is not None:
+                scores[local] = batch(self, rows[local], columns)
+                continue
+            others = self.people if columns is None else [self.people[c] for c in columns]
+            for index in local:
+                strategy = self.people[int(rows[index])].compatibility_strategy
+                scores[index] = [strategy(other) for other in others]
+        return scores
+
+    def score_block(self, rows, columns=None, kernel=None):
+        """analyze_compatibility of each person in `rows` against every person, or only `columns`
+
+        Scores with `kernel` (a ScoringKernel, DEFAULT_KERNEL when None).
+        """
+        interests, personality, communication, age, strategy = (kernel or DEFAULT_KERNEL).weights
+        return (
+            self.interest_block(rows, columns) * interests +
+            self.personality_block(rows, columns, kernel) * personality +
+            self.communication_block(rows, columns, kernel) * communication +
+            self.age_block(rows, columns, kernel) * age +
+            self.strategy_block(rows, columns) * strategy
+        )
+
+    def score_block_both_ways(self, rows, columns, kernel=None):
+        """(score_block(rows, columns), score_block(columns, rows).T), sharing the symmetric blocks
+
+        Interest and age scores are the same both ways, and so are personality
+        and communication scores when everyone has the same keys or `kernel`
+        has a schema; the strategy block is always scored in both directions.
+        """
+        kernel = kernel or DEFAULT_KERNEL
+        interests, personality, communication, age, strategy = kernel.weights
+        interest = self.interest_block(rows, columns)
+        age_scores = self.age_block(rows, columns, kernel)
+        traits = self.personality_block(rows, columns, kernel)
+        styles = self.communication_block(rows, columns, kernel)
+        forward = (interest * interests + traits * personality + styles * communication +
+                   age_scores * age + self.strategy_block(rows, columns) * strategy)
+        if kernel.traits is None and len(self.trait_signatures) > 1:
+            traits = self.personality_block(columns, rows, kernel).T
+        if kernel.styles is None and len(self.style_signatures) > 1:
+            styles = self.communication_block(columns, rows, kernel).T
+        backward = (interest * interests + traits * personality + styles * communication +
+                    age_scores * age + self.strategy_block(columns, rows).T * strategy)
+        return forward, backward
+
+    def score_blocks(self, rows, kernels, columns=None):
+        """score_block for several kernels at once, computing each shared component once
+
+        Interest, strategy and age-difference blocks are shared by every kernel,
+        and personality / communication blocks by kernels with the same schema.
+        """
+        interest = self.interest_block(rows, columns)
+        strategy = self.strategy_block(rows, columns)
+        age_diff = self.age_difference_block(rows, columns)
+        personality, communication, results = {}, {}, []
+        for kernel in kernels:
+            if kernel.traits not in personality:
+                personality[kernel.traits] = self.personality_block(rows, columns, kernel)
+            if kernel.styles not in communication:
+                communication[kernel.styles] = self.communication_block(rows, columns, kernel)
+            w_interests, w_personality, w_communication, w_age, w_strategy = kernel.weights
+            results.append(
+                interest * w_interests +
+                personality[kernel.traits] * w_personality +
+                communication[kernel.styles] * w_communication +
+                self.age_block(rows, columns, kernel, age_diff) * w_age +
+                strategy * w_strategy
+            )
+        return results
+
+    def _interest_offsets(self):
+        # CSR copy of interest_sets, built on first use by the pair methods.
+        np = _require_numpy()
+        if getattr(self, '_interest_csr', None) is None:
+            ids = np.fromiter((i for interest_ids in self.interest_sets for i in interest_ids),
+                              dtype=np.int64, count=int(self.interest_counts.sum()))
+            self._interest_csr = (np.concatenate([[0], np.cumsum(self.interest_counts)]), ids)
+        return self._interest_csr
+
+    def interest_pairs(self, sources, targets):
+        """Interest Jaccard score of each (sources[i], targets[i]) pair"""
+        np = _require_numpy()
+        offsets, ids = self._interest_offsets()
+        sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        width = max(len(self.vocabulary), 1)
+        keys = []
+        for rows in (sources, targets):
+            counts = self.interest_counts[rows]
+            starts = np.repeat(offsets[rows] - (np.cumsum(counts) - counts), counts)
+            pair_ids = np.repeat(np.arange(len(rows)), counts)
+            keys.append(pair_ids * width + ids[starts + np.arange(len(starts))])
+        # Interest ids are unique per person, so a repeated key is one shared interest.
+        keys = np.sort(np.concatenate(keys))
+        shared = np.bincount(keys[1:][keys[1:] == keys[:-1]] // width, minlength=len(sources))
+        total = self.interest_counts[sources] + self.interest_counts[targets] - shared
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = (shared / total) * 10
+        return np.where(total > 0, scores, 0.0)
+
+    def _keyed_pairs(self, sources, targets, names, values, mask, orders, signatures, schema=None):
+        # Per-pair form of _keyed_block and (given a schema) _schema_block.
+        np = _require_numpy()
+        sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        scores = np.empty(len(sources), dtype=np.float64)
+        if schema is not None:
+            keys = []
+            for name in schema:
+                if name not in names:
+                    raise KeyError(name)
+                keys.append(names.index(name))
+            groups = [(np.arange(len(sources)), keys)]
+        else:
+            source_orders = orders[sources]
+            groups = [(np.flatnonzero(source_orders == signature_id), signatures[signature_id])
+                      for signature_id in np.unique(source_orders)]
+        for local, keys in groups:
+            if not keys:
+                raise ZeroDivisionError("division by zero")
+            group_sources, group_targets = sources[local], targets[local]
+            present = mask[group_targets][:, list(keys)].all(axis=0)
+            if schema is not None:
+                present &= mask[group_sources][:, list(keys)].all(axis=0)
+            if not present.all():
+                raise KeyError(names[keys[int(np.argmin(present))]])
+            acc = np.zeros(len(local), dtype=np.float64)
+            for key in keys:
+                acc += 10 - np.abs(values[group_sources, key] - values[group_targets, key])
+            scores[local] = acc / len(keys)
+        return scores
+
+    def personality_pairs(self, sources, targets, kernel=None):
+        return self._keyed_pairs(sources, targets, self.trait_names, self.traits, self.trait_mask,
+                                 self.trait_orders, self.trait_signatures, kernel and kernel.traits)
+
+    def communication_pairs(self, sources, targets, kernel=None):
+        return self._keyed_pairs(sources, targets, self.style_names, self.styles, self.style_mask,
+                                 self.style_orders, self.style_signatures, kernel and kernel.styles)
+
+    def age_pairs(self, sources, targets, kernel=None):
+        np = _require_numpy()
+        return self.age_block(None, None, kernel, np.abs(self.ages[sources] - self.ages[targets]))
+
+    def strategy_pairs(self, sources, targets, chunk_size=256):
+        """compatibility_strategy of each (sources[i], targets[i]) pair
+
+        Registered batch strategies score chunks of chunk_size pairs as a small
+        block and keep its diagonal.
+        """
+        np = _require_numpy()
+        sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        scores = np.empty(len(sources), dtype=np.float64)
+        groups = {}
+        for local, row in enumerate(sources.tolist()):
+            groups.setdefault(strategy_class(self.people[row]), []).append(local)
+        for cls, local in groups.items():
+            local = np.array(local, dtype=np.int64)
+            batch = BATCH_STRATEGIES.get(cls)
+            if batch is None:
+                scores[local] = [self.people[int(sources[i])].compatibility_strategy(self.people[int(targets[i])])
+                                 for i in local]
+                continue
+            for start in range(0, len(local), chunk_size):
+                part = local[start:start + chunk_size]
+                block = batch(self, sources[part], targets[part])
+                scores[part] = np.broadcast_to(block, (len(part), len(part))).diagonal()
+        return scores
+
+    def component_pairs(self, sources, targets, kernel=None):
+        """Each SCORE_COMPONENTS score of the (sources[i], targets[i]) pairs, as a dict of arrays"""
+        np = _require_numpy()
+        sources, targets = np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+        return {
+            'interests': self.interest_pairs(sources, targets),
+            'personality': self.personality_pairs(sources, targets, kernel),
+            'communication': self.communication_pairs(sources, targets, kernel),
+            'age': self.age_pairs(sources, targets, kernel),
+            'strategy': self.strategy_pairs(sources, targets),
+        }
+
+    def score_pairs(self, sources, targets, kernel=None, components=None):
+        """analyze_compatibility of each (sources[i], targets[i]) pair, summed as score_block does"""
+        if components is None:
+            components = self.component_pairs(sources, targets, kernel)
+        interests, personality, communication, age, strategy = (kernel or DEFAULT_KERNEL).weights
+        return (
+            components['interests'] * interests +
+            components['personality'] * personality +
+            components['communication'] * communication +
+            components['age'] * age +
+            components['strategy'] * strategy
+        )
+
+
+def _share_arrays(arrays):
+    """Copy arrays into shared memory blocks; returns (blocks, spec for _attach_arrays)"""
+    from multiprocessing import shared_memory
+    blocks, spec = [], {}
+    for name, values in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        blocks.append(block)
+        shared = _require_numpy().ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+        shared[...] = values
+        spec[name] = (block.name, values.shape, values.dtype.str)
+    return blocks, spec
+
+
+def _attach_arrays(spec):
+    # Workers share the parent's resource tracker, which unlinks the blocks
+    # only if the parent dies without doing it itself.
+    from multiprocessing import shared_memory
+    np = _require_numpy()
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+
+_worker_state = None
+
+
+def _init_network_worker(spec, metadata):
+    global _worker_state
+    blocks, arrays = _attach_arrays(spec)
+    identities = arrays.pop('identities')
+    _worker_state = (blocks, PackedPopulation.from_shared_arrays(arrays, metadata), identities)
+
+
+def _score_rows_task(start, stop, threshold, kernel=None):
+    """Edges (rows, columns, scores) at or above threshold for rows start:stop"""
+    np = _require_numpy()
+    _, population, identities = _worker_state
+    block = population.score_block(range(start, stop), kernel=kernel)
+    rows, columns = np.nonzero(block >= threshold)
+    keep = identities[rows + start] != identities[columns]
+    rows, columns = rows[keep], columns[keep]
+    return rows + start, columns, block[rows, columns]
+
+
+MINHASH_PRIME = (1 << 31) - 1
+
+
+def _buckets(np, keys, rows=None):
+    """Map each distinct key to the rows holding it"""
+    if rows is None:
+        rows = np.arange(len(keys))
+    order = np.argsort(keys, kind='stable')
+    keys, rows = keys[order], rows[order]
+    bounds = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1], [True]]))
+    return {int(keys[start]): rows[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])}
+
+
+class ApproximateMatchIndex:
+    """Locality-sensitive buckets over a PackedPopulation for approximate matching
+
+    Trait, style and age vectors are hashed into `tables` random-projection
+    tables of `bits` hyperplanes each; interests get MinHash signatures cut into
+    `bands` bands of `band_rows` values. Everyone sharing a bucket with the query
+    is a candidate. More tables and bands (or multiprobe, which also visits the
+    buckets one bit away) raise recall and query time; more bits lowers both.
+    MinHash buckets larger than `max_bucket` are skipped, as an interest shared
+    by that many people says little about who matches best. Vectors are scaled
+    by `kernel`'s weights (DEFAULT_KERNEL when None).
+    """
+
+    def __init__(self, population, tables=8, bits=None, bands=16, band_rows=2,
+                 multiprobe=True, max_bucket=4096, max_candidates=1024, seed=0, kernel=None):
+        np = _require_numpy()
+        rng = np.random.default_rng(seed)
+        self.population = population
+        self.kernel = kernel or DEFAULT_KERNEL
+        self.tables = tables
+        self.bits = bits or max(1, int(np.ceil(np.log2(max(population.size, 2) / 32))))
+        self.bands = bands
+        self.band_rows = band_rows
+        self.multiprobe = multiprobe
+        self.max_bucket = max_bucket
+        self.max_candidates = max_candidates
+
+        def means(values, mask):
+            return (values * mask).sum(axis=0) / np.maximum(mask.sum(axis=0), 1)
+
+        self.trait_means = means(population.traits, population.trait_mask)
+        self.style_means = means(population.styles, population.style_mask)
+        self.age_mean = float(population.ages.mean()) if population.size else 0.0
+        vectors = self._vectors(population.traits, population.trait_mask,
+                                population.styles, population.style_mask, population.ages)
+        self.planes = rng.standard_normal((tables, vectors.shape[1], self.bits))
+        self.codes = np.zeros((tables, population.size), dtype=np.int64)
+        for table in range(tables):
+            self.codes[table] = self._codes(vectors, table)
+        self.projection_buckets = [_buckets(np, codes) for codes in self.codes]
+
+        self.hash_a = rng.integers(1, MINHASH_PRIME, size=bands * band_rows, dtype=np.int64)
+        self.hash_b = rng.integers(0, MINHASH_PRIME, size=bands * band_rows, dtype=np.int64)
+        counts = population.interest_counts
+        ids = np.array([i for interest_ids in population.interest_sets for i in interest_ids],
+                       dtype=np.int64)
+        self.band_keys = self._band_keys(ids, counts)
+        hashed = np.flatnonzero(counts > 0)
+        self.minhash_buckets = [_buckets(np, keys[hashed], hashed) for keys in self.band_keys]
+
+    def _vectors(self, traits, trait_mask, styles, style_mask, ages):
+        # Centred and scaled by each component's weight per unit of difference,
+        # with missing scores at the mean.
+        np = _require_numpy()
+        weights = self.kernel.weight_map
+        trait_scale = weights['personality'] / max(traits.shape[1], 1)
+        style_scale = weights['communication'] / max(styles.shape[1], 1)
+        return np.hstack([
+            np.where(trait_mask, traits - self.trait_means, 0.0) * trait_scale,
+            np.where(style_mask, styles - self.style_means, 0.0) * style_scale,
+            ((ages - self.age_mean) * (weights['age'] / 2))[:, None],
+        ])
+
+    def _codes(self, vectors, table):
+        np = _require_numpy()
+        signs = (vectors @ self.planes[table]) > 0
+        return signs @ (1 << np.arange(self.bits, dtype=np.int64))
+
+    def _band_keys(self, ids, counts):
+        np = _require_numpy()
+        keys = np.zeros((self.bands, len(counts)), dtype=np.uint64)
+        nonempty = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        for band in range(self.bands):
+            for offset in range(self.band_rows):
+                i = band * self.band_rows + offset
+                signature = np.zeros(len(counts), dtype=np.uint64)
+                if len(ids):
+                    hashed = (self.hash_a[i] * ids + self.hash_b[i]) % MINHASH_PRIME
+                    signature[nonempty] = np.minimum.reduceat(hashed, starts)
+                keys[band] = keys[band] * np.uint64(1000003) + signature
+        return keys
+
+    def _query_keys(self, person):
+        row = self.population.row_of(person)
+        if row is not None:
+            return (self.codes[:, row].tolist(), self.band_keys[:, row].tolist(),
+                    self.population.interest_counts[row] > 0)
+        np = _require_numpy()
+        population = self.population
+
+        def encode(scores, names):
+            values = np.zeros((1, len(names)))
+            mask = np.zeros((1, len(names)), dtype=bool)
+            for column, name in enumerate(names):
+                if name in scores:
+                    values[0, column] = scores[name]
+                    mask[0, column] = True
+            return values, mask
+
+        traits, trait_mask = encode(person.personality_traits, population.trait_names)
+        styles, style_mask = encode(person.communication_style, population.style_names)
+        vectors = self._vectors(traits, trait_mask, styles, style_mask,
+                                np.array([person.age], dtype=np.float64))
+        codes = [int(self._codes(vectors, t)[0]) for t in range(self.tables)]
+        ids = sorted({population.vocabulary[i] for i in person.interests if i in population.vocabulary})
+        ids = np.array(ids, dtype=np.int64)
+        band_keys = self._band_keys(ids, np.array([len(ids)], dtype=np.int64))[:, 0].tolist()
+        return codes, band_keys, len(ids) > 0
+
+    def candidates(self, person):
+        """Sorted rows sharing at least one bucket with `person`"""
+        np = _require_numpy()
+        codes, band_keys, has_interests = self._query_keys(person)
+        found = []
+        for buckets, code in zip(self.projection_buckets, codes):
+            probes = [code]
+            if self.multiprobe:
+                probes += [code ^ (1 << bit) for bit in range(self.bits)]
+            for probe in probes:
+                rows = buckets.get(probe)
+                if rows is not None:
+                    found.append(rows)
+        if has_interests:
+            for buckets, key in zip(self.minhash_buckets, band_keys):
+                rows = buckets.get(key)
+                if rows is not None and len(rows) <= self.max_bucket:
+                    found.append(rows)
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        rows, hits = np.unique(np.concatenate(found), return_counts=True)
+        if self.max_candidates is not None and len(rows) > self.max_candidates:
+            # Keep the rows sharing the most buckets, in row order.
+            keep = np.argsort(-hits, kind='stable')[:self.max_candidates]
+            rows = np.sort(rows[keep])
+        return rows
@@ -0,0 +1,284 @@
+"""CSR friendship graph and network analytics"""
+
+from array import array
+
+from .people import PersonStore
+from .scoring import _require_numpy
+
+
+def _group_keys(np, keys):
+    """(distinct sorted keys, start of each group in sorted order, sort order)"""
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    if not len(keys):
+        return keys, np.zeros(0, dtype=np.int64), order
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[starts], starts, order
+
+
+class FriendshipGraph:
+    """Friendship network as CSR arrays: indptr (int64), indices (int32 positions)
+    and weights (float32 compatibility scores), with network analytics on top
+
+    Row i lists person i's friendships in the order they were stored. Analytics
+    that ignore direction (components, clustering, communities) use the
+    undirected graph, where a friendship in either direction links two people
+    with the larger of the two scores as weight.
+    """
+
+    def __init__(self, indptr, indices, weights):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.size = len(indptr) - 1
+        self._undirected = None
+
+    @classmethod
+    def from_edges(cls, size, edges):
+        """Build from (source, target, score) triples, e.g. analyzer.iter_friendships()"""
+        np = _require_numpy()
+        sources, targets, scores = array('q'), array('q'), array('d')
+        for source, target, score in edges:
+            sources.append(source)
+            targets.append(target)
+            scores.append(score)
+        return cls.from_arrays(size, np.frombuffer(sources, dtype=np.int64),
+                               np.frombuffer(targets, dtype=np.int64), np.frombuffer(scores))
+
+    @classmethod
+    def from_arrays(cls, size, sources, targets, scores):
+        np = _require_numpy()
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=size), out=indptr[1:])
+        return cls(indptr, targets[order].astype(np.int32), scores[order].astype(np.float32))
+
+    @classmethod
+    def from_analyzer(cls, analyzer):
+        """Build from the friendships stored by create_friendship_network"""
+        people = analyzer.people
+        if isinstance(people, PersonStore):
+            positions = {row: position for position, row in enumerate(people.order)}
+            friendships = people.friendships
+            lists = (friendships.get(row, ()) for row in people.order)
+            position_of = lambda friend: positions[friend._row]
+        else:
+            positions = {id(person): position for position, person in enumerate(people)}
+            lists = (person.friendships for person in people)
+            position_of = lambda friend: positions[id(friend)]
+        edges = ((source, position_of(f['friend']), f['compatibility_score'])
+                 for source, entries in enumerate(lists) for f in entries)
+        return cls.from_edges(len(people), edges)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def neighbors(self, position):
+        """(positions, scores) of the friendships of the person at `position`"""
+        start, stop = self.indptr[position], self.indptr[position + 1]
+        return self.indices[start:stop], self.weights[start:stop]
+
+    def _sources(self):
+        np = _require_numpy()
+        return np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self.indptr))
+
+    def out_degrees(self):
+        return _require_numpy().diff(self.indptr)
+
+    def in_degrees(self):
+        return _require_numpy().bincount(self.indices, minlength=self.size)
+
+    def degree_distribution(self, direction='out'):
+        """counts[d] = number of people with degree d ('out', 'in' or 'undirected')"""
+        np = _require_numpy()
+        if direction == 'out':
+            degrees = self.out_degrees()
+        elif direction == 'in':
+            degrees = self.in_degrees()
+        elif direction == 'undirected':
+            degrees = self.undirected().out_degrees()
+        else:
+            raise ValueError(f"direction must be 'out', 'in' or 'undirected', got {direction!r}")
+        return np.bincount(degrees, minlength=1)
+
+    def reciprocal_edges(self):
+        """(first, second) positions with first < second of friendships held in both directions"""
+        np = _require_numpy()
+        sources, targets = self._sources(), self.indices.astype(np.int64)
+        keys = np.unique(sources * self.size + targets)
+        first, second = keys // self.size, keys % self.size
+        forward = first < second
+        first, second = first[forward], second[forward]
+        if not len(first):
+            return first, second
+        reverse_keys = second * self.size + first
+        found = np.minimum(np.searchsorted(keys, reverse_keys), len(keys) - 1)
+        reverse = keys[found] == reverse_keys
+        return first[reverse], second[reverse]
+
+    def reciprocity(self):
+        """Share of directed friendships whose reverse friendship also exists"""
+        if not self.edge_count:
+            return 0.0
+        first, _ = self.reciprocal_edges()
+        return 2 * len(first) / self.edge_count
+
+    def undirected(self):
+        """Symmetric FriendshipGraph without self-loops, one entry per neighbour (max score)"""
+        if self._undirected is None:
+            np = _require_numpy()
+            sources, targets = self._sources(), self.indices.astype(np.int64)
+            keep = sources != targets
+            first = np.concatenate([sources[keep], targets[keep]])
+            second = np.concatenate([targets[keep], sources[keep]])
+            weights = np.concatenate([self.weights[keep], self.weights[keep]])
+            keys, starts, order = _group_keys(np, first * self.size + second)
+            if len(keys):
+                weights = np.maximum.reduceat(weights[order], starts)
+            else:
+                weights = weights[:0]
+            graph = FriendshipGraph.from_arrays(self.size, keys // self.size, keys % self.size, weights)
+            graph._undirected = graph
+            self._undirected = graph
+        return self._undirected
+
+    def connected_components(self):
+        """Label of each person's (weakly) connected component: its smallest position"""
+        np = _require_numpy()
+        graph = self.undirected()
+        sources, targets = graph._sources(), graph.indices.astype(np.int64)
+        labels = np.arange(self.size, dtype=np.int64)
+        while True:
+            # Hook the larger root under the smaller one, then jump pointers to roots.
+            low = np.minimum(labels[sources], labels[targets])
+            high = np.maximum(labels[sources], labels[targets])
+            linked = low != high
+            if not linked.any():
+                return labels
+            np.minimum.at(labels, high[linked], low[linked])
+            while True:
+                jumped = labels[labels]
+                if (jumped == labels).all():
+                    break
+                labels = jumped
+
+    def component_sizes(self):
+        """{label: size} for connected_components(), largest first"""
+        np = _require_numpy()
+        labels, counts = np.unique(self.connected_components(), return_counts=True)
+        order = np.argsort(-counts, kind='stable')
+        return dict(zip(labels[order].tolist(), counts[order].tolist()))
+
+    def triangle_counts(self, chunk_size=1 << 20):
+        """Triangles through each person in the undirected graph
+
+        Edges are oriented from lower to higher (degree, position), so each
+        triangle is found once from its lowest-ranked corner, and wedges are
+        checked against the sorted edge keys in chunks of about chunk_size.
+        """
+        np = _require_numpy()
+        graph = self.undirected()
+        size = self.size
+        degrees = graph.out_degrees()
+        rank = np.empty(size, dtype=np.int64)
+        rank[np.lexsort((np.arange(size), degrees))] = np.arange(size)
+        sources, targets = graph._sources(), graph.indices.astype(np.int64)
+        forward = rank[sources] < rank[targets]
+        sources, targets = sources[forward], targets[forward]
+        order = np.lexsort((targets, sources))
+        sources, targets = sources[order], targets[order]
+        keys = np.sort(np.minimum(sources, targets) * size + np.maximum(sources, targets))
+
+        counts = np.zeros(size, dtype=np.int64)
+        starts = np.searchsorted(sources, np.arange(size + 1))
+        out_degrees = np.diff(starts)
+        wedge_totals = np.cumsum(out_degrees * (out_degrees - 1) // 2)
+        node = 0
+        while node < size:
+            # Take whole nodes until the chunk holds about chunk_size wedges.
+            done = wedge_totals[node - 1] if node else 0
+            stop = max(node + 1, int(np.searchsorted(wedge_totals, done + chunk_size, side='right')))
+            stop = min(stop, size)
+            edge_start, edge_stop = starts[node], starts[stop]
+            position = np.arange(edge_start, edge_stop)
+            remaining = starts[sources[position] + 1] - position - 1
+            first = np.repeat(position, remaining)
+            group_start = np.repeat(np.cumsum(remaining) - remaining, remaining)
+            second = first + 1 + np.arange(len(first)) - group_start
+            a, b = targets[first], targets[second]
+            wedge_keys = np.minimum(a, b) * size + np.maximum(a, b)
+            found = np.searchsorted(keys, wedge_keys)
+            closed = found < len(keys)
+            closed[closed] = keys[found[closed]] == wedge_keys[closed]
+            for corner in (sources[first][closed], a[closed], b[closed]):
+                counts += np.bincount(corner, minlength=size)
+            node = stop
+        return counts
+
+    def clustering_coefficients(self):
+        """Local clustering coefficient of each person (0 below two neighbours)"""
+        np = _require_numpy()
+        degrees = self.undirected().out_degrees()
+        possible = degrees * (degrees - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(possible > 0, 2 * self.triangle_counts() / possible, 0.0)
+
+    def average_clustering(self):
+        coefficients = self.clustering_coefficients()
+        return float(coefficients.mean()) if len(coefficients) else 0.0
+
+    def transitivity(self):
+        """Global clustering: 3 x triangles / connected triples"""
+        degrees = self.undirected().out_degrees()
+        triples = int((degrees * (degrees - 1) // 2).sum())
+        return float(self.triangle_counts().sum()) / triples if triples else 0.0
+
+    def communities(self, max_iterations=50, seed=0):
+        """Community label of each person by weighted label propagation
+
+        Each round a random half of the people adopt the label with the largest
+        total weight among their neighbours (ties to the smaller label), which
+        avoids the oscillation of fully synchronous updates. Labels are
+        renumbered 0..k-1 in order of first appearance.
+        """
+        np = _require_numpy()
+        rng = np.random.default_rng(seed)
+        graph = self.undirected()
+        sources, targets = graph._sources(), graph.indices.astype(np.int64)
+        weights = graph.weights.astype(np.float64)
+        labels = np.arange(self.size, dtype=np.int64)
+        for _ in range(max_iterations if len(sources) else 0):
+            keys, starts, order = _group_keys(np, sources * self.size + labels[targets])
+            totals = np.add.reduceat(weights[order], starts)
+            nodes, candidates = keys // self.size, keys % self.size
+            # Keys are sorted by node then label, so the first entry reaching
+            # the node's largest total is its best label, ties to the smaller.
+            node_starts = np.flatnonzero(np.concatenate([[True], nodes[1:] != nodes[:-1]]))
+            node_best = np.maximum.reduceat(totals, node_starts)
+            reaching = np.flatnonzero(totals == np.repeat(node_best, np.diff(np.append(node_starts, len(nodes)))))
+            first = np.concatenate([[True], nodes[reaching][1:] != nodes[reaching][:-1]])
+            best = labels.copy()
+            best[nodes[reaching][first]] = candidates[reaching][first]
+            changed = best != labels
+            if not changed.any():
+                break
+            update = changed & (rng.random(self.size) < 0.5)
+            labels[update] = best[update]
+        _, first_seen, renumbered = np.unique(labels, return_index=True, return_inverse=True)
+        order = np.argsort(np.argsort(first_seen))
+        return order[renumbered.reshape(-1)]
+
+    def modularity(self, labels):
+        """Weighted modularity of a partition of the undirected graph"""
+        np = _require_numpy()
+        graph = self.undirected()
+        sources, targets = graph._sources(), graph.indices
+        weights = graph.weights.astype(np.float64)
+        total = weights.sum()
+        if total == 0:
+            return 0.0
+        labels = np.asarray(labels)
+        inside = weights[labels[sources] == labels[targets]].sum()
+        strength = np.bincount(labels[sources], weights=weights, minlength=int(labels.max()) + 1)
+        return float(inside / total - ((strength / total) ** 2).sum())
@@ -0,0 +1,133 @@
+"""Bulk loading people from CSV and JSONL files"""
+
+import csv
+import json
+
+from .people import (
+    AdventurousPerson, AnalyticalPerson, COMMUNICATION_STYLES, CreativePerson, EmpatheticPerson,
+    EnergeticPerson, HumorousPerson, IntrovertPerson, LogicalPerson, PERSONALITY_TRAITS, Person,
+    ReservedPerson
+)
+
+
+PERSON_TYPES = {
+    cls.__name__.lower(): cls
+    for cls in (Person, EmpatheticPerson, LogicalPerson, CreativePerson, ReservedPerson,
+                EnergeticPerson, AnalyticalPerson, AdventurousPerson, IntrovertPerson, HumorousPerson)
+}
+PERSON_TYPES.update({name[:-len('person')]: cls for name, cls in list(PERSON_TYPES.items()) if name != 'person'})
+
+
+def _check_score(name, value, where):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f"{where}: {name} must be an integer, got {value!r}") from None
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 10:
+        raise ValueError(f"{where}: {name} must be an integer between 0 and 10, got {value!r}")
+    return value
+
+
+def person_from_record(record, where="record"):
+    """Build a validated Person (or subclass) from a loader record
+
+    `record` is a dict with name, a whole-number age, interests (list or ';'-separated string), an optional
+    type (e.g. 'empathetic' or 'EmpatheticPerson') and either personality_traits /
+    communication_style dicts or one column per trait and style. Every trait in
+    PERSONALITY_TRAITS and style in COMMUNICATION_STYLES is required, and the
+    dicts may not hold any other key.
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"{where}: expected a JSON object")
+    type_name = record.get('type') or 'person'
+    if not isinstance(type_name, str):
+        raise ValueError(f"{where}: type must be a string, got {type_name!r}")
+    person_class = PERSON_TYPES.get(type_name.strip().lower())
+    if person_class is None:
+        raise ValueError(f"{where}: unknown person type {record.get('type')!r}")
+    name = record.get('name')
+    if not name or not isinstance(name, str):
+        raise ValueError(f"{where}: name is required")
+    age = record.get('age')
+    if isinstance(age, str):
+        try:
+            age = int(age.strip())
+        except ValueError:
+            pass
+    elif isinstance(age, float) and age.is_integer():
+        age = int(age)
+    if isinstance(age, bool) or not isinstance(age, int):
+        raise ValueError(f"{where}: age must be an integer, got {record.get('age')!r}")
+    if age < 0:
+        raise ValueError(f"{where}: age must not be negative, got {age}")
+    interests = record.get('interests') or []
+    if isinstance(interests, str):
+        interests = [i.strip() for i in interests.split(';') if i.strip()]
+    elif not isinstance(interests, list) or not all(isinstance(i, str) for i in interests):
+        raise ValueError(f"{where}: interests must be a list of strings, got {interests!r}")
+
+    scores = []
+    for key, names in (('personality_traits', PERSONALITY_TRAITS), ('communication_style', COMMUNICATION_STYLES)):
+        values = record.get(key)
+        if values is None:
+            values = {n: record.get(n) for n in names}
+        elif not isinstance(values, dict):
+            raise ValueError(f"{where}: {key} must be an object, got {values!r}")
+        unknown = [n for n in values if n not in names]
+        if unknown:
+            raise ValueError(f"{where}: unknown {key} {', '.join(map(repr, unknown))}; "
+                             f"expected {', '.join(names)}")
+        checked = {}
+        for trait in names:
+            value = _check_score(trait, values.get(trait), where)
+            if value is None:
+                raise ValueError(f"{where}: {trait} is required")
+            checked[trait] = value
+        scores.append(checked)
+    return person_class(name, age, interests, scores[0], scores[1])
+
+
+def iter_person_records(path, file_format=None):
+    """Yield (line number, record dict) from a CSV or JSONL file without reading it whole"""
+    file_format = file_format or ('jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            reader = csv.DictReader(handle)
+            for record in reader:
+                yield reader.line_num, record
+        elif file_format == 'jsonl':
+            for line_number, line in enumerate(handle, 1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except json.JSONDecodeError as error:
+                        raise ValueError(f"{path}:{line_number}: invalid JSON: {error}") from None
+        else:
+            raise ValueError(f"unsupported format {file_format!r}; expected 'csv' or 'jsonl'")
+
+
+def iter_people_chunks(path, chunk_size=10000, file_format=None):
+    """Yield lists of at most chunk_size validated people from a CSV or JSONL file"""
+    chunk = []
+    for line_number, record in iter_person_records(path, file_format):
+        chunk.append(person_from_record(record, f"{path}:{line_number}"))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_people(analyzer, path, chunk_size=10000, file_format=None):
+    """Stream people from a CSV or JSONL file into analyzer; returns the number loaded"""
+    loaded = 0
+    for chunk in iter_people_chunks(path, chunk_size, file_format):
+        analyzer.add_people(chunk)
+        loaded += len(chunk)
+    return loaded
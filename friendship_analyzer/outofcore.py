@@ -0,0 +1,247 @@
+"""Out-of-core network builds: tiled scoring, sorted runs spilled to disk and a k-way merge"""
+
+import os
+import shutil
+import tempfile
+
+from .scoring import _require_numpy
+
+# Peak bytes per tile cell while a tile is scored and its edges extracted:
+# score_block needs about 41 (measured with tracemalloc), and a tile where
+# every pair is an edge adds 24 per cell for its keys and scores.
+TILE_BYTES_PER_CELL = 80
+# Bytes per buffered edge: an int64 key and a float64 score, plus the
+# concatenated copy, the argsort and the sorted copy made when a run is spilled.
+EDGE_BYTES = 56
+# Bytes per edge handed to an edge sink as Python lists (three objects and list slots).
+OUTPUT_BYTES_PER_EDGE = 160
+MIN_MERGE_FAN_IN = 16
+# Reserved for the build's Python objects: run readers, file handles, names.
+OVERHEAD_BYTES = 64 * 1024
+
+
+def _record_dtype(np):
+    return np.dtype([('key', '<i8'), ('score', '<f8')])
+
+
+def population_bytes(population):
+    """Bytes held by a PackedPopulation's arrays"""
+    np = _require_numpy()
+    total = sum(value.nbytes for value in vars(population).values() if isinstance(value, np.ndarray))
+    return total + sum(posting.nbytes for posting in population.postings)
+
+
+class NetworkBuildPlan:
+    """Tile shape, edge buffer and merge sizes that keep a build under memory_limit bytes
+
+    fixed_bytes (the packed population and per-person arrays) and
+    OVERHEAD_BYTES are taken off the top. Half of the rest bounds a tile while it is scored
+    (tile_rows * tile_columns * TILE_BYTES_PER_CELL), the other half the edge
+    buffer (buffer_edges * EDGE_BYTES); the two phases never overlap with the
+    merge, which gets all of it (merge_fan_in * chunk_edges * EDGE_BYTES).
+    """
+
+    def __init__(self, memory_limit, fixed_bytes, size, max_tile_rows=1024):
+        budget = memory_limit - fixed_bytes - OVERHEAD_BYTES
+        if budget < 2 * TILE_BYTES_PER_CELL + 2 * EDGE_BYTES * MIN_MERGE_FAN_IN:
+            raise ValueError(f"memory_limit {memory_limit} bytes is too small: the population alone "
+                             f"needs {fixed_bytes + OVERHEAD_BYTES} bytes")
+        self.memory_limit = memory_limit
+        self.fixed_bytes = fixed_bytes
+        self.budget = budget
+        cells = budget // 2 // TILE_BYTES_PER_CELL
+        size = max(size, 1)
+        if cells >= size:
+            self.tile_rows = max(1, min(max_tile_rows, size, cells // size))
+        else:
+            self.tile_rows = max(1, min(max_tile_rows, int(cells ** 0.5)))
+        self.tile_columns = max(1, min(size, cells // self.tile_rows))
+        self.buffer_edges = max(1, budget // 2 // EDGE_BYTES)
+        self.chunk_edges = max(1, budget // (EDGE_BYTES * MIN_MERGE_FAN_IN))
+        self.merge_fan_in = max(2, budget // (EDGE_BYTES * self.chunk_edges))
+        self.output_edges = max(1, budget // OUTPUT_BYTES_PER_EDGE)
+
+    def __repr__(self):
+        return (f"<NetworkBuildPlan tiles {self.tile_rows}x{self.tile_columns} "
+                f"buffer {self.buffer_edges} edges, merge {self.merge_fan_in} x {self.chunk_edges}>")
+
+
+class SpilledEdges:
+    """Row-major edge list in a temporary file of (source * size + target, score) records
+
+    Use as a context manager, or call close(), to delete the file.
+    """
+
+    def __init__(self, path, size, count, chunk_edges, directory=None):
+        self.path = path
+        self.size = size
+        self.count = count
+        self.chunk_edges = chunk_edges
+        self._directory = directory
+
+    def iter_chunks(self, chunk_edges=None):
+        """Yield (sources, targets, scores) arrays of at most chunk_edges edges"""
+        np = _require_numpy()
+        chunk_edges = chunk_edges or self.chunk_edges
+        with open(self.path, 'rb', buffering=0) as handle:
+            while True:
+                records = np.fromfile(handle, dtype=_record_dtype(np), count=chunk_edges)
+                if not len(records):
+                    return
+                sources, targets = np.divmod(records['key'], self.size)
+                yield sources, targets, records['score']
+
+    def __iter__(self):
+        for sources, targets, scores in self.iter_chunks():
+            yield from zip(sources.tolist(), targets.tolist(), scores.tolist())
+
+    def source_counts(self):
+        """Edges per source position"""
+        np = _require_numpy()
+        counts = np.zeros(self.size, dtype=np.int64)
+        for sources, _, _ in self.iter_chunks():
+            counts += np.bincount(sources, minlength=self.size)
+        return counts
+
+    def close(self):
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _RunReader:
+    def __init__(self, np, path, chunk_edges):
+        self._np = np
+        self._handle = open(path, 'rb', buffering=0)
+        self._chunk_edges = chunk_edges
+        self.exhausted = False
+        self.records = None
+        self.refill()
+
+    def refill(self):
+        np = self._np
+        self.records = np.fromfile(self._handle, dtype=_record_dtype(np), count=self._chunk_edges)
+        if len(self.records) < self._chunk_edges:
+            self.exhausted = True
+            self._handle.close()
+
+
+def _merge_runs(np, paths, output, chunk_edges):
+    """Merge sorted run files into output, holding at most chunk_edges records per run"""
+    readers = [_RunReader(np, path, chunk_edges) for path in paths]
+    with open(output, 'wb', buffering=0) as handle:
+        while readers:
+            # Everything up to the smallest last key of a run that still has
+            # unread records is final; that run's buffer empties every round.
+            pending = [reader.records['key'][-1] for reader in readers if not reader.exhausted]
+            bound = min(pending) if pending else None
+            parts = []
+            for reader in readers:
+                keys = reader.records['key']
+                cut = len(keys) if bound is None else int(np.searchsorted(keys, bound, side='right'))
+                parts.append(reader.records[:cut])
+                reader.records = reader.records[cut:]
+            merged = np.concatenate(parts)
+            del parts
+            merged[np.argsort(merged['key'], kind='stable')].tofile(handle)
+            del merged
+            remaining = []
+            for reader in readers:
+                if not len(reader.records) and not reader.exhausted:
+                    reader.refill()
+                if len(reader.records) or not reader.exhausted:
+                    remaining.append(reader)
+            readers = remaining
+    for path in paths:
+        os.remove(path)
+
+
+def spill_network(analyzer, memory_limit, temp_dir=None):
+    """Score every pair of analyzer.people in tiles and return the network as SpilledEdges
+
+    Edges at or above analyzer.compatibility_threshold are buffered, spilled
+    to temp_dir as sorted runs when the buffer fills and merged in row-major
+    order (by source, then target), the order iter_friendships yields them
+    with the matrix engine; the default symmetric scan interleaves sources.
+    The plan (see
+    NetworkBuildPlan) keeps the arrays the build allocates, plus the packed
+    population, under memory_limit bytes.
+    """
+    np = _require_numpy()
+    population = analyzer.packed_population()
+    identities = analyzer._identities(population)
+    size = population.size
+    plan = NetworkBuildPlan(memory_limit, population_bytes(population) + identities.nbytes + 8 * size,
+                            size, analyzer.block_size)
+    dtype = _record_dtype(np)
+    directory = tempfile.mkdtemp(prefix='friendship-network-', dir=temp_dir)
+    runs, buffered, count = [], [], 0
+
+    def spill(parts):
+        records = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        path = os.path.join(directory, f"run{len(runs)}.bin")
+        records[np.argsort(records['key'], kind='stable')].tofile(path)
+        runs.append(path)
+
+    try:
+        threshold = analyzer.compatibility_threshold
+        kernel = analyzer.kernel
+        for row_start in range(0, size, plan.tile_rows):
+            rows = range(row_start, min(row_start + plan.tile_rows, size))
+            row_identities = identities[row_start:rows.stop, None]
+            for column_start in range(0, size, plan.tile_columns):
+                columns = range(column_start, min(column_start + plan.tile_columns, size))
+                block = population.score_block(rows, columns, kernel)
+                keep = block >= threshold
+                keep &= row_identities != identities[None, column_start:columns.stop]
+                local_rows, local_columns = np.nonzero(keep)
+                del keep
+                records = np.empty(len(local_rows), dtype=dtype)
+                records['score'] = block[local_rows, local_columns]
+                del block
+                records['key'] = (local_rows + row_start) * size + (local_columns + column_start)
+                del local_rows, local_columns
+                if not len(records):
+                    continue
+                count += len(records)
+                if sum(map(len, buffered)) + len(records) > plan.buffer_edges:
+                    if buffered:
+                        spill(buffered)
+                        buffered = []
+                    if len(records) > plan.buffer_edges:
+                        spill([records])
+                        continue
+                buffered.append(records)
+        if buffered:
+            spill(buffered)
+            buffered = []
+
+        generation = 0
+        while len(runs) > 1:
+            merged = []
+            for start in range(0, len(runs), plan.merge_fan_in):
+                group = runs[start:start + plan.merge_fan_in]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                output = os.path.join(directory, f"merge{generation}-{start}.bin")
+                _merge_runs(np, group, output, plan.chunk_edges)
+                merged.append(output)
+            runs = merged
+            generation += 1
+        if not runs:
+            runs.append(os.path.join(directory, "empty.bin"))
+            open(runs[0], 'wb').close()
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    edges = SpilledEdges(runs[0], size, count, plan.output_edges, directory)
+    edges.plan = plan
+    edges.runs = len(runs)
+    return edges
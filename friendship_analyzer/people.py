@@ -0,0 +1,444 @@
+"""People: the Person classes and the compact PersonStore"""
+
+import itertools
+from array import array
+
+# The attributes analyze_compatibility reads.
+SCORED_ATTRIBUTES = frozenset(('age', 'interests', 'personality_traits', 'communication_style'))
+
+# Version stamps are unique and increasing; next() on a count is atomic, so
+# people can be changed from several threads.
+_versions = itertools.count(1)
+
+
+def _watch_changes(target, analyzer_ref):
+    """Call analyzer_ref()._person_changed(person) when a scored attribute of target is reassigned
+
+    target is a Person, or a PersonStore to hear about every row through its
+    views; analyzer_ref is a weakref.ref to the analyzer.
+    """
+    refs = target.__dict__.get('_watchers')
+    if refs is None:
+        target.__dict__['_watchers'] = [analyzer_ref]
+    elif analyzer_ref not in refs:
+        refs[:] = [ref for ref in refs if ref() is not None]
+        refs.append(analyzer_ref)
+
+
+def _unwatch_changes(target, analyzer_ref):
+    refs = target.__dict__.get('_watchers')
+    if refs:
+        refs[:] = [ref for ref in refs if ref is not analyzer_ref and ref() is not None]
+
+
+def _notify(target, person):
+    for ref in tuple(target.__dict__.get('_watchers', ())):
+        analyzer = ref()
+        if analyzer is not None:
+            analyzer._person_changed(person)
+
+
+class Person:
+    """Represents a person with their characteristics and preferences"""
+
+    # Reassigning one of SCORED_ATTRIBUTES after __init__ gives the person a new
+    # version and tells the analyzers holding them (see _watch_changes). Edits
+    # made in place to the interests list or the score dicts are not seen.
+    version = 0
+
+    def __init__(self, name, age, interests, personality_traits, communication_style):
+        self.name = name
+        self.age = age
+        self.interests = interests
+        self.personality_traits = personality_traits
+        self.communication_style = communication_style
+        self.friendships = []
+
+    def __setattr__(self, name, value):
+        reassigned = name in SCORED_ATTRIBUTES and name in self.__dict__
+        object.__setattr__(self, name, value)
+        if reassigned:
+            self.__dict__['version'] = next(_versions)
+            _notify(self, self)
+
+    def __getstate__(self):
+        # Watching analyzers stay behind; a copy is a new, unwatched person.
+        state = dict(self.__dict__)
+        state.pop('_watchers', None)
+        return state
+
+    def display_info(self):
+        print(f"\n{'='*50}")
+        print(f"Name: {self.name}")
+        print(f"Age: {self.age}")
+        print(f"Interests: {', '.join(self.interests)}")
+        print(f"Personality Traits:")
+        for trait, score in self.personality_traits.items():
+            print(f"  - {trait.title()}: {score}/10")
+        print(f"Communication Style:")
+        for style, score in self.communication_style.items():
+            print(f"  - {style.title()}: {score}/10")
+        print(f"{'='*50}")
+
+    # Largest value compatibility_strategy can return; used to prune top-k searches.
+    max_strategy_score = 5
+
+    def compatibility_strategy(self, other):
+        return 5
+
+class EmpatheticPerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        return 10 if "emotional" in other.communication_style else 4
+
+class LogicalPerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        return 10 if "direct" in other.communication_style else 3
+
+class CreativePerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        return 10 if "humor" in other.communication_style or "openness" in other.personality_traits else 5
+
+class ReservedPerson(Person):
+    max_strategy_score = 9
+
+    def compatibility_strategy(self, other):
+        return 9 if other.personality_traits.get("extroversion", 0) <= 4 else 4
+
+class EnergeticPerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        return 10 if other.personality_traits.get("extroversion", 0) >= 7 else 5
+
+class AnalyticalPerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        diff = abs(self.personality_traits.get("conscientiousness", 5) - other.personality_traits.get("conscientiousness", 5))
+        return 10 - diff
+
+class AdventurousPerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        return 10 if other.personality_traits.get("openness", 0) >= 7 else 5
+
+class IntrovertPerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        return 10 if other.personality_traits.get("extroversion", 0) <= 4 else 3
+
+class HumorousPerson(Person):
+    max_strategy_score = 10
+
+    def compatibility_strategy(self, other):
+        return 10 if other.communication_style.get("humor", 0) >= 7 else 5
+
+PERSONALITY_TRAITS = ['extroversion', 'openness', 'agreeableness', 'conscientiousness', 'neuroticism']
+COMMUNICATION_STYLES = ['direct', 'emotional', 'humor', 'formal']
+
+
+class StoredPerson:
+    """Attribute access for a PersonStore row; mixed into a view class per Person subclass"""
+
+    __slots__ = ()
+    __setattr__ = object.__setattr__  # the store records changes itself (PersonStore.row_versions)
+
+    def __eq__(self, other):
+        if isinstance(other, StoredPerson):
+            return self._store is other._store and self._row == other._row
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, StoredPerson):
+            return not (self._store is other._store and self._row == other._row)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._store), self._row))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name!r} row={self._row}>"
+
+    @property
+    def version(self):
+        return self._store.row_versions.get(self._row, 0)
+
+    @property
+    def name(self):
+        return self._store.names[self._row]
+
+    @name.setter
+    def name(self, value):
+        self._store.ensure_writable()
+        self._store.names[self._row] = value
+
+    @property
+    def age(self):
+        return self._store.ages[self._row]
+
+    @age.setter
+    def age(self, value):
+        self._store.ensure_writable()
+        self._store.ages[self._row] = self._store.check_age(value)
+        self._store.revision += 1
+        self._store.record_change(self._row)
+
+    @property
+    def interests(self):
+        store = self._store
+        start = store.interest_starts[self._row]
+        ids = store.interest_ids[start:start + store.interest_counts[self._row]]
+        return [store.vocabulary[i] for i in ids]
+
+    @interests.setter
+    def interests(self, value):
+        self._store.set_interests(self._row, value)
+        self._store.record_change(self._row)
+
+    @property
+    def personality_traits(self):
+        return self._store.read_scores(self._store.traits, self._store.trait_names, self._row)
+
+    @personality_traits.setter
+    def personality_traits(self, value):
+        self._store.ensure_writable()
+        self._store.write_scores(self._store.traits, self._store.trait_names, self._row, value)
+        self._store.record_change(self._row)
+
+    @property
+    def communication_style(self):
+        return self._store.read_scores(self._store.styles, self._store.style_names, self._row)
+
+    @communication_style.setter
+    def communication_style(self, value):
+        self._store.ensure_writable()
+        self._store.write_scores(self._store.styles, self._store.style_names, self._row, value)
+        self._store.record_change(self._row)
+
+    @property
+    def friendships(self):
+        return self._store.friendships.setdefault(self._row, [])
+
+    @friendships.setter
+    def friendships(self, value):
+        if value:
+            self._store.friendships[self._row] = value
+        else:
+            self._store.friendships.pop(self._row, None)
+
+
+_VIEW_CLASSES = {}
+
+
+def person_class_of(person):
+    """The Person subclass a person, or the row behind a PersonStore view, was created as"""
+    if isinstance(person, StoredPerson):
+        return type(person).__mro__[2]
+    return type(person)
+
+
+def _view_class(person_class):
+    view_class = _VIEW_CLASSES.get(person_class)
+    if view_class is None:
+        view_class = _VIEW_CLASSES[person_class] = type(
+            person_class.__name__, (StoredPerson, person_class),
+            {'__slots__': ('_store', '_row'), '__module__': person_class.__module__})
+    return view_class
+
+
+class PersonStore:
+    """Columnar storage for large populations with a fixed trait schema
+
+    Scores are kept as int8 (-1 marks a missing trait), ages as uint16 and
+    interests as interned ids, so a person costs a few dozen bytes plus their
+    name. Indexing returns lightweight __slots__ views that behave like the
+    Person subclass the row was created from. Deleted rows keep their storage;
+    views stay valid because rows never move.
+
+    A store opened from a snapshot (FriendshipAnalyzer.load) reads its columns
+    straight from the memory-mapped file and copies them on the first change.
+    """
+
+    def __init__(self, personality_traits=PERSONALITY_TRAITS, communication_styles=COMMUNICATION_STYLES):
+        self.trait_names = list(personality_traits)
+        self.style_names = list(communication_styles)
+        self.names = []
+        self.ages = array('H')
+        self.traits = array('b')
+        self.styles = array('b')
+        self.interest_starts = array('Q')
+        self.interest_counts = array('H')
+        self.interest_ids = array('I')
+        self.vocabulary = []
+        self.vocabulary_ids = {}
+        self.kinds = array('B')
+        self.person_classes = []
+        self._friendships = {}
+        self._snapshot_edges = None
+        self._mapped = False
+        self.order = array('Q')
+        self._positions = None
+        self.revision = 0
+        self.row_versions = {}  # version of each row changed through a view
+
+    @property
+    def friendships(self):
+        """Friendship lists by row; a loaded snapshot's edges are materialized on first use"""
+        if self._snapshot_edges is not None:
+            offsets, targets, scores = self._snapshot_edges
+            self._snapshot_edges = None
+            for row in range(len(offsets) - 1):
+                start, stop = offsets[row], offsets[row + 1]
+                if start != stop:
+                    self._friendships[row] = [
+                        {'friend': self.view(targets[i]), 'compatibility_score': scores[i]}
+                        for i in range(start, stop)]
+        return self._friendships
+
+    def ensure_writable(self):
+        """Copy memory-mapped snapshot columns into regular arrays"""
+        if not self._mapped:
+            return
+        self.names = list(self.names)
+        for attribute in ('ages', 'traits', 'styles', 'interest_starts', 'interest_counts',
+                          'interest_ids', 'kinds'):
+            column = getattr(self, attribute)
+            copy = array(column.format)
+            copy.frombytes(column.cast('B'))
+            setattr(self, attribute, copy)
+        self._mapped = False
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        for row in self.order:
+            yield self.view(row)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.view(row) for row in self.order[position]]
+        return self.view(self.order[position])
+
+    def __delitem__(self, position):
+        del self.order[position]
+        self._positions = None  # later rows moved up; rebuilt on the next position() call
+        self.revision += 1
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def extend(self, people):
+        for person in people:
+            self.append(person)
+
+    def view(self, row):
+        view = object.__new__(_view_class(self.person_classes[self.kinds[row]]))
+        view._store = self
+        view._row = row
+        return view
+
+    def position(self, person):
+        """Sequence position of a view of this store"""
+        positions = self._positions
+        if positions is None:
+            # -1 marks deleted rows.
+            positions = self._positions = array('q', [-1]) * len(self.names)
+            for position, row in enumerate(self.order):
+                positions[row] = position
+        position = positions[person._row]
+        if position < 0:
+            raise ValueError(f"row {person._row} is not in the store")
+        return position
+
+    def append(self, person):
+        self.ensure_writable()
+        row = len(self.names)
+        age = self.check_age(person.age)
+        person_class = person_class_of(person)
+        new_class = person_class not in self.person_classes
+        if new_class:
+            if len(self.person_classes) == 256:
+                raise ValueError("a PersonStore holds at most 256 Person classes")
+            self.person_classes.append(person_class)
+        # Every column grows together, so a rejected person leaves no partial row.
+        self.kinds.append(self.person_classes.index(person_class))
+        self.ages.append(age)
+        self.traits.extend([-1] * len(self.trait_names))
+        self.styles.extend([-1] * len(self.style_names))
+        self.interest_starts.append(0)
+        self.interest_counts.append(0)
+        self.names.append(person.name)
+        try:
+            self.write_scores(self.traits, self.trait_names, row, person.personality_traits)
+            self.write_scores(self.styles, self.style_names, row, person.communication_style)
+            self.set_interests(row, person.interests)
+        except ValueError:
+            self._truncate(row)
+            if new_class:
+                self.person_classes.pop()
+            raise
+        self.order.append(row)
+        if self._positions is not None:
+            self._positions.append(len(self.order) - 1)
+        self.revision += 1
+
+    def _truncate(self, rows):
+        for column in (self.kinds, self.ages, self.interest_starts, self.interest_counts, self.names):
+            del column[rows:]
+        del self.traits[rows * len(self.trait_names):]
+        del self.styles[rows * len(self.style_names):]
+
+    def record_change(self, row):
+        """Give row a new version and tell the analyzers watching this store"""
+        self.row_versions[row] = next(_versions)
+        _notify(self, self.view(row))
+
+    @staticmethod
+    def check_age(age):
+        if not isinstance(age, int) or not 0 <= age <= 65535:
+            raise ValueError(f"age must be an integer between 0 and 65535, got {age!r}")
+        return age
+
+    def read_scores(self, column, names, row):
+        width = len(names)
+        values = column[row * width:(row + 1) * width]
+        return {name: value for name, value in zip(names, values) if value >= 0}
+
+    def write_scores(self, column, names, row, scores):
+        width = len(names)
+        values = [-1] * width
+        for name, value in scores.items():
+            if name not in names:
+                raise ValueError(f"{name!r} is not in the store schema {names}")
+            if not isinstance(value, int) or not 0 <= value <= 10:
+                raise ValueError(f"{name} must be an integer between 0 and 10, got {value!r}")
+            values[names.index(name)] = value
+        column[row * width:(row + 1) * width] = array('b', values)
+        self.revision += 1
+
+    def interest_id(self, interest):
+        interest_id = self.vocabulary_ids.get(interest)
+        if interest_id is None:
+            interest_id = self.vocabulary_ids[interest] = len(self.vocabulary)
+            self.vocabulary.append(interest)
+        return interest_id
+
+    def set_interests(self, row, interests):
+        # Rewritten interests are appended; the old slice is left unused.
+        self.ensure_writable()
+        ids = [self.interest_id(interest) for interest in interests]
+        if len(ids) > 65535:
+            raise ValueError("a person can have at most 65535 interests")
+        self.interest_starts[row] = len(self.interest_ids)
+        self.interest_counts[row] = len(ids)
+        self.interest_ids.extend(ids)
+        self.revision += 1
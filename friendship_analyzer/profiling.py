@@ -0,0 +1,91 @@
+"""Per-method and per-phase timing for FriendshipAnalyzer"""
+
+import contextlib
+import json
+import time
+
+
+# Methods FriendshipAnalyzer.enable_profiling times on the analyzer and on its
+# packed population.
+PROFILED_METHODS = (
+    'calculate_interest_compatibility', 'calculate_personality_compatibility',
+    'calculate_communication_compatibility', 'calculate_age_compatibility',
+    'calculate_strategy_compatibility', 'analyze_compatibility', 'symmetric_compatibility',
+    'find_best_matches', 'find_top_k_matches', 'explain_many',
+)
+PROFILED_BLOCKS = (
+    'interest_block', 'personality_block', 'communication_block', 'age_block',
+    'strategy_block', 'score_block', 'component_pairs',
+)
+
+
+class AnalyzerProfile:
+    """Call counts and cumulative time per instrumented method and per phase"""
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.phase_calls = {}
+        self.phase_seconds = {}
+
+    def wrap(self, name, method):
+        calls, seconds, clock = self.calls, self.seconds, time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                seconds[name] = seconds.get(name, 0.0) + clock() - start
+                calls[name] = calls.get(name, 0) + 1
+        timed.__wrapped__ = method
+        return timed
+
+    def instrument(self, target, names):
+        """Shadow target's methods with timed wrappers (instance attributes)"""
+        for name in names:
+            setattr(target, name, self.wrap(name, getattr(type(target), name).__get__(target)))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + time.perf_counter() - start
+            self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+
+    def reset(self):
+        for counter in (self.calls, self.seconds, self.phase_calls, self.phase_seconds):
+            counter.clear()
+
+    def as_dict(self):
+        def rows(calls, seconds):
+            return {name: {'calls': calls[name], 'seconds': seconds[name],
+                           'mean_us': seconds[name] / calls[name] * 1e6}
+                    for name in sorted(seconds, key=seconds.get, reverse=True)}
+        return {'methods': rows(self.calls, self.seconds),
+                'phases': rows(self.phase_calls, self.phase_seconds)}
+
+    def report(self):
+        """Text table of methods and phases, slowest first
+
+        Times are inclusive: analyze_compatibility includes its components.
+        """
+        lines = []
+        for title, rows in (('method', self.as_dict()['methods']), ('phase', self.as_dict()['phases'])):
+            if not rows:
+                continue
+            lines.append(f"{title:40} {'calls':>10} {'total s':>10} {'mean us':>10}")
+            for name, row in rows.items():
+                lines.append(f"{name:40} {row['calls']:10} {row['seconds']:10.4f} {row['mean_us']:10.2f}")
+            lines.append("")
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write as_dict() to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump(self.as_dict(), handle, indent=2)
+
+
+_NO_PHASE = contextlib.nullcontext()
@@ -0,0 +1,232 @@
+"""Scoring weights, compiled scoring kernels and batched compatibility strategies"""
+
+import math
+
+from .people import (
+    AdventurousPerson, AnalyticalPerson, CreativePerson, EmpatheticPerson, EnergeticPerson,
+    HumorousPerson, IntrovertPerson, LogicalPerson, Person, ReservedPerson
+)
+
+
+def _require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("the matrix engine requires NumPy (pip install numpy)") from None
+    return numpy
+
+
+ANALYSIS_WEIGHTS = {
+    'interests': 0.3,
+    'personality': 0.3,
+    'communication': 0.2,
+    'age': 0.1,
+    'strategy': 0.1
+}
+
+SCORE_COMPONENTS = ('interests', 'personality', 'communication', 'age', 'strategy')
+# (largest age difference, score) from the closest bucket up; larger differences score AGE_DEFAULT_SCORE
+AGE_BUCKETS = ((2, 10), (5, 8), (10, 6), (15, 4))
+AGE_DEFAULT_SCORE = 2
+
+
+class ScoringKernel:
+    """A weight profile and trait schema compiled once for scoring
+
+    weights is the weight vector in SCORE_COMPONENTS order. traits and styles
+    name the personality traits and communication styles to score (None scores
+    person1's own keys, the default), with trait_index / style_index mapping
+    them to positions. age_table[d] is the age score for a difference of d
+    years; its last entry covers every larger difference.
+    """
+
+    def __init__(self, name, weights, traits=None, styles=None, age_buckets=AGE_BUCKETS,
+                 age_default=AGE_DEFAULT_SCORE):
+        unknown = set(weights) - set(SCORE_COMPONENTS)
+        missing = set(SCORE_COMPONENTS) - set(weights)
+        if unknown or missing:
+            raise ValueError(f"weight profile {name!r} must give exactly {', '.join(SCORE_COMPONENTS)}")
+        if any(weight < 0 for weight in weights.values()):
+            raise ValueError(f"weight profile {name!r} has a negative weight")
+        if traits is not None and not traits or styles is not None and not styles:
+            raise ValueError(f"weight profile {name!r} has an empty trait schema")
+        self.name = name
+        self.weight_map = dict(weights)
+        self.weights = tuple(weights[component] for component in SCORE_COMPONENTS)
+        self.traits = tuple(traits) if traits is not None else None
+        self.styles = tuple(styles) if styles is not None else None
+        self.trait_index = {trait: i for i, trait in enumerate(self.traits or ())}
+        self.style_index = {style: i for i, style in enumerate(self.styles or ())}
+
+        limits = [limit for limit, _ in age_buckets]
+        if any(limit != int(limit) or limit < 0 for limit in limits) or limits != sorted(set(limits)):
+            raise ValueError("age bucket limits must be increasing non-negative whole years")
+        table = []
+        for age_diff in range(int(limits[-1]) + 1 if limits else 0):
+            table.append(next(score for limit, score in age_buckets if age_diff <= limit))
+        table.append(age_default)
+        self.age_buckets = tuple(age_buckets)
+        self.age_table = tuple(table)
+        self.max_age_score = max(table)
+
+    def age_score(self, age_diff):
+        # age_diff <= limit exactly when ceil(age_diff) <= limit, as limits are whole years.
+        return self.age_table[min(math.ceil(age_diff), len(self.age_table) - 1)]
+
+    @property
+    def has_schema(self):
+        return self.traits is not None or self.styles is not None
+
+    def __repr__(self):
+        return f"<ScoringKernel {self.name!r} {self.weight_map}>"
+
+
+SCORING_PROFILES = {}
+
+
+def register_scoring_profile(name, weights, traits=None, styles=None, age_buckets=AGE_BUCKETS,
+                             age_default=AGE_DEFAULT_SCORE):
+    """Compile a named weight profile and add it to SCORING_PROFILES; returns the ScoringKernel"""
+    kernel = ScoringKernel(name, weights, traits, styles, age_buckets, age_default)
+    SCORING_PROFILES[name] = kernel
+    return kernel
+
+
+DEFAULT_KERNEL = register_scoring_profile('default', ANALYSIS_WEIGHTS)
+
+# Ways to combine the scores in both directions into one mutual score.
+RECIPROCAL_MODES = ('harmonic', 'min')
+
+
+def reciprocal_score(forward, backward, mode='harmonic'):
+    """Mutual score of a pair from analyze_compatibility in both directions
+
+    'harmonic' is 2ab / (a + b), which stays low unless both scores are high;
+    'min' is the lower score. Both are symmetric in the two scores.
+    """
+    low, high = min(forward, backward), max(forward, backward)
+    if mode == 'min':
+        return low
+    if mode == 'harmonic':
+        return 2 * low * high / (low + high) if low + high > 0 else 0.0
+    raise ValueError(f"unknown reciprocal mode {mode!r}; expected one of {RECIPROCAL_MODES}")
+
+
+def reciprocal_scores(forward, backward, mode='harmonic'):
+    """reciprocal_score of each element of two score arrays"""
+    np = _require_numpy()
+    low, high = np.minimum(forward, backward), np.maximum(forward, backward)
+    if mode == 'min':
+        return low
+    if mode == 'harmonic':
+        total = low + high
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, 2 * low * high / total, 0.0)
+    raise ValueError(f"unknown reciprocal mode {mode!r}; expected one of {RECIPROCAL_MODES}")
+
+
+def strategy_class(person):
+    """The class whose compatibility_strategy `person` uses"""
+    return class_strategy(type(person))
+
+
+def class_strategy(person_class):
+    """The class whose compatibility_strategy instances of person_class use"""
+    for cls in person_class.__mro__:
+        if 'compatibility_strategy' in cls.__dict__:
+            return cls
+    return None
+
+
+def strategy_upper_bound(person):
+    """max_strategy_score declared next to the compatibility_strategy in use, else infinity"""
+    cls = strategy_class(person)
+    if cls is None:
+        return float('inf')
+    return cls.__dict__.get('max_strategy_score', float('inf'))
+
+
+# Vectorized compatibility_strategy implementations, keyed by the class that
+# defines the per-pair method. A subclass that overrides compatibility_strategy
+# without registering its own batch form falls back to per-pair calls.
+BATCH_STRATEGIES = {}
+
+
+def register_batch_strategy(cls):
+    """Decorator registering fn(population, rows, columns) as the batched compatibility_strategy of cls
+
+    fn returns the strategy scores of each person in `rows` against the people
+    in `columns` (everyone when None), as an array broadcastable to
+    (len(rows), number of columns). The population's trait_values, style_values,
+    has_trait and has_style helpers take the same `columns`.
+    """
+    def register(fn):
+        BATCH_STRATEGIES[cls] = fn
+        return fn
+    return register
+
+
+@register_batch_strategy(Person)
+def _person_strategy(population, rows, columns):
+    return 5.0
+
+
+def _threshold_strategy(np, condition, hit, miss):
+    return np.where(condition, float(hit), float(miss))[None, :]
+
+
+@register_batch_strategy(EmpatheticPerson)
+def _empathetic_strategy(population, rows, columns):
+    np = _require_numpy()
+    return _threshold_strategy(np, population.has_style("emotional", columns), 10, 4)
+
+
+@register_batch_strategy(LogicalPerson)
+def _logical_strategy(population, rows, columns):
+    np = _require_numpy()
+    return _threshold_strategy(np, population.has_style("direct", columns), 10, 3)
+
+
+@register_batch_strategy(CreativePerson)
+def _creative_strategy(population, rows, columns):
+    np = _require_numpy()
+    condition = population.has_style("humor", columns) | population.has_trait("openness", columns)
+    return _threshold_strategy(np, condition, 10, 5)
+
+
+@register_batch_strategy(ReservedPerson)
+def _reserved_strategy(population, rows, columns):
+    np = _require_numpy()
+    return _threshold_strategy(np, population.trait_values("extroversion", 0, columns) <= 4, 9, 4)
+
+
+@register_batch_strategy(EnergeticPerson)
+def _energetic_strategy(population, rows, columns):
+    np = _require_numpy()
+    return _threshold_strategy(np, population.trait_values("extroversion", 0, columns) >= 7, 10, 5)
+
+
+@register_batch_strategy(AnalyticalPerson)
+def _analytical_strategy(population, rows, columns):
+    np = _require_numpy()
+    own = population.trait_values("conscientiousness", 5, rows)
+    others = population.trait_values("conscientiousness", 5, columns)
+    return 10 - np.abs(own[:, None] - others[None, :])
+
+
+@register_batch_strategy(AdventurousPerson)
+def _adventurous_strategy(population, rows, columns):
+    np = _require_numpy()
+    return _threshold_strategy(np, population.trait_values("openness", 0, columns) >= 7, 10, 5)
+
+
+@register_batch_strategy(IntrovertPerson)
+def _introvert_strategy(population, rows, columns):
+    np = _require_numpy()
+    return _threshold_strategy(np, population.trait_values("extroversion", 0, columns) <= 4, 10, 3)
+
+
+@register_batch_strategy(HumorousPerson)
+def _humorous_strategy(population, rows, columns):
+    np = _require_numpy()
+    return _threshold_strategy(np, population.style_values("humor", 0, columns) >= 7, 10, 5)
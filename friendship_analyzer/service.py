@@ -0,0 +1,153 @@
+"""asyncio match service batching concurrent queries"""
+
+import asyncio
+import functools
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MatchService:
+    """asyncio front-end that answers concurrent match queries in batches
+
+    Queries arriving within `window` seconds of the first pending one (at most
+    max_batch of them) are scored together by analyzer.top_k_positions in
+    `executor`, so the event loop never runs the scan itself. The default
+    executor has a single thread, which also keeps batches from overlapping.
+    Latencies of the last `latency_samples` queries feed latency_percentiles().
+    """
+
+    def __init__(self, analyzer, window=0.002, max_batch=256, executor=None, latency_samples=10000):
+        self.analyzer = analyzer
+        self.window = window
+        self.max_batch = max_batch
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.latencies = deque(maxlen=latency_samples)
+        self.requests = 0
+        self.batches = 0
+        self._pending = []
+        self._timer = None
+        self._running = set()  # executor futures of batches being scored
+
+    async def top_k_positions(self, position, k=10, min_score=None):
+        """[(position, score), ...] best matches for the person at `position`"""
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        future = loop.create_future()
+        self._pending.append((position, k, min_score, future))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        try:
+            return await future
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.batches += 1
+            running = asyncio.get_running_loop().run_in_executor(self.executor, self._score, batch)
+            self._running.add(running)
+            running.add_done_callback(functools.partial(self._deliver, batch))
+
+    def _deliver(self, batch, running):
+        self._running.discard(running)
+        if running.cancelled():
+            _cancel_queries(batch)
+            return
+        error = running.exception()
+        results = [error] * len(batch) if error is not None else running.result()
+        for (_, _, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _score(self, batch):
+        # Queries sharing k and min_score are scored in one call; a bad
+        # position only fails its own query.
+        size = len(self.analyzer.people)
+        results = [None] * len(batch)
+        groups = {}
+        for index, (position, k, min_score, _) in enumerate(batch):
+            if isinstance(position, int) and -size <= position < size:
+                groups.setdefault((k, min_score), []).append(index)
+            else:
+                results[index] = IndexError(f"no person at position {position!r}")
+        for (k, min_score), indices in groups.items():
+            positions = [batch[i][0] % size for i in indices]
+            for index, matches in zip(indices, self.analyzer.top_k_positions(positions, k, min_score)):
+                results[index] = matches
+        return results
+
+    def latency_percentiles(self, percentiles=(50, 90, 99)):
+        """Nearest-rank latency percentiles in milliseconds, e.g. {'p50': 1.2, ...}"""
+        samples = sorted(self.latencies)
+        if not samples:
+            return {f"p{p}": None for p in percentiles}
+        return {f"p{p}": samples[max(0, -(-len(samples) * p // 100) - 1)] * 1000 for p in percentiles}
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'latency_ms': self.latency_percentiles(),
+        }
+
+    async def handle_connection(self, reader, writer):
+        """Answer JSON lines: {"person": position, "k": 10, "min_score": null} or {"stats": true}"""
+        people = self.analyzer.people
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request.get('stats'):
+                        response = self.stats()
+                    else:
+                        matches = await self.top_k_positions(
+                            request['person'], request.get('k', 10), request.get('min_score'))
+                        response = {'matches': [{'position': position, 'name': people[position].name,
+                                                 'score': score} for position, score in matches]}
+                except (ValueError, KeyError, TypeError, AttributeError, IndexError) as error:
+                    response = {'error': str(error)}
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """Start a local JSON-lines TCP server; returns the asyncio.Server"""
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        """Cancel queued queries and running batches, and shut down the executor if the service made it"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        _cancel_queries(batch)
+        for running in list(self._running):
+            if not running.get_loop().is_closed():
+                running.cancel()
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+
+def _cancel_queries(batch):
+    for _, _, _, future in batch:
+        if not future.done() and not future.get_loop().is_closed():
+            future.cancel()
@@ -0,0 +1,203 @@
+"""Versioned binary snapshots of an analyzer, loadable with mmap"""
+
+import importlib
+import itertools
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from .people import PersonStore
+
+
+SNAPSHOT_MAGIC = b'FASNAPSH'
+SNAPSHOT_VERSION = 1
+# magic, format version, reserved, length of the JSON header that follows
+_SNAPSHOT_PREAMBLE = struct.Struct('<8sIIQ')
+
+
+def _aligned(offset):
+    return -(-offset // 8) * 8
+
+
+def _class_path(cls):
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _resolve_class(path):
+    module_name, _, qualname = path.partition(':')
+    if module_name == 'main':
+        module_name = 'friendship_analyzer'  # written before the classes moved into the package
+    try:
+        value = importlib.import_module(module_name)
+        for attribute in qualname.split('.'):
+            value = getattr(value, attribute)
+    except (ImportError, AttributeError):
+        raise ValueError(f"cannot import Person class {path!r} from the snapshot") from None
+    return value
+
+
+class _SnapshotNames:
+    """Names decoded on access from a snapshot's UTF-8 blob"""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        return str(self._blob[self._offsets[row]:self._offsets[row + 1]], 'utf-8')
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+
+def write_snapshot(analyzer, path, edges=None):
+    """Write analyzer.people and their friendships to a binary snapshot
+
+    The file holds SNAPSHOT_MAGIC, then _SNAPSHOT_PREAMBLE, a JSON header
+    (schema, vocabulary, Person classes, section layout) and 8-byte aligned
+    little-endian PersonStore columns plus the friendships as CSR arrays
+    (edge_offsets per person, edge_targets, edge_scores). People must fit the
+    PersonStore schema. Given edges (SpilledEdges in row-major order), those
+    are streamed in place of the stored friendships. Returns the number of
+    edges written.
+    """
+    people = analyzer.people
+    if isinstance(people, PersonStore):
+        store = people
+        positions = {row: position for position, row in enumerate(store.order)}
+        friendship_lists = (store.friendships.get(row, ()) for row in store.order)
+        position_of = lambda friend: positions.get(friend._row) if friend._store is store else None
+    else:
+        store = PersonStore()
+        store.extend(people)
+        positions = {id(person): position for position, person in enumerate(people)}
+        friendship_lists = (person.friendships for person in people)
+        position_of = lambda friend: positions.get(id(friend))
+    if edges is not None:
+        friendship_lists = itertools.repeat(())
+
+    trait_width, style_width = len(store.trait_names), len(store.style_names)
+    columns = {name: array(typecode) for name, typecode in (
+        ('ages', 'H'), ('traits', 'b'), ('styles', 'b'), ('kinds', 'B'),
+        ('interest_starts', 'Q'), ('interest_counts', 'H'), ('interest_ids', 'I'),
+        ('name_offsets', 'Q'), ('names', 'B'),
+        ('edge_offsets', 'Q'), ('edge_targets', 'I'), ('edge_scores', 'd'))}
+    columns['name_offsets'].append(0)
+    columns['edge_offsets'].append(0)
+    names = bytearray()
+    for row, friendships in zip(store.order, friendship_lists):
+        columns['ages'].append(store.ages[row])
+        columns['kinds'].append(store.kinds[row])
+        columns['traits'].extend(store.traits[row * trait_width:(row + 1) * trait_width])
+        columns['styles'].extend(store.styles[row * style_width:(row + 1) * style_width])
+        start, count = store.interest_starts[row], store.interest_counts[row]
+        columns['interest_starts'].append(len(columns['interest_ids']))
+        columns['interest_counts'].append(count)
+        columns['interest_ids'].extend(store.interest_ids[start:start + count])
+        names += store.names[row].encode('utf-8')
+        columns['name_offsets'].append(len(names))
+        for friendship in friendships:
+            target = position_of(friendship['friend'])
+            if target is None:
+                raise ValueError(f"{store.names[row]!r} has a friend who is not in the analyzer")
+            columns['edge_targets'].append(target)
+            columns['edge_scores'].append(friendship['compatibility_score'])
+        columns['edge_offsets'].append(len(columns['edge_targets']))
+    columns['names'].frombytes(names)
+    edge_count = len(columns['edge_targets'])
+    if edges is not None:
+        counts = edges.source_counts()
+        columns['edge_offsets'] = array('Q', [0])
+        columns['edge_offsets'].frombytes(counts.cumsum().astype('=u8').tobytes())
+        edge_count = edges.count
+
+    layout, offset = {}, 0
+    for name, column in columns.items():
+        length = edge_count if name in ('edge_targets', 'edge_scores') else len(column)
+        layout[name] = [offset, column.typecode, length]
+        offset += _aligned(length * column.itemsize)
+    header = json.dumps({
+        'people': len(store),
+        'edges': edge_count,
+        'trait_names': store.trait_names,
+        'style_names': store.style_names,
+        'vocabulary': store.vocabulary,
+        'person_classes': [_class_path(cls) for cls in store.person_classes],
+        'compatibility_threshold': analyzer.compatibility_threshold,
+        'sections': layout,
+    }).encode('utf-8')
+
+    with open(path, 'wb') as handle:
+        handle.write(_SNAPSHOT_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(header)))
+        handle.write(header)
+        handle.write(bytes(_aligned(handle.tell()) - handle.tell()))
+        for name, column in columns.items():
+            if edges is not None and name in ('edge_targets', 'edge_scores'):
+                written = 0
+                for _, targets, scores in edges.iter_chunks():
+                    data = (targets.astype('<u4') if name == 'edge_targets' else scores.astype('<f8')).tobytes()
+                    handle.write(data)
+                    written += len(data)
+                handle.write(bytes(_aligned(written) - written))
+                continue
+            if sys.byteorder == 'big':
+                column.byteswap()
+            data = column.tobytes()
+            handle.write(data)
+            handle.write(bytes(_aligned(len(data)) - len(data)))
+    return edge_count
+
+
+def read_snapshot(path, use_mmap=True):
+    """Return (PersonStore, header) from a file written by write_snapshot
+
+    With use_mmap the store's columns are read-only views of the mapped file,
+    so opening is near-instant and processes loading the same snapshot share
+    its pages; the store copies them on its first change.
+    """
+    with open(path, 'rb') as handle:
+        preamble = handle.read(_SNAPSHOT_PREAMBLE.size)
+        if len(preamble) != _SNAPSHOT_PREAMBLE.size or preamble[:8] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a friendship analyzer snapshot")
+        _, version, _, header_length = _SNAPSHOT_PREAMBLE.unpack(preamble)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is snapshot version {version}, expected {SNAPSHOT_VERSION}")
+        header = json.loads(handle.read(header_length))
+        use_mmap = use_mmap and sys.byteorder == 'little'
+        if use_mmap:
+            buffer = memoryview(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            handle.seek(0)
+            buffer = memoryview(handle.read())
+
+    data_start = _aligned(_SNAPSHOT_PREAMBLE.size + header_length)
+    columns = {}
+    for name, (offset, typecode, length) in header['sections'].items():
+        start = data_start + offset
+        data = buffer[start:start + length * array(typecode).itemsize]
+        if use_mmap:
+            columns[name] = data.cast(typecode)
+        else:
+            columns[name] = array(typecode)
+            columns[name].frombytes(data)
+            if sys.byteorder == 'big':
+                columns[name].byteswap()
+
+    store = PersonStore(header['trait_names'], header['style_names'])
+    names = _SnapshotNames(columns.pop('names'), columns.pop('name_offsets'))
+    store.names = names if use_mmap else list(names)
+    for name in ('ages', 'traits', 'styles', 'kinds', 'interest_starts', 'interest_counts', 'interest_ids'):
+        setattr(store, name, columns[name])
+    store.vocabulary = header['vocabulary']
+    store.vocabulary_ids = {interest: i for i, interest in enumerate(store.vocabulary)}
+    store.person_classes = [_resolve_class(path) for path in header['person_classes']]
+    store.order = array('Q', range(header['people']))
+    store._mapped = use_mmap
+    if header['edges']:
+        store._snapshot_edges = (columns['edge_offsets'], columns['edge_targets'], columns['edge_scores'])
+    return store, header
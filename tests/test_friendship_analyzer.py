@@ -5,18 +5,60 @@ Unit tests for the Friendship Analyzer
 """
 
 import unittest
+import asyncio
+import contextlib
+import io
+import json
+import random
 import sys
 import os
+import pickle
+import subprocess
+import tempfile
 
-# Add parent directory to path to import main module
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Add parent directory to path to import the friendship_analyzer package
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Import from your main file
+# Import from the package
 from friendship_analyzer import (
     Person, FriendshipAnalyzer, EmpatheticPerson, LogicalPerson, 
     CreativePerson, ReservedPerson, EnergeticPerson, AnalyticalPerson,
-    AdventurousPerson, IntrovertPerson, HumorousPerson
+    AdventurousPerson, IntrovertPerson, HumorousPerson, PersonStore,
+    load_people, iter_people_chunks, read_binary_edges, BATCH_STRATEGIES,
+    register_batch_strategy, MatchService, FriendshipGraph, ScoringKernel, DEFAULT_KERNEL,
+    SCORING_PROFILES, spill_network, RECIPROCAL_MODES, reciprocal_score
 )
+from friendship_analyzer.cli import main as cli_main
+from friendship_analyzer.outofcore import population_bytes
+from friendship_analyzer.analyzer import _group_sizes
+
+PERSON_TYPES = [
+    Person, EmpatheticPerson, LogicalPerson, CreativePerson, ReservedPerson,
+    EnergeticPerson, AnalyticalPerson, AdventurousPerson, IntrovertPerson, HumorousPerson
+]
+INTERESTS = ["reading", "coding", "gaming", "chess", "music", "hiking", "cooking", "art"]
+TRAITS = ["extroversion", "openness", "agreeableness", "conscientiousness", "neuroticism"]
+STYLES = ["direct", "emotional", "humor", "formal"]
+
+
+def make_population(size, seed=0):
+    """Build a reproducible mixed population of people"""
+    rng = random.Random(seed)
+    people = []
+    for i in range(size):
+        person_type = rng.choice(PERSON_TYPES)
+        people.append(person_type(
+            f"Person{i}", rng.randint(18, 60),
+            rng.sample(INTERESTS, rng.randint(0, 4)),
+            {t: rng.randint(0, 10) for t in TRAITS},
+            {s: rng.randint(0, 10) for s in STYLES}
+        ))
+    return people
 
 
 class TestFriendshipAnalyzer(unittest.TestCase):
@@ -302,6 +344,1740 @@ class TestFriendshipAnalyzer(unittest.TestCase):
             self.fail(f"display_network_stats raised an exception: {e}")
 
 
+class TestSymmetricNetwork(unittest.TestCase):
+    """Tests for the unordered-pair network builder"""
+
+    def network(self, people, symmetric):
+        analyzer = FriendshipAnalyzer()
+        analyzer.symmetric_pairs = symmetric
+        analyzer.compatibility_threshold = 5.0
+        for person in people:
+            person.friendships = []
+            analyzer.add_person(person)
+        analyzer.create_friendship_network()
+        return [[(f['friend'], f['compatibility_score']) for f in p.friendships] for p in people]
+
+    def test_symmetric_build_matches_ordered_build(self):
+        """Scoring each unordered pair once should give the same edges in the same order"""
+        people = make_population(40, seed=5)
+        self.assertEqual(self.network(people, True), self.network(people, False))
+
+    def test_mixed_trait_order_falls_back(self):
+        """People whose trait keys are in a different order are scored in both directions"""
+        people = make_population(20, seed=6)
+        for person in people[::3]:
+            person.personality_traits = {
+                t: person.personality_traits[t] + 0.1 for t in reversed(TRAITS)}
+        self.assertEqual(self.network(people, True), self.network(people, False))
+
+    def test_symmetric_compatibility_plus_strategy(self):
+        """The symmetric part plus the weighted strategy is analyze_compatibility"""
+        analyzer = FriendshipAnalyzer()
+        alice, bob = make_population(2, seed=7)
+        expected = analyzer.analyze_compatibility(alice, bob)
+        combined = analyzer.symmetric_compatibility(alice, bob) + alice.compatibility_strategy(bob) * 0.1
+        self.assertEqual(combined, expected)
+
+
+class TestInterestIndex(unittest.TestCase):
+    """Tests for the inverted interest index"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer()
+        self.people = make_population(70, seed=21)
+        for person in self.people:
+            self.analyzer.add_person(person)
+
+    def test_interest_candidates_share_an_interest(self):
+        """Candidates are exactly the other people sharing an interest, in list order"""
+        person = self.people[0]
+        expected = [p for p in self.people
+                    if p is not person and set(p.interests) & set(person.interests)]
+        self.assertEqual(self.analyzer.interest_candidates(person), expected)
+
+    def test_bitset_scores_match_set_scores(self):
+        """Indexed interest scores should equal the set-based computation"""
+        plain = FriendshipAnalyzer()
+        for person1 in self.people[:10]:
+            for person2 in self.people:
+                self.assertEqual(self.analyzer.calculate_interest_compatibility(person1, person2),
+                                 plain.calculate_interest_compatibility(person1, person2))
+
+    def test_scores_follow_reassigned_and_edited_interests(self):
+        """Interest scores should be read from person.interests, not the index"""
+        plain = FriendshipAnalyzer()
+        a, b = self.people[:2]
+        for use_index in (True, False):
+            self.analyzer.use_interest_index = use_index
+            a.interests = ["zither"]
+            self.assertEqual(self.analyzer.analyze_compatibility(a, b), plain.analyze_compatibility(a, b))
+            a.interests.append(b.interests[0] if b.interests else "zither")
+            self.assertEqual(self.analyzer.analyze_compatibility(a, b), plain.analyze_compatibility(a, b))
+
+    def test_reassigned_interests_are_reindexed(self):
+        """Candidates and the indexed network should follow reassigned interests"""
+        a = self.people[0]
+        self.analyzer.interest_candidates(a)
+        a.interests = ["zither"]
+        self.people[5].interests = ["zither", "music"]
+        self.assertEqual(self.analyzer.interest_candidates(a), [self.people[5]])
+        self.assertEqual(self.analyzer.interest_bits(a), 1 << self.analyzer.interest_ids["zither"])
+        self.analyzer.compatibility_threshold = 5.0
+        self.analyzer.create_friendship_network()
+        indexed = [[(f['friend'], f['compatibility_score']) for f in p.friendships] for p in self.people]
+        self.analyzer.use_interest_index = False
+        self.analyzer.create_friendship_network()
+        self.assertEqual(indexed, [[(f['friend'], f['compatibility_score']) for f in p.friendships]
+                                   for p in self.people])
+
+    def test_indexed_network_matches_full_scan(self):
+        """Candidate generation must not drop any edge at any threshold"""
+        for threshold in (7.0, 6.0, 5.0):
+            networks = []
+            for use_index in (True, False):
+                for person in self.people:
+                    person.friendships = []
+                self.analyzer.use_interest_index = use_index
+                self.analyzer.compatibility_threshold = threshold
+                self.analyzer.create_friendship_network()
+                networks.append([[(f['friend'], f['compatibility_score']) for f in p.friendships]
+                                 for p in self.people])
+            self.assertEqual(networks[0], networks[1])
+
+    def test_identical_traits_without_shared_interests(self):
+        """Pairs with no shared interest but perfect other components still connect"""
+        traits = {"extroversion": 5, "openness": 5}
+        analyzer = FriendshipAnalyzer()
+        twin1 = EmpatheticPerson("Twin1", 30, ["chess"], dict(traits), {"emotional": 5})
+        twin2 = EmpatheticPerson("Twin2", 30, ["music"], dict(traits), {"emotional": 5})
+        analyzer.add_person(twin1)
+        analyzer.add_person(twin2)
+        analyzer.compatibility_threshold = 7.0
+        analyzer.create_friendship_network()
+        self.assertEqual(len(twin1.friendships), 1)
+        self.assertEqual(len(twin2.friendships), 1)
+
+    def test_people_appended_directly_are_indexed(self):
+        """Appending to analyzer.people without add_person triggers a rebuild"""
+        newcomer = Person("Newcomer", 30, list(self.people[0].interests) + ["origami"],
+                          {"extroversion": 5}, {"humor": 5})
+        self.analyzer.people.append(newcomer)
+        self.assertIn(newcomer, self.analyzer.interest_candidates(self.people[0]))
+
+
+def network_edges(analyzer):
+    """Snapshot of every friendships list as (friend name, score) pairs"""
+    return [[(f['friend'].name, f['compatibility_score']) for f in p.friendships]
+            for p in analyzer.people]
+
+
+class TestIncrementalNetwork(unittest.TestCase):
+    """Tests for incremental add/remove/update of people"""
+
+    def setUp(self):
+        self.people = make_population(40, seed=31)
+        self.analyzer = FriendshipAnalyzer()
+        self.analyzer.compatibility_threshold = 6.0
+        self.analyzer.incremental_network = True
+        for person in self.people:
+            self.analyzer.add_person(person)
+
+    def rebuilt(self):
+        """Network edges after a full rebuild of the current population"""
+        fresh = FriendshipAnalyzer()
+        fresh.compatibility_threshold = 6.0
+        for person in self.analyzer.people:
+            fresh.add_person(type(person)(person.name, person.age, list(person.interests),
+                                          dict(person.personality_traits),
+                                          dict(person.communication_style)))
+        fresh.create_friendship_network()
+        return network_edges(fresh), fresh.total_friendships
+
+    def assert_matches_rebuild(self):
+        edges, total = self.rebuilt()
+        self.assertEqual(network_edges(self.analyzer), edges)
+        self.assertEqual(self.analyzer.total_friendships, total)
+
+    def test_rebuilding_does_not_duplicate_edges(self):
+        """Calling create_friendship_network twice should give the same network"""
+        self.analyzer.create_friendship_network()
+        first = network_edges(self.analyzer)
+        self.analyzer.create_friendship_network()
+        self.assertEqual(network_edges(self.analyzer), first)
+
+    def test_incremental_add_matches_rebuild(self):
+        """Adding people one by one should equal building the network at once"""
+        self.assert_matches_rebuild()
+
+    def test_remove_person_matches_rebuild(self):
+        """Removing a person should drop their row and column"""
+        removed = self.people[7]
+        self.analyzer.remove_person(removed)
+        self.assertNotIn(removed, self.analyzer.people)
+        self.assertEqual(removed.friendships, [])
+        self.assert_matches_rebuild()
+        with self.assertRaises(ValueError):
+            self.analyzer.remove_person(removed)
+
+    def test_update_person_matches_rebuild(self):
+        """Updating traits and interests should rescore that person's row and column"""
+        person = self.people[3]
+        self.analyzer.update_person(person, age=44, interests=["cooking", "art"],
+                                    personality_traits={t: 9 for t in TRAITS})
+        self.assertEqual(person.age, 44)
+        self.assert_matches_rebuild()
+        expected = [p for p in self.analyzer.people
+                    if p is not person and set(p.interests) & {"cooking", "art"}]
+        self.assertEqual(self.analyzer.interest_candidates(person), expected)
+
+    def test_update_person_rejects_unknown_attributes(self):
+        """Only scoring attributes can be updated"""
+        with self.assertRaises(TypeError):
+            self.analyzer.update_person(self.people[0], height=180)
+
+    def test_remove_without_incremental_mode(self):
+        """Removal also works when the network is not maintained"""
+        analyzer = FriendshipAnalyzer()
+        for person in self.people[:5]:
+            analyzer.add_person(person)
+        analyzer.remove_person(self.people[2])
+        self.assertEqual(analyzer.people, self.people[:2] + self.people[3:5])
+        self.assertEqual(analyzer.interest_candidates(self.people[0]),
+                         [p for p in analyzer.people
+                          if p is not self.people[0] and set(p.interests) & set(self.people[0].interests)])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_remove_after_rebuild_drops_edges(self):
+        """Without incremental mode, removal still drops edges into the removed person"""
+        analyzer = FriendshipAnalyzer()
+        analyzer.compatibility_threshold = 6.0
+        for person in self.people:
+            analyzer.add_person(person)
+        analyzer.create_friendship_network()
+        removed = self.people[7]
+        expected = [[edge for edge in edges if edge[0] != removed.name]
+                    for person, edges in zip(self.people, network_edges(analyzer)) if person is not removed]
+        analyzer.remove_person(removed)
+        self.assertEqual(network_edges(analyzer), expected)
+        self.assertEqual(removed.friendships, [])
+        graph = analyzer.friendship_graph()
+        self.assertEqual(graph.edge_count, analyzer.total_friendships)
+        with tempfile.TemporaryDirectory() as directory:
+            analyzer.save(os.path.join(directory, "people.snap"))
+
+    def test_stats_count_the_stored_friendships(self):
+        """display_network_stats counts edges added or dropped outside the rebuild"""
+        analyzer = FriendshipAnalyzer()
+        for person in self.people[:3]:
+            analyzer.add_person(type(person)(person.name, person.age, list(person.interests),
+                                             dict(person.personality_traits),
+                                             dict(person.communication_style)))
+        first, second, _ = analyzer.people
+        first.friendships.append({'friend': second, 'compatibility_score': 7.0})
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            analyzer.display_network_stats()
+        self.assertIn("Total Friendships: 1\n", output.getvalue())
+
+
+class TestPersonStore(unittest.TestCase):
+    """Tests for columnar person storage"""
+
+    def setUp(self):
+        self.people = make_population(50, seed=41)
+        self.store = PersonStore()
+        for person in self.people:
+            self.store.append(person)
+
+    def test_views_round_trip(self):
+        """Views should expose the same attributes and class as the original people"""
+        self.assertEqual(len(self.store), len(self.people))
+        for person, view in zip(self.people, self.store):
+            self.assertIsInstance(view, type(person))
+            self.assertEqual(view.name, person.name)
+            self.assertEqual(view.age, person.age)
+            self.assertEqual(view.interests, person.interests)
+            self.assertEqual(view.personality_traits, person.personality_traits)
+            self.assertEqual(view.communication_style, person.communication_style)
+            self.assertEqual(type(view).__slots__, ('_store', '_row'))
+
+    def test_people_keep_their_own_attributes(self):
+        """Person objects still accept attributes of their own"""
+        person = self.people[0]
+        person.email = "person0@example.com"
+        self.assertEqual(person.email, "person0@example.com")
+
+    def test_positions_follow_appends_and_deletes(self):
+        """position() should match the sequence order after deletes and appends"""
+        views = list(self.store)
+        self.assertEqual(self.store.position(views[7]), 7)
+        del self.store[3]
+        self.store.append(self.people[0])
+        del self.store[10]
+        for position, view in enumerate(self.store):
+            self.assertEqual(self.store.position(view), position)
+        with self.assertRaises(ValueError):
+            self.store.position(views[3])
+
+    def test_views_compare_by_row(self):
+        """Two views of the same row are equal and hash alike"""
+        self.assertEqual(self.store[3], self.store[3])
+        self.assertNotEqual(self.store[3], self.store[4])
+        self.assertEqual(len({self.store[3], self.store[3]}), 1)
+        self.assertNotEqual(self.store[3], self.people[3])
+
+    def test_invalid_scores_are_rejected(self):
+        """Scores outside 0-10 or traits outside the schema raise ValueError"""
+        with self.assertRaises(ValueError):
+            self.store.append(Person("Bad", 30, [], {"extroversion": 11}, {}))
+        with self.assertRaises(ValueError):
+            self.store.append(Person("Bad", 30, [], {"charisma": 5}, {}))
+        self.assertEqual(len(self.store), len(self.people))
+        self.assertEqual(self.store[-1].name, self.people[-1].name)
+
+    def test_rejected_people_leave_no_partial_row(self):
+        """A bad age or score rolls back every column, so later people keep their class"""
+        store = PersonStore()
+        store.append(LogicalPerson("First", 25, [], {}, {}))
+        for bad in (EmpatheticPerson("Bad", -1, [], {}, {}), EmpatheticPerson("Bad", 70000, [], {}, {}),
+                    AnalyticalPerson("Bad", 30, [], {"extroversion": 11}, {})):
+            with self.assertRaises(ValueError):
+                store.append(bad)
+        store.append(HumorousPerson("Valid", 30, ["music"], {}, {}))
+        self.assertEqual((len(store.kinds), len(store.ages), len(store.names)), (2, 2, 2))
+        self.assertIsInstance(store[1], HumorousPerson)
+        self.assertEqual(store.person_classes, [LogicalPerson, HumorousPerson])
+
+    def test_missing_traits_stay_missing(self):
+        """People with partial trait dicts keep only the traits they had"""
+        self.store.append(Person("Partial", 30, ["chess"], {"openness": 4}, {}))
+        self.assertEqual(self.store[-1].personality_traits, {"openness": 4})
+        self.assertEqual(self.store[-1].communication_style, {})
+
+    def test_store_backed_analyzer_matches_list(self):
+        """Matching and network building should not depend on the storage"""
+        listed = FriendshipAnalyzer()
+        stored = FriendshipAnalyzer(PersonStore())
+        for person in self.people:
+            listed.add_person(person)
+            stored.add_person(person)
+        named = lambda matches: [(p.name, score) for p, score in matches]
+        self.assertEqual(named(stored.find_best_matches(stored.people[2])),
+                         named(listed.find_best_matches(listed.people[2])))
+        for analyzer in (listed, stored):
+            analyzer.compatibility_threshold = 6.0
+            analyzer.create_friendship_network()
+        self.assertEqual(network_edges(stored), network_edges(listed))
+        self.assertEqual(stored.total_friendships, listed.total_friendships)
+
+    def test_incremental_updates_on_store(self):
+        """remove_person and update_person work on store views"""
+        listed = FriendshipAnalyzer()
+        stored = FriendshipAnalyzer(PersonStore())
+        for analyzer in (listed, stored):
+            analyzer.compatibility_threshold = 6.0
+            analyzer.incremental_network = True
+        for person in self.people:
+            listed.add_person(person)
+            stored.add_person(person)
+        for analyzer in (listed, stored):
+            analyzer.remove_person(analyzer.people[5])
+            analyzer.update_person(analyzer.people[8], age=61, interests=["gardening"])
+        self.assertEqual(network_edges(stored), network_edges(listed))
+        self.assertEqual(stored.people[8].interests, ["gardening"])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_engine_reads_store_columns(self):
+        """The matrix engine should pack a store without going through views"""
+        listed = FriendshipAnalyzer()
+        stored = FriendshipAnalyzer(self.store)
+        for person in self.people:
+            listed.add_person(person)
+        del self.store[0]
+        del listed.people[0]
+        self.assertTrue(numpy.array_equal(stored.compatibility_matrix(), listed.compatibility_matrix()))
+
+
+class TestBulkLoader(unittest.TestCase):
+    """Tests for streaming CSV/JSONL loading"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, filename, text):
+        path = os.path.join(self.directory.name, filename)
+        with open(path, 'w') as handle:
+            handle.write(text)
+        return path
+
+    def test_load_csv(self):
+        """CSV rows become people of the requested subclass"""
+        path = self.write("people.csv",
+                          "name,age,type,interests," + ",".join(TRAITS + STYLES) + "\n"
+                          "Ali,25,logical,coding;chess,4,6,7,9,3,9,2,5,6\n"
+                          "Sara,26,EmpatheticPerson,coding,5,7,8,7,6,6,9,7,4\n"
+                          "Bo,40,,,3,3,3,3,3,3,3,3,3\n")
+        analyzer = FriendshipAnalyzer()
+        self.assertEqual(load_people(analyzer, path), 3)
+        ali, sara, bo = analyzer.people
+        self.assertIsInstance(ali, LogicalPerson)
+        self.assertIsInstance(sara, EmpatheticPerson)
+        self.assertIs(type(bo), Person)
+        self.assertEqual(ali.interests, ["coding", "chess"])
+        self.assertEqual(ali.personality_traits, dict(zip(TRAITS, [4, 6, 7, 9, 3])))
+        self.assertEqual(sara.communication_style, dict(zip(STYLES, [6, 9, 7, 4])))
+        self.assertEqual(bo.interests, [])
+        self.assertEqual(analyzer.interest_candidates(ali), [sara])
+
+    def test_load_jsonl_in_chunks(self):
+        """JSONL is read in chunks and can feed a PersonStore"""
+        records = [{"name": f"P{i}", "age": 20 + i, "type": "humorous", "interests": ["art"],
+                    "personality_traits": {t: i % 11 for t in TRAITS},
+                    "communication_style": {s: 7 for s in STYLES}} for i in range(25)]
+        path = self.write("people.jsonl", "\n".join(json.dumps(r) for r in records) + "\n")
+        self.assertEqual([len(c) for c in iter_people_chunks(path, chunk_size=10)], [10, 10, 5])
+        analyzer = FriendshipAnalyzer(PersonStore())
+        self.assertEqual(load_people(analyzer, path, chunk_size=10), 25)
+        self.assertIsInstance(analyzer.people[24], HumorousPerson)
+        self.assertEqual(analyzer.people[24].personality_traits, {t: 24 % 11 for t in TRAITS})
+
+    def test_invalid_rows_report_their_line(self):
+        """Out-of-range traits, bad ages and unknown types raise ValueError with the line"""
+        header = "name,age,type," + ",".join(TRAITS + STYLES) + "\n"
+        scores = ",5,5,5,5,5,5,5,5\n"
+        for row in ("Ali,25,logical,11" + scores, "Ali,old,logical,4" + scores, "Ali,25,wizard,4" + scores):
+            path = self.write("bad.csv", header + "Ok,30,,5" + scores + row)
+            with self.assertRaisesRegex(ValueError, r"bad\.csv:3"):
+                load_people(FriendshipAnalyzer(), path)
+
+    def test_incomplete_schema_is_rejected(self):
+        """Missing or unknown traits and non-string types fail with the line, not later"""
+        path = self.write("short.csv", "name,age,type,extroversion,openness\nAli,25,logical,4,6\n")
+        with self.assertRaisesRegex(ValueError, r"short\.csv:2: agreeableness is required"):
+            load_people(FriendshipAnalyzer(), path)
+        path = self.write("blank.csv", "name,age," + ",".join(TRAITS + STYLES) + "\n"
+                          "Ali,25,,5,5,5,5,5,5,5,5\n")
+        with self.assertRaisesRegex(ValueError, r"blank\.csv:2: extroversion is required"):
+            load_people(FriendshipAnalyzer(), path)
+        record = {"name": "Ali", "age": 25, "interests": [],
+                  "personality_traits": {t: 5 for t in TRAITS},
+                  "communication_style": {s: 5 for s in STYLES}}
+        for change in ({"type": 3}, {"personality_traits": dict(record["personality_traits"], charm=5)},
+                       {"communication_style": [5, 5, 5, 5]}, {"interests": [1]}):
+            path = self.write("bad.jsonl", json.dumps(record) + "\n" + json.dumps(dict(record, **change)) + "\n")
+            with self.assertRaisesRegex(ValueError, r"bad\.jsonl:2"):
+                load_people(FriendshipAnalyzer(), path)
+
+    def test_records_must_be_objects_with_whole_ages(self):
+        """Non-object JSON lines and fractional ages fail with the line; the CLI reports them"""
+        record = {"name": "Ali", "age": 25, "interests": [],
+                  "personality_traits": {t: 5 for t in TRAITS},
+                  "communication_style": {s: 5 for s in STYLES}}
+        for line, message in (("[1, 2]", "expected a JSON object"), ('"x"', "expected a JSON object"),
+                              (json.dumps(dict(record, age=30.9)), "age must be an integer"),
+                              (json.dumps(dict(record, age=True)), "age must be an integer")):
+            path = self.write("bad.jsonl", json.dumps(record) + "\n" + line + "\n")
+            with self.assertRaisesRegex(ValueError, r"bad\.jsonl:2: " + message):
+                load_people(FriendshipAnalyzer(), path)
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(cli_main(['stats', path]), 1)
+        path = self.write("whole.jsonl", json.dumps(dict(record, age=30.0)) + "\n")
+        analyzer = FriendshipAnalyzer()
+        load_people(analyzer, path)
+        self.assertEqual(analyzer.people[0].age, 30)
+
+
+class TestStreamingEdges(unittest.TestCase):
+    """Tests for iter_friendships and edge export"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer()
+        self.analyzer.compatibility_threshold = 6.0
+        for person in make_population(45, seed=51):
+            self.analyzer.add_person(person)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def expected_edges(self):
+        self.analyzer.create_friendship_network()
+        position = {id(p): i for i, p in enumerate(self.analyzer.people)}
+        edges = [(i, position[id(f['friend'])], f['compatibility_score'])
+                 for i, p in enumerate(self.analyzer.people) for f in p.friendships]
+        for person in self.analyzer.people:
+            person.friendships = []
+        return sorted(edges)
+
+    def test_iter_friendships_matches_network(self):
+        """Every mode should stream the edges create_friendship_network stores"""
+        expected = self.expected_edges()
+        self.assertEqual(sorted(self.analyzer.iter_friendships()), expected)
+        self.analyzer.symmetric_pairs = False
+        self.assertEqual(sorted(self.analyzer.iter_friendships()), expected)
+        if numpy is not None:
+            self.analyzer.use_matrix_engine = True
+            self.assertEqual(list(self.analyzer.iter_friendships()), expected)
+        self.assertTrue(all(not p.friendships for p in self.analyzer.people))
+
+    def test_each_source_keeps_target_order(self):
+        """Modes may interleave sources, but every source's edges come in the same order"""
+        def by_source(edges):
+            rows = {}
+            for source, target, score in edges:
+                rows.setdefault(source, []).append((target, score))
+            return rows
+
+        expected = by_source(self.expected_edges())
+        self.assertEqual(by_source(self.analyzer.iter_friendships()), expected)
+        self.analyzer.symmetric_pairs = False
+        ordered = list(self.analyzer.iter_friendships())
+        self.assertEqual(ordered, sorted(ordered))
+        self.assertEqual(by_source(ordered), expected)
+
+    def test_export_formats_round_trip(self):
+        """CSV, JSONL and binary exports should hold the same edges"""
+        expected = self.expected_edges()
+        base = os.path.join(self.directory.name, "network")
+        self.assertEqual(self.analyzer.export_friendships(base + ".csv", batch_size=7), len(expected))
+        self.analyzer.export_friendships(base + ".jsonl", batch_size=7)
+        self.analyzer.export_friendships(base + ".edges", batch_size=7)
+
+        with open(base + ".csv") as handle:
+            rows = [line.strip().split(",") for line in handle][1:]
+        self.assertEqual(sorted((int(s), int(t), float(x)) for s, t, x in rows), expected)
+        with open(base + ".jsonl") as handle:
+            records = [json.loads(line) for line in handle]
+        self.assertEqual(sorted((r["source"], r["target"], r["score"]) for r in records), expected)
+        self.assertEqual(sorted(read_binary_edges(base + ".edges")), expected)
+
+    def test_unknown_format_is_rejected(self):
+        """Unsupported export formats raise ValueError"""
+        with self.assertRaises(ValueError):
+            self.analyzer.export_friendships(os.path.join(self.directory.name, "network.xml"))
+
+
+class TestTopKMatches(unittest.TestCase):
+    """Tests for bounded top-k matching"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer()
+        for person in make_population(80, seed=11):
+            self.analyzer.add_person(person)
+        self.person = self.analyzer.people[4]
+
+    def test_top_k_equals_full_sort_prefix(self):
+        """Top-k results should be the first k entries of find_best_matches"""
+        full = self.analyzer.find_best_matches(self.person)
+        for k in (1, 5, 10, 79, 200):
+            self.assertEqual(self.analyzer.find_top_k_matches(self.person, k), full[:k])
+
+    def test_min_score_filters_results(self):
+        """Scores below min_score should be excluded"""
+        full = [m for m in self.analyzer.find_best_matches(self.person) if m[1] >= 6.0]
+        self.assertEqual(self.analyzer.find_top_k_matches(self.person, 10, min_score=6.0), full[:10])
+
+    def test_ties_keep_insertion_order(self):
+        """Equal scores should be ordered as the stable full sort orders them"""
+        twins = [Person(f"Twin{i}", 30, ["chess"], {"extroversion": 5, "openness": 7}, {"humor": 5})
+                 for i in range(6)]
+        analyzer = FriendshipAnalyzer()
+        for twin in twins:
+            analyzer.add_person(twin)
+        self.assertEqual(analyzer.find_top_k_matches(twins[0], 3), analyzer.find_best_matches(twins[0])[:3])
+
+    def test_pruning_skips_candidates(self):
+        """Candidates whose upper bound cannot reach the top k should not be scored"""
+        calls = []
+        original = self.analyzer.analyze_compatibility
+        self.analyzer.analyze_compatibility = lambda p1, p2: calls.append(p2) or original(p1, p2)
+        self.analyzer.find_top_k_matches(self.person, 3)
+        self.assertLess(len(calls), len(self.analyzer.people) - 1)
+
+    def test_unknown_strategy_bound_disables_pruning(self):
+        """Subclasses overriding the strategy without a declared maximum are never pruned"""
+        class GenerousPerson(Person):
+            def compatibility_strategy(self, other):
+                return 100
+
+        generous = GenerousPerson("Gus", 30, [], {"extroversion": 5}, {"humor": 5})
+        self.assertEqual(FriendshipAnalyzer().compatibility_upper_bound(generous, self.person),
+                         float('inf'))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_engine_top_k(self):
+        """The matrix engine should select the same top k"""
+        expected = self.analyzer.find_top_k_matches(self.person, 7, min_score=4.0)
+        self.analyzer.use_matrix_engine = True
+        self.assertEqual(self.analyzer.find_top_k_matches(self.person, 7, min_score=4.0), expected)
+
+
+class TestScoreCache(unittest.TestCase):
+    """Tests for the opt-in pair-score cache"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer()
+        for person in make_population(20, seed=5):
+            self.analyzer.add_person(person)
+        self.people = self.analyzer.people
+
+    def test_cached_scores_match_uncached(self):
+        """Cached scores should equal freshly computed ones"""
+        expected = [[self.analyzer.analyze_compatibility(a, b) for b in self.people] for a in self.people]
+        self.analyzer.enable_score_cache()
+        for _ in range(2):
+            scores = [[self.analyzer.analyze_compatibility(a, b) for b in self.people] for a in self.people]
+            self.assertEqual(scores, expected)
+        stats = self.analyzer.score_cache.stats()
+        self.assertEqual(stats['misses'], 400)
+        self.assertEqual(stats['hits'], 400)
+
+    def test_eviction_counts(self):
+        """The least recently used entry should be evicted past maxsize"""
+        cache = self.analyzer.enable_score_cache(maxsize=2)
+        a, b, c = self.people[:3]
+        self.analyzer.analyze_compatibility(a, b)
+        self.analyzer.analyze_compatibility(a, c)
+        self.analyzer.analyze_compatibility(a, b)
+        self.analyzer.analyze_compatibility(b, c)
+        self.assertEqual(cache.evictions, 1)
+        self.analyzer.analyze_compatibility(a, b)
+        self.analyzer.analyze_compatibility(a, c)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 4, 2))
+
+    def test_update_person_invalidates(self):
+        """Updating a person should not return their stale scores"""
+        cache = self.analyzer.enable_score_cache()
+        a, b = self.people[:2]
+        self.analyzer.analyze_compatibility(a, b)
+        self.analyzer.update_person(a, interests=list(b.interests), age=b.age)
+        expected = FriendshipAnalyzer().analyze_compatibility(a, b)
+        self.assertEqual(self.analyzer.analyze_compatibility(a, b), expected)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_attribute_assignment_invalidates(self):
+        """Reassigning a scored attribute directly should not return stale scores"""
+        self.analyzer.enable_score_cache()
+        a, b = self.people[:2]
+        self.analyzer.analyze_compatibility(a, b)
+        self.analyzer.analyze_compatibility(b, a)
+        a.age = 99
+        b.personality_traits = {trait: 0 for trait in TRAITS}
+        fresh = FriendshipAnalyzer()
+        self.assertEqual(self.analyzer.analyze_compatibility(a, b), fresh.analyze_compatibility(a, b))
+        self.assertEqual(self.analyzer.analyze_compatibility(b, a), fresh.analyze_compatibility(b, a))
+
+    def test_in_place_edits_need_invalidate_person(self):
+        """invalidate_person should drop scores after a dict is edited in place"""
+        self.analyzer.enable_score_cache()
+        a, b = self.people[:2]
+        self.analyzer.analyze_compatibility(a, b)
+        a.communication_style['humor'] = 10 - a.communication_style['humor']
+        self.analyzer.invalidate_person(a)
+        self.assertEqual(self.analyzer.analyze_compatibility(a, b),
+                         FriendshipAnalyzer().analyze_compatibility(a, b))
+
+    def test_store_views_invalidate(self):
+        """Assignments through PersonStore views should invalidate too"""
+        analyzer = FriendshipAnalyzer(PersonStore())
+        analyzer.add_people(self.people)
+        analyzer.enable_score_cache()
+        a, b = analyzer.people[:2]
+        analyzer.analyze_compatibility(a, b)
+        a.age = 99
+        a.interests = list(b.interests)
+        self.assertEqual(analyzer.analyze_compatibility(a, b), FriendshipAnalyzer().analyze_compatibility(a, b))
+        self.assertEqual(analyzer.score_cache.hits, 0)
+        self.assertEqual(analyzer.score_cache.stats()['invalidations'], 1)
+
+    def test_assignments_are_counted_per_analyzer(self):
+        """Direct assignments count as invalidations only in analyzers holding the person"""
+        cache = self.analyzer.enable_score_cache()
+        other = FriendshipAnalyzer(make_population(5, seed=98))
+        other_cache = other.enable_score_cache()
+        self.people[0].age = 70
+        self.people[0].interests = ["sailing"]
+        self.people[1].age = 71
+        self.assertEqual(cache.stats()['invalidations'], 2)
+        other.people[0].age = 70
+        self.assertEqual(cache.stats()['invalidations'], 2)
+        self.assertEqual(other_cache.stats()['invalidations'], 1)
+        copy = pickle.loads(pickle.dumps(self.people[2]))
+        copy.age = 72
+        self.assertEqual(cache.stats()['invalidations'], 2)
+
+    def test_outsiders_bypass_cache(self):
+        """People not added to the analyzer should not be cached"""
+        cache = self.analyzer.enable_score_cache()
+        outsider = make_population(1, seed=99)[0]
+        self.analyzer.analyze_compatibility(self.people[0], outsider)
+        self.analyzer.remove_person(self.people[1])
+        self.analyzer.analyze_compatibility(self.people[0], outsider)
+        self.assertEqual(cache.stats()['misses'], 0)
+        self.assertIsNone(self.analyzer.person_id(outsider))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestCompatibilityMatrix(unittest.TestCase):
+    """Tests for the NumPy matrix engine"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer()
+        for person in make_population(60):
+            self.analyzer.add_person(person)
+
+    def test_matrix_matches_analyze_compatibility(self):
+        """Every matrix entry should be bit-identical to the scalar score"""
+        matrix = self.analyzer.compatibility_matrix(block_size=7)
+        people = self.analyzer.people
+        for i, person1 in enumerate(people):
+            for j, person2 in enumerate(people):
+                self.assertEqual(matrix[i, j], self.analyzer.analyze_compatibility(person1, person2))
+
+    def test_float_traits_are_bit_identical(self):
+        """Fractional trait values should be summed in the same order as the scalar path"""
+        rng = random.Random(3)
+        for person in self.analyzer.people:
+            person.personality_traits = {t: rng.random() * 10 for t in TRAITS}
+            person.age = rng.random() * 40 + 18
+        matrix = self.analyzer.compatibility_matrix()
+        people = self.analyzer.people
+        for i in range(0, len(people), 5):
+            for j, other in enumerate(people):
+                self.assertEqual(matrix[i, j], self.analyzer.analyze_compatibility(people[i], other))
+
+    def test_engine_matches_and_network(self):
+        """Engine-backed matching and network building should reproduce the scalar output"""
+        expected_matches = self.analyzer.find_best_matches(self.analyzer.people[0])
+        self.analyzer.create_friendship_network()
+        expected_network = [[(f['friend'], f['compatibility_score']) for f in p.friendships]
+                            for p in self.analyzer.people]
+
+        for person in self.analyzer.people:
+            person.friendships = []
+        self.analyzer.use_matrix_engine = True
+        self.analyzer.block_size = 16
+        self.assertEqual(self.analyzer.find_best_matches(self.analyzer.people[0]), expected_matches)
+        self.analyzer.create_friendship_network()
+        network = [[(f['friend'], f['compatibility_score']) for f in p.friendships]
+                   for p in self.analyzer.people]
+        self.assertEqual(network, expected_network)
+
+    def test_engine_matches_for_outside_person(self):
+        """A person not added to the analyzer can still be matched through the engine"""
+        outsider = make_population(1, seed=99)[0]
+        expected = self.analyzer.find_best_matches(outsider)
+        self.analyzer.use_matrix_engine = True
+        self.assertEqual(self.analyzer.find_best_matches(outsider), expected)
+
+    def test_reassigned_attributes_are_repacked(self):
+        """Engine results should follow attributes reassigned after packing"""
+        people = self.analyzer.people
+        self.analyzer.use_matrix_engine = True
+        self.analyzer.find_best_matches(people[0])
+        people[3].age = 60
+        people[3].interests = ["sailing"]
+        expected = sorted(((other, self.analyzer.analyze_compatibility(people[0], other))
+                           for other in people[1:]), key=lambda match: -match[1])
+        self.assertEqual(self.analyzer.find_best_matches(people[0]), expected)
+
+    def test_changes_elsewhere_do_not_repack(self):
+        """Reassigning people outside the analyzer keeps its packed population and index"""
+        population = self.analyzer.packed_population()
+        outsider = make_population(1, seed=97)[0]
+        other = FriendshipAnalyzer([outsider])
+        packed_outsider = other.packed_population()
+        outsider.age = 70
+        self.assertIs(self.analyzer.packed_population(), population)
+        self.assertIsNot(other.packed_population(), packed_outsider)
+        removed = self.analyzer.people[4]
+        self.analyzer.remove_person(removed)
+        population = self.analyzer.packed_population()
+        removed.age = 70
+        self.assertIs(self.analyzer.packed_population(), population)
+        self.assertEqual(self.analyzer._changed, set())
+
+    def test_parallel_network_matches_single_process(self):
+        """Worker processes should produce the same edges in the same order"""
+        self.analyzer.compatibility_threshold = 6.0
+        self.analyzer.create_friendship_network()
+        expected = network_edges(self.analyzer)
+        self.analyzer.workers = 2
+        self.analyzer.chunk_size = 9
+        self.analyzer.create_friendship_network()
+        self.assertEqual(network_edges(self.analyzer), expected)
+
+        # A strategy without a batch form needs the real people, so it is not sent to workers.
+        class MusicLover(Person):
+            def compatibility_strategy(self, other):
+                return 10 if "music" in other.interests else 0
+
+        people = self.analyzer.people
+        for position in range(0, len(people), 3):
+            person = people[position]
+            people[position] = MusicLover(person.name, person.age, person.interests,
+                                          person.personality_traits, person.communication_style)
+        self.analyzer.workers = None
+        self.analyzer.create_friendship_network()
+        expected = network_edges(self.analyzer)
+        self.analyzer.workers = 2
+        self.assertFalse(self.analyzer.packed_population().has_batch_strategies())
+        self.analyzer.create_friendship_network()
+        self.assertEqual(network_edges(self.analyzer), expected)
+
+    def test_missing_trait_raises_like_scalar(self):
+        """Pairs the scalar path cannot score should raise KeyError in the engine too"""
+        del self.analyzer.people[3].personality_traits["openness"]
+        with self.assertRaises(KeyError):
+            self.analyzer.compatibility_matrix()
+
+
+class TestProfiling(unittest.TestCase):
+    """Tests for the optional profiling hooks"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer(make_population(30, seed=31))
+
+    def test_counts_component_calls(self):
+        """Each analyze_compatibility call should count one call per component"""
+        profile = self.analyzer.enable_profiling()
+        people = self.analyzer.people
+        for other in people[1:11]:
+            self.analyzer.analyze_compatibility(people[0], other)
+        for name in ('analyze_compatibility', 'calculate_interest_compatibility',
+                     'calculate_personality_compatibility', 'calculate_communication_compatibility',
+                     'calculate_age_compatibility', 'calculate_strategy_compatibility'):
+            self.assertEqual(profile.calls[name], 10)
+            self.assertGreaterEqual(profile.seconds[name], 0.0)
+
+    def test_network_phases_and_report(self):
+        """Network building should record phases and appear in the report and export"""
+        profile = self.analyzer.enable_profiling()
+        self.analyzer.create_friendship_network()
+        self.assertEqual(profile.phase_calls['build network'], 1)
+        self.assertIn('build network', profile.report())
+        self.assertIn('symmetric_compatibility', profile.report())
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        profile.export(path)
+        with open(path) as exported:
+            self.assertEqual(json.load(exported), profile.as_dict())
+
+    def test_disable_restores_plain_methods(self):
+        """Disabling should remove the wrappers and leave scores unchanged"""
+        people = self.analyzer.people
+        expected = self.analyzer.analyze_compatibility(people[0], people[1])
+        self.analyzer.enable_profiling()
+        self.assertEqual(self.analyzer.analyze_compatibility(people[0], people[1]), expected)
+        profile = self.analyzer.disable_profiling()
+        self.assertNotIn('analyze_compatibility', vars(self.analyzer))
+        self.analyzer.analyze_compatibility(people[0], people[1])
+        self.assertEqual(profile.calls['analyze_compatibility'], 1)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_engine_blocks(self):
+        """Engine blocks should be timed per component"""
+        profile = self.analyzer.enable_profiling()
+        self.analyzer.compatibility_matrix(block_size=10)
+        self.assertEqual(profile.calls['score_block'], 3)
+        self.assertEqual(profile.calls['strategy_block'], 3)
+        self.assertEqual(profile.phase_calls['pack population'], 1)
+
+
+class TestSnapshot(unittest.TestCase):
+    """Tests for binary save()/load() snapshots"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer()
+        self.analyzer.compatibility_threshold = 6.5
+        for person in make_population(40, seed=13):
+            self.analyzer.add_person(person)
+        self.analyzer.create_friendship_network()
+        handle, self.path = tempfile.mkstemp(suffix='.snap')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def describe(self, analyzer):
+        return [(type(p).__name__, p.name, p.age,
+                 sorted(p.interests), p.personality_traits, p.communication_style,
+                 [(f['friend'].name, f['compatibility_score']) for f in p.friendships])
+                for p in analyzer.people]
+
+    def test_round_trip(self):
+        """People, classes and friendships should survive save/load, with and without mmap"""
+        edges = self.analyzer.save(self.path)
+        self.assertEqual(edges, self.analyzer.total_friendships)
+        for use_mmap in (True, False):
+            loaded = FriendshipAnalyzer.load(self.path, use_mmap=use_mmap)
+            self.assertEqual(self.describe(loaded), self.describe(self.analyzer))
+            self.assertEqual(loaded.compatibility_threshold, 6.5)
+            self.assertEqual(loaded.total_friendships, edges)
+
+    def test_loaded_scores_match(self):
+        """Scores computed from a loaded snapshot should equal the originals"""
+        self.analyzer.save(self.path)
+        loaded = FriendshipAnalyzer.load(self.path)
+        for i in (0, 5, 17):
+            for j in (1, 8, 39):
+                self.assertEqual(loaded.analyze_compatibility(loaded.people[i], loaded.people[j]),
+                                 self.analyzer.analyze_compatibility(self.analyzer.people[i],
+                                                                     self.analyzer.people[j]))
+
+    def test_mapped_store_copies_on_write(self):
+        """Changing a memory-mapped store should copy its columns, leaving the file intact"""
+        self.analyzer.save(self.path)
+        loaded = FriendshipAnalyzer.load(self.path)
+        self.assertIsInstance(loaded.people.ages, memoryview)
+        loaded.update_person(loaded.people[0], age=99, interests=["knitting"])
+        loaded.add_person(make_population(1, seed=50)[0])
+        self.assertEqual((loaded.people[0].age, loaded.people[0].interests), (99, ["knitting"]))
+        self.assertEqual(len(loaded.people), 41)
+        self.assertEqual(self.describe(FriendshipAnalyzer.load(self.path)), self.describe(self.analyzer))
+
+    def test_invalid_files(self):
+        """Foreign files and unknown versions should be rejected"""
+        with open(self.path, 'wb') as handle:
+            handle.write(b"not a snapshot at all, just text")
+        with self.assertRaises(ValueError):
+            FriendshipAnalyzer.load(self.path)
+        self.analyzer.save(self.path)
+        with open(self.path, 'r+b') as handle:
+            handle.seek(8)
+            handle.write((99).to_bytes(4, 'little'))
+        with self.assertRaises(ValueError):
+            FriendshipAnalyzer.load(self.path)
+
+    def test_people_outside_schema(self):
+        """People that do not fit the PersonStore schema cannot be saved"""
+        analyzer = FriendshipAnalyzer([Person("Ann", 30, [], {"charm": 5}, {})])
+        with self.assertRaises(ValueError):
+            analyzer.save(self.path)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestMatchService(unittest.TestCase):
+    """Tests for the batching asyncio match service"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer(make_population(50, seed=21))
+        self.service = MatchService(self.analyzer, window=0.01)
+        self.addCleanup(self.service.close)
+
+    def expected(self, position, k, min_score=None):
+        people = self.analyzer.people
+        return [(people.index(other), score) for other, score
+                in self.analyzer.find_top_k_matches(people[position], k, min_score)]
+
+    def test_concurrent_queries_are_batched(self):
+        """Concurrent queries should share batches and match find_top_k_matches"""
+        async def run():
+            return await asyncio.gather(*(self.service.top_k_positions(i, 5) for i in range(20)))
+
+        results = asyncio.run(run())
+        self.assertEqual(results, [self.expected(i, 5) for i in range(20)])
+        self.assertEqual(self.service.requests, 20)
+        self.assertLess(self.service.batches, 20)
+        self.assertEqual(set(self.service.latency_percentiles()), {'p50', 'p90', 'p99'})
+
+    def test_mixed_parameters_and_errors(self):
+        """Different k/min_score share a batch; a bad position fails only its own query"""
+        async def run():
+            return await asyncio.gather(
+                self.service.top_k_positions(3, 2),
+                self.service.top_k_positions(4, 8, min_score=6.0),
+                self.service.top_k_positions(500, 2),
+                return_exceptions=True)
+
+        first, second, bad = asyncio.run(run())
+        self.assertEqual(first, self.expected(3, 2))
+        self.assertEqual(second, self.expected(4, 8, 6.0))
+        self.assertIsInstance(bad, IndexError)
+        self.assertEqual(self.service.batches, 1)
+
+    def test_reciprocal_matching(self):
+        """With reciprocal_matching set, batched queries rank by the mutual score"""
+        for mode in RECIPROCAL_MODES:
+            self.analyzer.reciprocal_matching = mode
+
+            async def run():
+                return await asyncio.gather(*(self.service.top_k_positions(i, 5, min_score=4.0)
+                                              for i in range(12)))
+
+            self.assertEqual(asyncio.run(run()), [self.expected(i, 5, 4.0) for i in range(12)])
+            self.assertEqual(self.analyzer.top_k_positions([3], 5), [self.expected(3, 5)])
+
+    def test_close_cancels_queued_and_running_batches(self):
+        """close() cancels queries still waiting for their batch and batches being scored"""
+        async def run():
+            queued = asyncio.ensure_future(self.service.top_k_positions(3, 5))
+            await asyncio.sleep(0)
+            self.service.max_batch = 1
+            running = asyncio.ensure_future(self.service.top_k_positions(4, 5))
+            await asyncio.sleep(0)
+            self.assertEqual(len(self.service._running), 1)
+            self.service.close()
+            results = await asyncio.gather(queued, running, return_exceptions=True)
+            await asyncio.sleep(0)
+            return results, set(self.service._running)
+
+        (queued, running), tasks = asyncio.run(run())
+        self.assertIsInstance(queued, asyncio.CancelledError)
+        self.assertIsInstance(running, asyncio.CancelledError)
+        self.assertEqual(tasks, set())
+
+    def test_finished_batches_are_released(self):
+        async def run():
+            await asyncio.gather(*(self.service.top_k_positions(i, 3) for i in range(5)))
+            return set(self.service._running)
+
+        self.assertEqual(asyncio.run(run()), set())
+
+    def test_json_lines_server(self):
+        """The TCP server should answer match and stats requests"""
+        async def run():
+            server = await self.service.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            replies = []
+            for request in ({'person': 2, 'k': 3}, {'person': 'x'}, {'stats': True}):
+                writer.write(json.dumps(request).encode() + b"\n")
+                await writer.drain()
+                replies.append(json.loads(await reader.readline()))
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return replies
+
+        matches, error, stats = asyncio.run(run())
+        self.assertEqual([(m['position'], m['score']) for m in matches['matches']], self.expected(2, 3))
+        self.assertEqual(matches['matches'][0]['name'], self.analyzer.people[matches['matches'][0]['position']].name)
+        self.assertIn('error', error)
+        self.assertEqual(stats['requests'], 2)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestBatchedStrategies(unittest.TestCase):
+    """Tests for vectorized compatibility_strategy dispatch"""
+
+    def per_pair(self, population):
+        return [[p.compatibility_strategy(o) for o in population.people] for p in population.people]
+
+    def test_batched_matches_per_pair(self):
+        """Batched strategies should equal per-pair calls, including missing keys"""
+        rng = random.Random(8)
+        people = make_population(60, seed=8)
+        for person in people[::3]:
+            person.personality_traits = {t: v for t, v in person.personality_traits.items() if rng.random() < 0.5}
+            person.communication_style = {s: v for s, v in person.communication_style.items() if rng.random() < 0.5}
+        analyzer = FriendshipAnalyzer(people)
+        population = analyzer.packed_population()
+        block = population.strategy_block(range(len(people)))
+        self.assertEqual(block.tolist(), self.per_pair(population))
+
+    def test_store_population(self):
+        """Batched strategies should read PersonStore columns"""
+        analyzer = FriendshipAnalyzer(PersonStore())
+        analyzer.add_people(make_population(40, seed=9))
+        population = analyzer.packed_population()
+        self.assertEqual(population.strategy_block(range(40)).tolist(), self.per_pair(population))
+
+    def test_unregistered_override_falls_back(self):
+        """A subclass overriding the strategy without a batch form should be called per pair"""
+        class PickyPerson(EmpatheticPerson):
+            __slots__ = ()
+
+            def compatibility_strategy(self, other):
+                return 1 if other.age > 30 else 2
+
+        people = make_population(10, seed=1) + [PickyPerson("Pia", 40, [], {}, {})]
+        population = FriendshipAnalyzer(people).packed_population()
+        self.assertEqual(population.strategy_block([10, 0]).tolist(),
+                         [self.per_pair(population)[10], self.per_pair(population)[0]])
+
+    def test_registered_custom_strategy(self):
+        """Custom strategies should plug into the registry"""
+        class SportyPerson(Person):
+            __slots__ = ()
+
+            def compatibility_strategy(self, other):
+                return 8
+
+        calls = []
+
+        @register_batch_strategy(SportyPerson)
+        def sporty(population, rows, columns):
+            calls.append(len(rows))
+            return numpy.full((len(rows), population.size if columns is None else len(columns)), 8.0)
+
+        try:
+            people = [SportyPerson(f"S{i}", 20, [], {}, {}) for i in range(3)] + make_population(5)
+            population = FriendshipAnalyzer(people).packed_population()
+            self.assertEqual(population.strategy_block(range(8)).tolist(), self.per_pair(population))
+            self.assertEqual(calls, [3])
+        finally:
+            del BATCH_STRATEGIES[SportyPerson]
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestApproximateMatching(unittest.TestCase):
+    """Tests for the locality-sensitive approximate match mode"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer(make_population(300, seed=12))
+        self.person = self.analyzer.people[7]
+
+    def test_column_subset_scores(self):
+        """score_block over a column subset should equal the full row's entries"""
+        population = self.analyzer.packed_population()
+        columns = [3, 0, 299, 42]
+        full = population.score_block([7, 8])
+        self.assertEqual(population.score_block([7, 8], columns).tolist(), full[:, columns].tolist())
+
+    def test_scores_are_exact_and_sorted(self):
+        """Approximate matches should carry exact scores in find_best_matches order"""
+        matches = self.analyzer.find_approximate_matches(self.person, 10)
+        self.assertEqual(len(matches), 10)
+        for other, score in matches:
+            self.assertEqual(score, self.analyzer.analyze_compatibility(self.person, other))
+        self.assertEqual([s for _, s in matches], sorted([s for _, s in matches], reverse=True))
+        self.assertNotIn(self.person, [other for other, _ in matches])
+
+    def test_recall_with_generous_settings(self):
+        """With every bucket probed and no candidate cap the exact top k should be found"""
+        self.analyzer.approximate_options = {'tables': 16, 'bits': 2, 'max_candidates': None}
+        exact = self.analyzer.find_top_k_matches(self.person, 10)
+        self.assertEqual(self.analyzer.find_approximate_matches(self.person, 10), exact)
+
+    def test_approximate_mode_routes_queries(self):
+        """use_approximate_matching should switch find_best_matches and find_top_k_matches"""
+        self.analyzer.use_approximate_matching = True
+        expected = self.analyzer.find_approximate_matches(self.person)
+        self.assertEqual(self.analyzer.find_best_matches(self.person), expected)
+        self.assertEqual(self.analyzer.find_top_k_matches(self.person, 5, min_score=5.0),
+                         [m for m in expected if m[1] >= 5.0][:5])
+
+    def test_outsider_query(self):
+        """People outside the analyzer should be matched from their attributes"""
+        outsider = make_population(1, seed=77)[0]
+        matches = self.analyzer.find_approximate_matches(outsider, 5)
+        self.assertTrue(matches)
+        for other, score in matches:
+            self.assertEqual(score, self.analyzer.analyze_compatibility(outsider, other))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestFriendshipGraph(unittest.TestCase):
+    """Tests for the CSR friendship graph and its analytics"""
+
+    def graph(self, size, pairs):
+        return FriendshipGraph.from_edges(size, [(s, t, 8.0) for s, t in pairs])
+
+    def test_csr_matches_stored_network(self):
+        """CSR rows should list each person's stored friendships in order"""
+        for people in (make_population(40, seed=3), PersonStore()):
+            analyzer = FriendshipAnalyzer(people)
+            if isinstance(people, PersonStore):
+                analyzer.add_people(make_population(40, seed=3))
+            analyzer.create_friendship_network()
+            graph = analyzer.friendship_graph()
+            self.assertEqual(graph.edge_count, analyzer.total_friendships)
+            self.assertEqual(graph.indices.dtype, numpy.int32)
+            self.assertEqual(graph.weights.dtype, numpy.float32)
+            people = list(analyzer.people)
+            for position, person in enumerate(people):
+                targets, weights = graph.neighbors(position)
+                self.assertEqual(targets.tolist(), [people.index(f['friend']) for f in person.friendships])
+                self.assertEqual(weights.tolist(),
+                                 [float(numpy.float32(f['compatibility_score'])) for f in person.friendships])
+            self.assertEqual(int(graph.degree_distribution().sum()), 40)
+
+    def test_components_and_reciprocal_edges(self):
+        """Components ignore direction; reciprocal edges need both directions"""
+        graph = self.graph(6, [(0, 1), (1, 0), (2, 1), (3, 4), (4, 3), (4, 3)])
+        self.assertEqual(graph.connected_components().tolist(), [0, 0, 0, 3, 3, 5])
+        self.assertEqual(graph.component_sizes(), {0: 3, 3: 2, 5: 1})
+        first, second = graph.reciprocal_edges()
+        self.assertEqual(list(zip(first.tolist(), second.tolist())), [(0, 1), (3, 4)])
+        self.assertEqual(graph.in_degrees().tolist(), [1, 2, 0, 2, 1, 0])
+
+    def test_clustering(self):
+        """A triangle with a pendant node has known clustering values"""
+        graph = self.graph(4, [(0, 1), (1, 2), (2, 0), (2, 3)])
+        self.assertEqual(graph.triangle_counts().tolist(), [1, 1, 1, 0])
+        self.assertEqual(graph.clustering_coefficients().tolist(), [1.0, 1.0, 1 / 3, 0.0])
+        self.assertAlmostEqual(graph.transitivity(), 3 / 5)
+
+    def test_communities(self):
+        """Two cliques joined by one edge should form two communities"""
+        cliques = [(a, b) for group in (range(0, 5), range(5, 10)) for a in group for b in group if a != b]
+        graph = self.graph(10, cliques + [(4, 5)])
+        labels = graph.communities()
+        self.assertEqual(labels.tolist(), [0] * 5 + [1] * 5)
+        self.assertGreater(graph.modularity(labels), 0.4)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestGroupFormation(unittest.TestCase):
+    """Tests for splitting people into compatible groups"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer(make_population(12, seed=5))
+
+    def weight(self, group):
+        return sum(self.analyzer.analyze_compatibility(p1, p2)
+                   for p1 in group for p2 in group if p1 is not p2)
+
+    def test_groups_partition_people(self):
+        """Everyone lands in exactly one group of size k or k - 1"""
+        analyzer = FriendshipAnalyzer(make_population(23, seed=2))
+        result = analyzer.form_groups(5)
+        self.assertEqual(sorted(p for group in result.positions for p in group), list(range(23)))
+        self.assertEqual(sorted(len(group) for group in result.groups), [4, 4, 5, 5, 5])
+        self.assertAlmostEqual(result.score, sum(self.weight(group) for group in result.groups))
+
+    def test_group_sizes_follow_documented_rule(self):
+        """Sizes are group_size or one less when possible, otherwise at least group_size"""
+        for group_size in range(1, 12):
+            for size in range(0, 60):
+                sizes = _group_sizes(size, group_size)
+                self.assertEqual(sum(sizes), size)
+                self.assertLessEqual(max(sizes, default=0) - min(sizes, default=0), 1)
+                splittable = any(size - count * group_size >= 0
+                                 and (size - count * group_size) % max(group_size - 1, 1) == 0
+                                 for count in range(size // group_size + 1)) if group_size > 1 else True
+                if size < group_size - 1:
+                    self.assertEqual(sizes, [size] if size else [])
+                elif splittable:
+                    self.assertTrue(set(sizes) <= {group_size, group_size - 1}, (size, group_size, sizes))
+                else:
+                    self.assertEqual(len(sizes), size // group_size)
+                    self.assertGreaterEqual(min(sizes), group_size)
+        self.assertEqual(_group_sizes(11, 10), [11])
+        self.assertEqual(_group_sizes(21, 10), [11, 10])
+        self.assertEqual(_group_sizes(10, 4), [4, 3, 3])
+
+    def test_matches_exhaustive_optimum(self):
+        """With every pair weighted, the search finds the best split of a small group"""
+        people = self.analyzer.people
+
+        def best(remaining):
+            if not remaining:
+                return 0.0
+            first, scores = remaining[0], []
+            for i, second in enumerate(remaining[1:], 1):
+                for third in remaining[i + 1:]:
+                    group = [first, second, third]
+                    rest = [p for p in remaining if p not in group]
+                    scores.append(self.weight([people[p] for p in group]) + best(rest))
+            return max(scores)
+
+        result = self.analyzer.form_groups(3, neighbors=len(people))
+        self.assertTrue(result.complete)
+        self.assertAlmostEqual(result.score, best(list(range(len(people)))))
+
+    def test_deterministic_for_seed(self):
+        """The same seed and weights give the same groups"""
+        analyzer = FriendshipAnalyzer(make_population(60, seed=1))
+        weights = analyzer.pair_weights(neighbors=10)
+        first = analyzer.form_groups(4, weights=weights, seed=3)
+        second = analyzer.form_groups(4, weights=weights, seed=3)
+        self.assertEqual(first.positions, second.positions)
+        self.assertEqual(first.score, second.score)
+
+    def test_pair_weights_are_symmetric(self):
+        """Each weight adds both directions and appears on both people"""
+        weights = self.analyzer.pair_weights(neighbors=3)
+        people = self.analyzer.people
+        for i, partners in enumerate(weights):
+            self.assertGreaterEqual(len(partners), 3)
+            for j, weight in partners.items():
+                self.assertEqual(weights[j][i], weight)
+                self.assertAlmostEqual(weight, self.analyzer.analyze_compatibility(people[i], people[j])
+                                       + self.analyzer.analyze_compatibility(people[j], people[i]))
+
+    def test_invalid_group_size(self):
+        with self.assertRaises(ValueError):
+            self.analyzer.form_groups(0)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestScoreSweep(unittest.TestCase):
+    """Tests for the single-pass threshold sweep"""
+
+    def setUp(self):
+        self.analyzer = FriendshipAnalyzer(make_population(60, seed=4))
+        self.sweep = self.analyzer.score_sweep(retain_threshold=5.0)
+
+    def edges_at(self, threshold):
+        self.analyzer.compatibility_threshold = threshold
+        return list(self.analyzer.iter_friendships())
+
+    def test_histogram_covers_every_pair(self):
+        self.assertEqual(self.sweep.pair_count, 60 * 59)
+        self.assertEqual(self.sweep.edge_count(-1.0), 60 * 59)
+        self.assertEqual(self.sweep.edge_count(100.0), 0)
+
+    def test_exact_counts_above_retain_threshold(self):
+        """Counts at or above retain_threshold match a rebuilt network"""
+        for threshold in (5.0, 5.5, 6.25, 7.0):
+            self.assertTrue(self.sweep.is_exact(threshold))
+            edges = len(self.edges_at(threshold))
+            self.assertEqual(self.sweep.edge_count(threshold), edges)
+            self.assertAlmostEqual(self.sweep.average_degree(threshold), edges / 60)
+
+    def test_estimates_below_retain_threshold(self):
+        """Histogram estimates stay within one bin of the true count"""
+        for threshold in (2.0, 3.5, 4.0):
+            self.assertFalse(self.sweep.is_exact(threshold))
+            lower = len(self.edges_at(threshold + self.sweep.bin_width))
+            upper = len(self.edges_at(threshold - self.sweep.bin_width))
+            self.assertTrue(lower <= self.sweep.edge_count(threshold) <= upper)
+        median = self.sweep.quantile(0.5)
+        self.assertAlmostEqual(len(self.edges_at(median)) / (60 * 59), 0.5, delta=0.05)
+
+    def test_apply_threshold_matches_rebuild(self):
+        """Materializing from kept scores gives the network a rebuild would"""
+        self.analyzer.compatibility_threshold = 6.0
+        self.analyzer.create_friendship_network()
+        expected = [[(f['friend'], f['compatibility_score']) for f in p.friendships]
+                    for p in self.analyzer.people]
+        total = self.analyzer.total_friendships
+        self.analyzer.compatibility_threshold = 7.0
+        self.analyzer.create_friendship_network()
+        self.analyzer.apply_threshold(self.sweep, 6.0)
+        self.assertEqual(self.analyzer.compatibility_threshold, 6.0)
+        self.assertEqual(self.analyzer.total_friendships, total)
+        self.assertEqual([[(f['friend'], f['compatibility_score']) for f in p.friendships]
+                          for p in self.analyzer.people], expected)
+
+    def test_threshold_below_retained_scores(self):
+        with self.assertRaises(ValueError):
+            self.analyzer.apply_threshold(self.sweep, 4.0)
+
+
+class TestScoringProfiles(unittest.TestCase):
+    """Tests for weight profiles compiled into scoring kernels"""
+
+    def setUp(self):
+        weights = {'interests': 0.5, 'personality': 0.1, 'communication': 0.3, 'age': 0.05, 'strategy': 0.05}
+        self.social = ScoringKernel('social', weights)
+        self.core = ScoringKernel('core', dict(DEFAULT_KERNEL.weight_map), traits=['openness', 'agreeableness'],
+                                  styles=['humor'], age_buckets=((3, 10), (8, 7), (20, 3)), age_default=0)
+
+    def test_default_kernel(self):
+        self.assertIs(SCORING_PROFILES['default'], DEFAULT_KERNEL)
+        self.assertEqual(DEFAULT_KERNEL.weights, (0.3, 0.3, 0.2, 0.1, 0.1))
+        self.assertEqual([DEFAULT_KERNEL.age_score(d) for d in (0, 2, 2.5, 5, 10, 15, 15.5, 40)],
+                         [10, 10, 8, 8, 6, 4, 2, 2])
+
+    def test_custom_age_buckets(self):
+        self.assertEqual([self.core.age_score(d) for d in (3, 4, 8, 20, 21)], [10, 7, 7, 3, 0])
+
+    def test_schema_scores_listed_traits(self):
+        """A trait schema scores only its traits, in both directions alike"""
+        analyzer = FriendshipAnalyzer()
+        analyzer.use_profile(self.core)
+        person1 = Person("A", 30, [], {'openness': 8, 'agreeableness': 6, 'neuroticism': 0}, {'humor': 5})
+        person2 = Person("B", 30, [], {'openness': 4, 'agreeableness': 6, 'neuroticism': 10}, {'humor': 9})
+        self.assertEqual(analyzer.calculate_personality_compatibility(person1, person2), 8.0)
+        self.assertEqual(analyzer.calculate_communication_compatibility(person1, person2), 6.0)
+        with self.assertRaises(KeyError):
+            analyzer.calculate_personality_compatibility(person1, Person("C", 30, [], {'openness': 1}, {}))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_engine_matches_scalar_for_each_profile(self):
+        """Every kernel scores bit-identically with the engine, for lists and stores"""
+        for people in (make_population(40, seed=8), PersonStore()):
+            analyzer = FriendshipAnalyzer(people)
+            if isinstance(people, PersonStore):
+                analyzer.add_people(make_population(40, seed=8))
+            kernels = [DEFAULT_KERNEL, self.social, self.core]
+            blocks = [numpy.vstack(parts) for parts in
+                      zip(*(block for _, block in analyzer.iter_profile_blocks(kernels, block_size=16)))]
+            for kernel, block in zip(kernels, blocks):
+                analyzer.use_profile(kernel)
+                expected = [[analyzer.analyze_compatibility(p1, p2) for p2 in analyzer.people]
+                            for p1 in analyzer.people]
+                self.assertEqual(block.tolist(), expected)
+                self.assertEqual(analyzer.compatibility_matrix().tolist(), expected)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_compare_profiles_counts_edges(self):
+        """compare_profiles counts the edges each profile's network would have"""
+        analyzer = FriendshipAnalyzer(make_population(50, seed=2))
+        analyzer.compatibility_threshold = 5.0
+        stats = analyzer.compare_profiles(['default', self.social, self.core])
+        for kernel in (DEFAULT_KERNEL, self.social, self.core):
+            analyzer.use_profile(kernel)
+            edges = sum(1 for _ in analyzer.iter_friendships())
+            self.assertEqual(stats[kernel.name]['edges'], edges)
+            self.assertAlmostEqual(stats[kernel.name]['average_degree'], edges / 50)
+
+    def test_network_and_top_k_follow_profile(self):
+        analyzer = FriendshipAnalyzer(make_population(40, seed=6))
+        analyzer.use_profile(self.core)
+        analyzer.compatibility_threshold = 6.0
+        symmetric = sorted(analyzer.iter_friendships())
+        analyzer.symmetric_pairs = False
+        self.assertEqual(symmetric, sorted(analyzer.iter_friendships()))
+        person = analyzer.people[0]
+        self.assertEqual(analyzer.find_top_k_matches(person, 5), analyzer.find_best_matches(person)[:5])
+
+    def test_score_cache_keeps_profiles_apart(self):
+        analyzer = FriendshipAnalyzer(make_population(5, seed=1))
+        analyzer.enable_score_cache()
+        person1, person2 = analyzer.people[:2]
+        default_score = analyzer.analyze_compatibility(person1, person2)
+        analyzer.use_profile(self.social)
+        social_score = analyzer.analyze_compatibility(person1, person2)
+        analyzer.score_cache = None
+        self.assertEqual(social_score, analyzer.analyze_compatibility(person1, person2))
+        self.assertNotEqual(default_score, social_score)
+
+    def test_invalid_profiles(self):
+        with self.assertRaises(ValueError):
+            ScoringKernel('partial', {'interests': 1.0})
+        with self.assertRaises(ValueError):
+            ScoringKernel('negative', dict(DEFAULT_KERNEL.weight_map, age=-0.1))
+        with self.assertRaises(ValueError):
+            ScoringKernel('ages', DEFAULT_KERNEL.weight_map, age_buckets=((5, 10), (2, 8)))
+        with self.assertRaises(ValueError):
+            FriendshipAnalyzer().use_profile('no such profile')
+
+
+class TestCommandLine(unittest.TestCase):
+    """Tests for the non-interactive command-line interface"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.people = make_population(30, seed=9)
+        self.path = os.path.join(self.directory.name, "people.jsonl")
+        with open(self.path, 'w') as handle:
+            for person in self.people:
+                handle.write(json.dumps({
+                    'name': person.name, 'age': person.age, 'type': type(person).__name__,
+                    'interests': person.interests, 'personality_traits': person.personality_traits,
+                    'communication_style': person.communication_style}) + "\n")
+        self.analyzer = FriendshipAnalyzer(self.people)
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            status = cli_main(list(argv))
+        return status, output.getvalue()
+
+    def test_score(self):
+        status, output = self.run_cli('score', self.path, 'Person0', '3', '--json')
+        self.assertEqual(status, 0)
+        forward, backward = json.loads(output)
+        self.assertEqual((forward['source'], forward['target']), ('Person0', 'Person3'))
+        self.assertEqual(forward['score'], self.analyzer.analyze_compatibility(self.people[0], self.people[3]))
+        self.assertEqual(backward['score'], self.analyzer.analyze_compatibility(self.people[3], self.people[0]))
+        self.assertEqual(set(forward['components']),
+                         {'interests', 'personality', 'communication', 'age', 'strategy'})
+
+    def test_match(self):
+        status, output = self.run_cli('match', self.path, 'Person2', '-k', '4', '--json')
+        self.assertEqual(status, 0)
+        expected = self.analyzer.find_top_k_matches(self.people[2], 4)
+        self.assertEqual([(m['name'], m['score']) for m in json.loads(output)],
+                         [(person.name, score) for person, score in expected])
+        if numpy is not None:
+            status, output = self.run_cli('match', self.path, 'Person2', '-k', '4', '--reciprocal', 'min',
+                                          '--json')
+            expected = self.analyzer.find_reciprocal_matches(self.people[2], 4, 'min')
+            self.assertEqual([(m['name'], m['score']) for m in json.loads(output)],
+                             [(person.name, score) for person, score in expected])
+
+    def test_build_network_and_stats(self):
+        self.analyzer.compatibility_threshold = 6.0
+        edges = list(self.analyzer.iter_friendships())
+        output_path = os.path.join(self.directory.name, "network.edges")
+        status, output = self.run_cli('build-network', self.path, '--threshold', '6', '-o', output_path,
+                                      '--json')
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(output)['edges'], len(edges))
+        self.assertEqual([tuple(edge) for edge in read_binary_edges(output_path)], edges)
+        status, output = self.run_cli('stats', self.path, '--threshold', '6', '--json')
+        stats = json.loads(output)
+        self.assertEqual((stats['people'], stats['friendships']), (30, len(edges)))
+
+    def test_errors(self):
+        self.assertEqual(self.run_cli()[0], 2)
+        self.assertEqual(self.run_cli('match', self.path, 'Nobody')[0], 1)
+        self.assertEqual(self.run_cli('stats', os.path.join(self.directory.name, "missing.csv"))[0], 1)
+
+    def test_import_is_lazy(self):
+        """Importing the package does not import NumPy or asyncio"""
+        code = ("import sys, friendship_analyzer; "
+                "print('numpy' in sys.modules, 'asyncio' in sys.modules)")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=root)
+        self.assertEqual(result.stdout.split(), ['False', 'False'])
+
+    def test_score_without_numpy(self):
+        """score explains one pair with the scalar methods, so NumPy is not needed"""
+        code = ("import sys; sys.modules['numpy'] = None; "
+                "from friendship_analyzer.cli import main; "
+                f"sys.exit(main(['score', {self.path!r}, 'Person0', 'Person3', '--json']))")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=root)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        forward, backward = json.loads(result.stdout)
+        self.assertEqual(forward['score'], self.analyzer.analyze_compatibility(self.people[0], self.people[3]))
+        self.assertEqual(backward['score'], self.analyzer.analyze_compatibility(self.people[3], self.people[0]))
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestOutOfCoreNetwork(unittest.TestCase):
+    """Tests for the tiled spill-to-disk network build"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.analyzer = FriendshipAnalyzer(make_population(120, seed=21))
+        self.analyzer.use_matrix_engine = True
+        self.analyzer.compatibility_threshold = 5.5
+        self.edges = list(self.analyzer.iter_friendships())
+        population = self.analyzer.packed_population()
+        self.fixed = (population_bytes(population) + self.analyzer._identities(population).nbytes
+                      + 8 * population.size)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def write_people(self):
+        path = self.path("people.jsonl")
+        with open(path, 'w') as handle:
+            for person in self.analyzer.people:
+                handle.write(json.dumps({
+                    'name': person.name, 'age': person.age, 'type': type(person).__name__,
+                    'interests': person.interests, 'personality_traits': person.personality_traits,
+                    'communication_style': person.communication_style}) + "\n")
+        return path
+
+    def test_spilled_edges_match_engine(self):
+        """Edges come back in iter_friendships order whatever the tiling and number of runs"""
+        for limit in (self.fixed + 80_000, self.fixed + 200_000, 2**30):
+            with spill_network(self.analyzer, limit, self.directory.name) as spilled:
+                self.assertEqual(list(spilled), self.edges)
+                self.assertEqual(spilled.count, len(self.edges))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_tiny_limit_forces_tiles_runs_and_merge_passes(self):
+        self.analyzer.compatibility_threshold = 0.0
+        edges = list(self.analyzer.iter_friendships())
+        with spill_network(self.analyzer, self.fixed + 70_000, self.directory.name) as spilled:
+            plan = spilled.plan
+            self.assertLess(plan.tile_rows * plan.tile_columns, 120 * 120)
+            self.assertGreater(len(edges), plan.buffer_edges * plan.merge_fan_in)
+            self.assertEqual(list(spilled), edges)
+
+    def test_peak_memory_stays_under_limit(self):
+        """Allocations during the build stay within memory_limit less the population"""
+        import tracemalloc
+        self.analyzer.compatibility_threshold = 0.0
+        limit = self.fixed + 150_000
+        spill_network(self.analyzer, limit).close()  # imports NumPy submodules used on first call
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            spill_network(self.analyzer, limit, self.directory.name).close()
+            peak = tracemalloc.get_traced_memory()[1] - base
+        finally:
+            tracemalloc.stop()
+        self.assertLessEqual(peak, limit - self.fixed)
+
+    def test_edge_file_and_snapshot_outputs(self):
+        limit = self.fixed + 100_000
+        written = self.analyzer.build_network_out_of_core(self.path("network.edges"), limit)
+        self.assertEqual(written, len(self.edges))
+        self.assertEqual([tuple(edge) for edge in read_binary_edges(self.path("network.edges"))], self.edges)
+
+        self.analyzer.build_network_out_of_core(self.path("network.snap"), limit)
+        loaded = FriendshipAnalyzer.load(self.path("network.snap"))
+        positions = {person: position for position, person in enumerate(loaded.people)}
+        self.assertEqual([(i, positions[f['friend']], f['compatibility_score'])
+                          for i, person in enumerate(loaded.people) for f in person.friendships],
+                         self.edges)
+        self.assertEqual(loaded.total_friendships, len(self.edges))
+        self.assertEqual(self.analyzer.total_friendships, 0)
+
+    def test_command_line(self):
+        output = self.path("network.csv")
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = cli_main(['build-network', self.write_people(), '--threshold', '5.5',
+                               '--memory-limit', '4M', '-o', output])
+        self.assertEqual(status, 0)
+        with open(output) as handle:
+            self.assertEqual(len(handle.readlines()), len(self.edges) + 1)
+
+    def test_limit_below_population_size(self):
+        with self.assertRaises(ValueError):
+            spill_network(self.analyzer, self.fixed)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestExplainCompatibility(unittest.TestCase):
+    """Tests for explain_compatibility / explain_many"""
+
+    def setUp(self):
+        self.people = make_population(50, seed=31)
+        self.analyzer = FriendshipAnalyzer(self.people)
+        rng = random.Random(5)
+        self.pairs = [(rng.choice(self.people), rng.choice(self.people)) for _ in range(300)]
+
+    def expected(self, analyzer, person1, person2):
+        return {
+            'interests': analyzer.calculate_interest_compatibility(person1, person2),
+            'personality': analyzer.calculate_personality_compatibility(person1, person2),
+            'communication': analyzer.calculate_communication_compatibility(person1, person2),
+            'age': analyzer.calculate_age_compatibility(person1, person2),
+            'strategy': analyzer.calculate_strategy_compatibility(person1, person2),
+        }
+
+    def test_explain_compatibility(self):
+        person1, person2 = self.people[3], self.people[7]
+        explanation = self.analyzer.explain_compatibility(person1, person2)
+        self.assertEqual(explanation.components, self.expected(self.analyzer, person1, person2))
+        self.assertEqual(explanation.score, self.analyzer.analyze_compatibility(person1, person2))
+        self.assertEqual(explanation.weights, DEFAULT_KERNEL.weight_map)
+        self.assertIs(explanation.strategy, type(person1))
+        self.assertEqual(explanation.profile, 'default')
+        self.assertAlmostEqual(sum(explanation.contributions.values()), explanation.score)
+        record = json.loads(json.dumps(explanation.as_dict()))
+        self.assertEqual((record['source'], record['target'], record['strategy']),
+                         (person1.name, person2.name, type(person1).__name__))
+
+    def test_explain_many_matches_scalar_scores(self):
+        """Batched components and scores equal the per-pair methods, for each profile and for stores"""
+        core = ScoringKernel('core', dict(DEFAULT_KERNEL.weight_map), traits=['openness', 'agreeableness'],
+                             styles=['humor'])
+        store = PersonStore()
+        store_analyzer = FriendshipAnalyzer(store)
+        store_analyzer.add_people(self.people)
+        store_pairs = [(store[self.people.index(p1)], store[self.people.index(p2)]) for p1, p2 in self.pairs]
+        for analyzer, pairs in ((self.analyzer, self.pairs), (store_analyzer, store_pairs)):
+            for kernel in (DEFAULT_KERNEL, core):
+                analyzer.use_profile(kernel)
+                explanations = analyzer.explain_many(pairs)
+                self.assertEqual([e.components for e in explanations],
+                                 [self.expected(analyzer, p1, p2) for p1, p2 in pairs])
+                self.assertEqual([e.score for e in explanations],
+                                 [analyzer.analyze_compatibility(p1, p2) for p1, p2 in pairs])
+
+    def test_people_outside_the_analyzer(self):
+        outsider = Person("Outsider", 33, ["chess", "music"], {t: 6 for t in TRAITS}, {s: 5 for s in STYLES})
+        pairs = [(outsider, self.people[0]), (self.people[1], outsider)]
+        self.assertEqual([e.score for e in self.analyzer.explain_many(pairs)],
+                         [self.analyzer.analyze_compatibility(p1, p2) for p1, p2 in pairs])
+        self.assertEqual(self.analyzer.explain_many([]), [])
+
+    def test_explain_does_not_repack_the_population(self):
+        """A stale packed population is not rebuilt for a few pairs, in a list or a store"""
+        store = PersonStore()
+        store_analyzer = FriendshipAnalyzer(store)
+        store_analyzer.add_people(self.people)
+        for analyzer in (self.analyzer, store_analyzer):
+            people = analyzer.people
+            analyzer.explain_compatibility(people[0], people[1])
+            self.assertIsNone(analyzer._population)
+            pairs = [(people[2], people[5]), (people[5], people[2])]
+            self.assertEqual([e.score for e in analyzer.explain_many(pairs)],
+                             [analyzer.analyze_compatibility(p1, p2) for p1, p2 in pairs])
+            self.assertIsNone(analyzer._population)
+            population = analyzer.packed_population()
+            analyzer.explain_many(pairs)
+            self.assertIs(analyzer._population, population)
+
+    def test_missing_traits_raise_like_scalar_scoring(self):
+        partial = Person("Partial", 30, [], {'openness': 5}, {s: 5 for s in STYLES})
+        with self.assertRaises(KeyError):
+            self.analyzer.calculate_personality_compatibility(self.people[0], partial)
+        with self.assertRaises(KeyError):
+            self.analyzer.explain_compatibility(self.people[0], partial)
+
+
+class TestReciprocalMatching(unittest.TestCase):
+    """Tests for mutual scores, reciprocal matches and stable pairing"""
+
+    def setUp(self):
+        self.people = make_population(41, seed=17)
+        self.analyzer = FriendshipAnalyzer(self.people)
+        self.analyzer.block_size = 16
+
+    def mutual(self, mode):
+        return {(i, j): self.analyzer.mutual_compatibility(p1, p2, mode)
+                for i, p1 in enumerate(self.people) for j, p2 in enumerate(self.people) if i != j}
+
+    def test_reciprocal_score(self):
+        self.assertEqual(reciprocal_score(8.0, 2.0), 3.2)
+        self.assertEqual(reciprocal_score(2.0, 8.0, 'min'), 2.0)
+        self.assertEqual(reciprocal_score(0.0, 0.0), 0.0)
+        with self.assertRaises(ValueError):
+            reciprocal_score(1.0, 2.0, 'max')
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_reciprocal_matches(self):
+        """Matches are ranked by the mutual score, which the engine computes exactly"""
+        for mode in RECIPROCAL_MODES:
+            mutual = self.mutual(mode)
+            for i in (0, 11, 40):
+                expected = sorted((j for j in range(41) if j != i), key=lambda j: (-mutual[i, j], j))[:5]
+                matches = self.analyzer.find_reciprocal_matches(self.people[i], 5, mode)
+                self.assertEqual([(self.people.index(p), s) for p, s in matches],
+                                 [(j, mutual[i, j]) for j in expected])
+        self.analyzer.reciprocal_matching = 'min'
+        person = self.people[3]
+        self.assertEqual(self.analyzer.find_top_k_matches(person, 4),
+                         self.analyzer.find_reciprocal_matches(person, 4, 'min'))
+        self.assertEqual(len(self.analyzer.find_best_matches(person)), 40)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_mutual_top_k(self):
+        mutual = self.mutual('harmonic')
+        positions, scores = self.analyzer.mutual_top_k(6)
+        for i in range(41):
+            self.assertEqual(scores[i].tolist(), sorted((mutual[i, j] for j in range(41) if j != i),
+                                                        reverse=True)[:6])
+            self.assertEqual([mutual[i, j] for j in positions[i].tolist()], scores[i].tolist())
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_stable_pairing_has_no_blocking_pair(self):
+        """With full candidate lists nobody would rather pair with someone who prefers them back"""
+        for mode in RECIPROCAL_MODES:
+            mutual = self.mutual(mode)
+            result = self.analyzer.stable_pairing(candidates=40, mode=mode)
+            partner = {}
+            for (i, j), score in zip(result.positions, result.scores):
+                self.assertEqual(score, mutual[i, j])
+                partner[i], partner[j] = j, i
+            self.assertEqual((len(result.pairs), len(result.unmatched)), (20, 1))
+
+            def current(i):
+                return mutual[i, partner[i]] if i in partner else float('-inf')
+            blocking = [(i, j) for (i, j), score in mutual.items()
+                        if partner.get(i) != j and score > current(i) and score > current(j)]
+            self.assertEqual(blocking, [])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_short_candidate_lists_still_pair_everyone(self):
+        result = self.analyzer.stable_pairing(candidates=2)
+        self.assertEqual(len(result.unmatched), 1)
+        self.assertEqual(sorted([i for pair in result.positions for i in pair] + result.unmatched),
+                         list(range(41)))
+        self.assertEqual(self.analyzer.stable_pairing(min_score=100).pairs, [])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_people_listed_twice_are_paired_once(self):
+        analyzer = FriendshipAnalyzer(self.people[:10] + self.people[:2])
+        result = analyzer.stable_pairing()
+        self.assertEqual(sorted(i for pair in result.positions for i in pair), list(range(10)))
+
+
 def run_all_tests():
     """Run all tests and provide clear pass/fail results"""
     print("🔬 Running Automated Friendship Analyzer Tests...")
@@ -309,7 +2085,7 @@ def run_all_tests():
     
     # Create test suite
     loader = unittest.TestLoader()
-    suite = loader.loadTestsFromTestCase(TestFriendshipAnalyzer)
+    suite = loader.loadTestsFromModule(sys.modules[__name__])
     
     # Run tests with detailed output
     runner = unittest.TextTestRunner(verbosity=2)